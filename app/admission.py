@@ -0,0 +1,293 @@
+# app/admission.py
+"""
+Admission control in front of the write paths, for the lunch rush (orders and logins at 11:50).
+
+- Token buckets (tokens per second, burst), see DEFAULT_LIMITS:
+    POST /login            per client IP and per account submitted
+    other writes           per client IP and per user (POST, PUT, PATCH, DELETE of non-admins)
+- Checkout slots: at most ADMISSION_CHECKOUT_SLOTS order transactions (POST /order,
+  POST /api/v1/reservations/) run at once on the host, fewer than the database connections
+  it can open: the pool keeps connections for the menu reads. ADMISSION_ADMIN_SLOTS of them
+  are reserved to admins.
+- A request over a limit waits ADMISSION_QUEUE_TIMEOUT seconds at most for its token or its
+  slot, then is refused with 429 and Retry-After (JSON for the API, a message appended to the
+  page for HTMX requests, plain text otherwise).
+- A duplicate order (same Idempotency-Key as an order already claimed) takes no slot: it is
+  replayed or waits for the first one. One that raced the first to the key gives its slot
+  back while it waits (yield_slot), and takes one again only if it has to run the order.
+- Admins (and so the admin routes) are never rate limited and take the reserved slots.
+
+The state is shared by the workers of the host, the store is chosen with ADMISSION_BACKEND:
+
+- 'off'    (default) no admission control
+- 'memory' in the process: one process only (dev, tests)
+- 'sqlite' SQLite file ADMISSION_SQLITE_PATH (WAL), shared by the workers of one host
+"""
+import math
+import os
+import secrets
+import threading
+import time
+
+from flask import g, jsonify, make_response, render_template, request
+from sqlalchemy import (
+    Column, Float, Integer, MetaData, String, Table, create_engine, delete, event, func, insert, literal, select, text
+)
+
+from app.cache import TTLCache
+from app.controller.auth import get_current_user
+from app.idempotency import key_claimed
+from app.metrics import metric_labels, pid_alive, registry
+
+ADMISSION_BACKENDS = ('off', 'memory', 'sqlite')
+WRITE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+LOGIN_ENDPOINTS = frozenset({'login'})
+CHECKOUT_ENDPOINTS = frozenset({'place_order', 'reservation_bp.create_reservation'})
+
+# (jetons par seconde, rafale) par seau ; ADMISSION_LIMITS en remplace tout ou partie
+DEFAULT_LIMITS = {
+    'login_ip': (5.0, 50),       # tout un campus peut sortir par la même IP (NAT)
+    'login_account': (0.2, 5),   # essais de mot de passe sur un compte
+    'write_ip': (50.0, 200),
+    'write_user': (2.0, 10),
+}
+# Un créneau plus ancien est tenu pour perdu (au-delà du timeout des workers)
+SLOT_TIMEOUT = 60.0
+SLOT_POLL_INTERVAL = 0.02
+
+
+def refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    """Tokens of a bucket at `now`, from its level at `updated`."""
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryAdmissionStore:
+    """Buckets and checkout slots of the current process."""
+
+    def __init__(self, idle: float):
+        # Un seau inactif depuis `idle` secondes est plein : l'oublier ne change rien
+        self._buckets = TTLCache(maxsize=100000, ttl=idle)
+        self._slots = set()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take a token: 0 if one was taken, else the seconds before the next one."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated, now, rate, burst)
+            taken = tokens >= 1
+            self._buckets.set(key, (tokens - 1 if taken else tokens, now))
+        return 0.0 if taken else (1 - tokens) / rate
+
+    def acquire(self, holder: str, limit: int) -> bool:
+        with self._lock:
+            if len(self._slots) >= limit:
+                return False
+            self._slots.add(holder)
+            return True
+
+    def release(self, holder: str):
+        with self._lock:
+            self._slots.discard(holder)
+
+
+metadata = MetaData()
+bucket_table = Table(
+    'admission_bucket', metadata,
+    Column('key', String, primary_key=True),
+    Column('tokens', Float, nullable=False),
+    Column('updated', Float, nullable=False),
+)
+slot_table = Table(
+    'admission_slot', metadata,
+    Column('holder', String, primary_key=True),
+    Column('pid', Integer, nullable=False),
+    Column('acquired', Float, nullable=False),
+)
+
+
+class SQLiteAdmissionStore:
+    """Buckets and checkout slots in a local SQLite file, opened lazily by each (forked) worker process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._engines = {}  # pid -> engine (pas de connexions héritées du master)
+
+    def _engine(self):
+        pid = os.getpid()
+        engine = self._engines.get(pid)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(pid)
+                if engine is None:
+                    engine = create_engine(f"sqlite:///{self.path}")
+                    event.listen(engine, 'connect', self._configure_connection)
+                    metadata.create_all(engine)
+                    self._engines = {pid: engine}
+        return engine
+
+    @staticmethod
+    def _configure_connection(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=OFF")  # état jetable : pas de fsync
+        dbapi_connection.execute("PRAGMA busy_timeout=5000")
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take a token: 0 if one was taken, else the seconds before the next one."""
+        with self._engine().begin() as connection:
+            # Remplissage et lecture en une écriture : le verrou d'écriture est pris dès la
+            # première instruction, aucun autre worker ne lit le seau avant le COMMIT
+            tokens = connection.execute(text(
+                "INSERT INTO admission_bucket (key, tokens, updated) VALUES (:key, :burst, :now) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "tokens = min(:burst, tokens + max(0, :now - updated) * :rate), updated = max(updated, :now) "
+                "RETURNING tokens"
+            ), {'key': key, 'burst': burst, 'now': now, 'rate': rate}).scalar_one()
+            if tokens < 1:
+                return (1 - tokens) / rate
+            connection.execute(
+                bucket_table.update().where(bucket_table.c.key == key).values(tokens=bucket_table.c.tokens - 1)
+            )
+        return 0.0
+
+    def acquire(self, holder: str, limit: int) -> bool:
+        with self._engine().begin() as connection:
+            if self._insert_slot(connection, holder, limit):
+                return True
+            # Complet : les créneaux des workers morts ou trop anciens sont libérés, puis un nouvel essai
+            pids = connection.execute(select(slot_table.c.pid).distinct()).scalars().all()
+            dead = [pid for pid in pids if not pid_alive(pid)]
+            freed = connection.execute(delete(slot_table).where(
+                slot_table.c.pid.in_(dead) | (slot_table.c.acquired < time.time() - SLOT_TIMEOUT)
+            )).rowcount
+            return bool(freed) and self._insert_slot(connection, holder, limit)
+
+    @staticmethod
+    def _insert_slot(connection, holder: str, limit: int) -> bool:
+        taken = select(func.count()).select_from(slot_table).scalar_subquery()
+        return connection.execute(insert(slot_table).from_select(
+            ['holder', 'pid', 'acquired'],
+            select(literal(holder), literal(os.getpid()), literal(time.time())).where(taken < limit)
+        )).rowcount == 1
+
+    def release(self, holder: str):
+        with self._engine().begin() as connection:
+            connection.execute(delete(slot_table).where(slot_table.c.holder == holder))
+
+
+class AdmissionControl:
+    """before_request / teardown_request hooks that admit, queue or refuse the write requests."""
+
+    def __init__(self, store, limits: dict, checkout_slots: int, admin_slots: int, queue_timeout: float):
+        self.store = store
+        self.limits = limits
+        self.checkout_slots = checkout_slots
+        self.admin_slots = admin_slots
+        self.queue_timeout = queue_timeout
+
+    def _buckets(self, user):
+        ip = request.remote_addr or 'unknown'
+        if request.endpoint in LOGIN_ENDPOINTS:
+            yield 'login_ip', ip
+            account = (request.form.get('username') or '').strip().lower()
+            if account:
+                yield 'login_account', account
+        elif user is None or user.role != 'admin':
+            yield 'write_ip', ip
+            if user is not None:
+                yield 'write_user', str(user.user_id)
+
+    def admit(self):
+        if request.method not in WRITE_METHODS:
+            return None
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        user = get_current_user()
+        for name, value in self._buckets(user):
+            rate, burst = self.limits[name]
+            while wait := self.store.take(f"{name}:{value}", rate, burst, time.time()):
+                if time.monotonic() + wait > deadline:
+                    return self._refuse('rate', wait)
+                time.sleep(wait)
+        # Répétition d'une commande déjà en cours ou faite (même Idempotency-Key) : rejouée, pas de créneau
+        if request.endpoint in CHECKOUT_ENDPOINTS and not key_claimed():
+            if refused := self.acquire_slot(user, deadline):
+                return refused
+        waited = time.monotonic() - start
+        if waited >= SLOT_POLL_INTERVAL:
+            registry.observe('cantina_admission_wait_seconds', metric_labels(endpoint=request.endpoint), waited)
+        return None
+
+    def acquire_slot(self, user, deadline: float):
+        """Take a checkout slot for the request, waiting until `deadline`. Returns the 429 response if none freed up."""
+        is_admin = user is not None and user.role == 'admin'
+        limit = self.checkout_slots if is_admin else self.checkout_slots - self.admin_slots
+        holder = secrets.token_hex(8)
+        while not self.store.acquire(holder, limit):
+            if time.monotonic() >= deadline:
+                return self._refuse('checkout', 1)
+            time.sleep(SLOT_POLL_INTERVAL)
+        g.admission_slot = holder
+        return None
+
+    def yield_slot(self) -> bool:
+        """
+        Give the checkout slot of the request back while it waits for another request (a duplicate
+        with the same Idempotency-Key, see app/idempotency.py). Returns True if it held one.
+        """
+        if 'admission_slot' not in g:
+            return False
+        self.release(None)
+        return True
+
+    def reacquire_slot(self):
+        """Take a checkout slot again after yield_slot(). Returns the 429 response if none freed up in time."""
+        return self.acquire_slot(get_current_user(), time.monotonic() + self.queue_timeout)
+
+    def release(self, exc):
+        holder = g.pop('admission_slot', None)
+        if holder is not None:
+            self.store.release(holder)
+
+    def _refuse(self, reason: str, retry_after: float):
+        registry.inc('cantina_admission_rejected_total', metric_labels(endpoint=request.endpoint or 'unmatched', reason=reason))
+        seconds = max(1, math.ceil(retry_after))
+        message = f"Trop de demandes en ce moment, réessayez dans {seconds} s."
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': message})
+        elif request.headers.get('HX-Request'):
+            # Fragment ajouté à la page, quelle que soit la cible de l'élément qui a fait la requête
+            response = make_response(render_template('partials/flash.html', category='error', message=message))
+            response.headers['HX-Retarget'] = 'body'
+            response.headers['HX-Reswap'] = 'beforeend'
+        else:
+            response = make_response(message)
+            response.mimetype = 'text/plain'
+        response.status_code = 429
+        response.headers['Retry-After'] = str(seconds)
+        return response
+
+
+def init_admission(app):
+    """Install admission control on the write endpoints if ADMISSION_BACKEND is not 'off'."""
+    backend = app.config.get('ADMISSION_BACKEND', 'off')
+    if backend not in ADMISSION_BACKENDS:
+        raise ValueError(f"ADMISSION_BACKEND must be one of {', '.join(ADMISSION_BACKENDS)}, not {backend!r}")
+    if backend == 'off':
+        return None
+    limits = dict(DEFAULT_LIMITS, **app.config.get('ADMISSION_LIMITS', {}))
+    if backend == 'memory':
+        store = MemoryAdmissionStore(idle=max(burst / rate for rate, burst in limits.values()))
+    else:
+        store = SQLiteAdmissionStore(app.config.get('ADMISSION_SQLITE_PATH', '/tmp/cantina-admission.db'))
+    admission = AdmissionControl(
+        store, limits,
+        checkout_slots=app.config.get('ADMISSION_CHECKOUT_SLOTS', 6),
+        admin_slots=app.config.get('ADMISSION_ADMIN_SLOTS', 1),
+        queue_timeout=app.config.get('ADMISSION_QUEUE_TIMEOUT', 2.0),
+    )
+    app.before_request(admission.admit)
+    app.teardown_request(admission.release)
+    app.extensions['admission'] = admission
+    return admission
@@ -0,0 +1,122 @@
+# app/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache, bounded in size (LRU eviction)
+    and in age (entries older than `ttl` seconds are treated as missing).
+    Each worker process holds its own copy, so the TTL is what bounds
+    staleness when another process writes the same data.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def configure(self, maxsize: int = None, ttl: float = None):
+        """Change the bounds of the cache. Existing entries are dropped."""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self.clear()
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store `value` under `key`, evicting the least recently used entries if full."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop a single entry (no-op if it is not cached)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionedCache(TTLCache):
+    """
+    TTLCache whose keys carry a version, bumped by every invalidation.
+    A value built from the database is only stored if no invalidation of its key
+    happened while it was being built, so a slow rebuild cannot overwrite fresher data.
+    `shared`, if given, returns a version shared by all the processes (see CacheVersion):
+    it is part of every key version, so an invalidation made by another worker is seen too.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, shared=None):
+        super().__init__(maxsize, ttl)
+        self._versions = {}
+        self._generation = 0
+        self._shared = shared
+
+    def version(self, key):
+        """Current version of `key` (changes whenever the key or the whole cache is invalidated)."""
+        shared = self._shared() if self._shared is not None else None
+        with self._lock:
+            return (shared, self._generation, self._versions.get(key, 0))
+
+    def get_or_build(self, key, build):
+        """Return the cached value for `key`, calling `build()` to produce it on a miss (None is not cached)."""
+        version = self.version(key)
+        entry = self.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = build()
+        with self._lock:
+            if value is not None and self.version(key) == version:
+                self.set(key, (version, value))
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._data.pop(key, None)
+            if len(self._versions) > self.maxsize:
+                self._rebase()
+
+    def _rebase(self):
+        """
+        Forget the per-key versions (bounded like the entries), moving to a new generation so that
+        no build started before can be stored. The cached entries are all current (an invalidated
+        key is dropped), so they are kept, stamped with the new generation.
+        """
+        self._generation += 1
+        self._versions.clear()
+        for key, (expires_at, (version, value)) in self._data.items():
+            self._data[key] = (expires_at, ((version[0], self._generation, 0), value))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._versions.clear()
+            self._data.clear()
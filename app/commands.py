@@ -0,0 +1,96 @@
+# app/commands.py
+"""
+Administration commands, grouped under `flask cantina`:
+
+    flask --app app.main cantina bootstrap           # crée le schéma et insère les données de démo
+    flask --app app.main cantina bootstrap --no-seed # schéma seulement
+    flask --app app.main cantina generate --users 50000 --days 730 --orders 1000000
+    flask --app app.main cantina rebuild-rollups     # recalcule les cumuls mensuels par utilisateur
+    flask --app app.main cantina purge-sessions      # supprime les sessions serveur et clés d'idempotence expirées
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.schema import CreateIndex
+
+from app.models import db
+from app.models.user_search import install_search
+
+cantina_cli = AppGroup('cantina', help="The New Cantina administration commands.")
+
+
+def bootstrap_database(seed: bool = True):
+    """Create the missing tables and, if `seed` is set, populate an empty database. Needs an app context."""
+    from app.db_seeder import populate_database_if_empty
+    # Primaire seulement : le réplica reçoit le schéma par la réplication.
+    db.create_all(bind_key=None)
+    # Index ajoutés aux modèles depuis la création des tables (create_all ne touche pas aux tables existantes)
+    with db.engine.begin() as connection:
+        for table in db.metadatas[None].sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+        # Index de recherche des utilisateurs (trigrammes / FTS5), propre au dialecte
+        install_search(connection)
+    if seed:
+        populate_database_if_empty()
+
+
+@cantina_cli.command('bootstrap')
+@click.option('--seed/--no-seed', default=True, help="Insert the demo data when the database is empty.")
+def bootstrap_command(seed):
+    """Create the database schema and seed it (run once per deployment, not per worker)."""
+    start = time.perf_counter()
+    bootstrap_database(seed=seed)
+    click.echo(f"Bootstrap terminé en {time.perf_counter() - start:.2f}s.")
+
+
+@cantina_cli.command('generate')
+@click.option('--users', default=50000, show_default=True, help="Users to create.")
+@click.option('--days', default=730, show_default=True, help="Days of daily menus, for every cafeteria.")
+@click.option('--orders', default=1000000, show_default=True, help="Reservations to create (1 to 4 order items each).")
+@click.option('--start-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help="First menu day (default: so that the last day is today).")
+@click.option('--seed', default=42, show_default=True, help="Random seed, for reproducible datasets.")
+@click.option('--batch-size', default=10000, show_default=True, help="Rows per COPY / INSERT batch.")
+def generate_command(users, days, orders, start_date, seed, batch_size):
+    """Append a large synthetic dataset for load testing (needs `cantina bootstrap` first)."""
+    from app.data_generator import generate_dataset
+    start = time.perf_counter()
+    try:
+        counts = generate_dataset(users=users, days=days, orders=orders,
+                                  start_date=start_date.date() if start_date else None,
+                                  seed=seed, batch_size=batch_size, echo=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Génération terminée en {time.perf_counter() - start:.1f}s : {sum(counts.values())} lignes.")
+
+
+@cantina_cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the per-user monthly spending rollup from the reservations (backfill or repair)."""
+    from app.models import UserMonthlySpending
+    start = time.perf_counter()
+    rows = UserMonthlySpending.rebuild()
+    db.session.commit()
+    click.echo(f"{rows} cumuls mensuels recalculés en {time.perf_counter() - start:.2f}s.")
+
+
+@cantina_cli.command('purge-sessions')
+def purge_sessions_command():
+    """Delete the expired server-side sessions (SESSION_BACKEND sqlite or postgres) and idempotency keys; run from cron."""
+    from datetime import timedelta
+    from flask import current_app
+    from app.models import IdempotencyKey
+    purged = IdempotencyKey.purge(timedelta(seconds=current_app.config['IDEMPOTENCY_TTL']))
+    db.session.commit()
+    click.echo(f"{purged} clés d'idempotence expirées supprimées.")
+    store = getattr(current_app.session_interface, 'store', None)
+    if store is None:
+        click.echo("Les sessions sont stockées dans le cookie (SESSION_BACKEND=cookie) : rien à purger.")
+    else:
+        click.echo(f"{store.purge()} sessions expirées supprimées.")
+
+
+def register_commands(app):
+    app.cli.add_command(cantina_cli)
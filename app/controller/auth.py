@@ -1,32 +1,52 @@
 # app/controller/auth.py
 
 from functools import wraps
-from flask import session, jsonify, redirect, url_for, flash
+from flask import session, jsonify, redirect, url_for, flash, g
 from app.models import AppUser
 
 def get_current_user():
-    """Helper to get the currently logged-in user object from session."""
-    if "user_id" in session:
-        print(f"[DEBUG] ✅ Found 'user_id' in session: {session['user_id']}. Access granted.")
-        return AppUser.get_by_id(session["user_id"])
-    else:
-        print("[DEBUG] ❌ 'user_id' NOT found in session. Redirecting to login page.")
-    return None
+    """
+    Helper to get the currently logged-in user object from session.
+    The user is resolved at most once per request (memoized on `flask.g`)
+    and goes through the AppUser identity cache across requests.
+    """
+    user_id = session.get("user_id")
+    if user_id is None:
+        return None
+    cached = g.get("_current_user")
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    user = AppUser.get_by_id_cached(user_id)
+    g._current_user = (user_id, user)
+    return user
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_id = session.get("user_id")
-        if not user_id:
+        if not session.get("user_id"):
             return jsonify({"error": "Authentification requise"}), 401
-        user = AppUser.get_by_id(user_id)
+        user = get_current_user()
         if not user or user.role != "admin":
             return jsonify({"error": "Accès réservé aux administrateurs"}), 403
         return f(*args, **kwargs)
     return decorated_function
 
+def kiosk_required(f):
+    """Decorator for machine-to-machine routes used by cafeteria kiosks (kiosk or admin accounts)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get("user_id"):
+            return jsonify({"error": "Authentification requise"}), 401
+        user = get_current_user()
+        if not user or user.role not in ("kiosk", "admin"):
+            return jsonify({"error": "Accès réservé aux bornes et aux administrateurs"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def require_login():
-    """Helper function to protect web pages, redirects if not logged in."""
+    """Helper function to protect web pages, redirects if not logged in (or if the user was deleted)."""
+    if "user_id" in session and get_current_user() is None:
+        session.clear()
     if "user_id" not in session:
         flash("Vous devez être connecté pour accéder à cette page.", "warning")
         return redirect(url_for("login"))
@@ -38,12 +58,12 @@ def api_require_login(f):
     def decorated_function(*args, **kwargs):
         if "user_id" not in session:
             return jsonify({"error": "Authentification requise. Veuillez vous connecter."}), 401
-        
+
         user = get_current_user()
         if not user:
             session.clear()
             return jsonify({"error": "Utilisateur non trouvé. Veuillez vous reconnecter."}), 401
-        
+
         # Pass the user object to the decorated function
         return f(current_user=user, *args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
@@ -5,6 +5,7 @@ from app.models.app_user import AppUser          # Correction ici
 from app.models import db                        # Correction ici
 from app.controller.auth import admin_required, api_require_login   # Correction ici
 from sqlalchemy.exc import IntegrityError
+from app.pagination import paginated_response
 
 
 cafeteria_bp = Blueprint('cafeteria_bp', __name__, url_prefix='/api/v1/cafeteria')
@@ -12,11 +13,11 @@ cafeteria_bp = Blueprint('cafeteria_bp', __name__, url_prefix='/api/v1/cafeteria
 
 # --- ROUTES ---
 
-# GET /api/v1/cafeteria - Liste toutes les cafétérias (public)
+# GET /api/v1/cafeteria - Liste les cafétérias, par pages (?cursor=&limit=) (public)
 @cafeteria_bp.route('/', methods=['GET'])
 @api_require_login
 def get_all_cafeterias(current_user):
-    return jsonify(Cafeteria.get_all_dicts()), 200
+    return paginated_response(Cafeteria.get_page_records)
 
 # GET /api/v1/cafeteria/<int:cafeteria_id> - Affiche une cafétéria (public)
 @cafeteria_bp.route('/<int:cafeteria_id>', methods=['GET'])
@@ -37,6 +38,7 @@ def create_cafeteria():
             name=data['name']
         )
         db.session.commit()
+        Cafeteria.invalidate_directory()
         return jsonify(cafeteria.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -54,6 +56,7 @@ def update_cafeteria(cafeteria_id):
         name=data.get('name')
     )
     if success:
+        Cafeteria.invalidate_directory()
         return jsonify(cafeteria.to_dict()), 200
     else:
         return jsonify({'error': 'Échec de la mise à jour'}), 400
@@ -67,6 +70,7 @@ def delete_cafeteria(cafeteria_id):
         return jsonify({'error': 'Cafétéria non trouvée'}), 404
     try:
         cafeteria.delete_cafeteria()
+        Cafeteria.invalidate_directory()
         # Return an empty response with 200 OK for HTMX.
         return '', 200
     except IntegrityError:
@@ -10,16 +10,24 @@ from decimal import Decimal
 from functools import wraps
 from flask import (
     Flask, render_template, request, session, redirect, url_for,
-    flash, jsonify, make_response
+    flash, jsonify, make_response, abort
 )
-from sqlalchemy import text, or_
+from sqlalchemy import text
 from sqlalchemy.orm import joinedload
-import json
 from collections import defaultdict
 import traceback
 
 # ------- IMPORTS RELATIFS (package Python) -------
-from app.models import db, AppUser, Cafeteria, Dish, DailyMenu, DailyMenuItem, Reservation, OrderItem
+from app.models import check_dialect, db, AppUser, Cafeteria, Dish, DailyMenu, DailyMenuItem, Reservation, OrderItem, OrderError, UserMonthlySpending
+from app.commands import register_commands, bootstrap_database
+from app.metrics import init_metrics
+from app.models.routing_session import REPLICA_BIND_KEY, init_read_replica
+from app.models.user_search import SEARCH_LIMIT, search_cache as user_search_cache
+from app.session_store import init_session, regenerate_session
+from app.admission import init_admission
+from app.serialization import FastJSONProvider, dumps
+from app.idempotency import idempotent, new_idempotency_key
+from app.pagination import InvalidCursor
 
 
 # --- Utilitaires / Auth ---
@@ -30,13 +38,16 @@ from app.controller.user_controller import user_bp
 from app.controller.dish_controller import dish_bp
 from app.controller.cafeteria_controller import cafeteria_bp
 from app.controller.reservation_controller import reservation_bp
-from app.controller.daily_menu_controller import daily_menu_bp
+from app.controller.daily_menu_controller import daily_menu_bp, parse_schedule
 from app.controller.daily_menu_item_controller import daily_menu_item_bp
 from app.controller.order_item_controller import order_item_bp
 
 def create_app(test_config=None):
     app = Flask(__name__, template_folder='../templates')
-    app.jinja_env.filters['tojson'] = lambda obj: json.dumps(obj)
+    # JSON des réponses et des blobs des templates : orjson si installé (app/serialization.py)
+    app.json = FastJSONProvider(app)
+    app.jinja_env.filters['tojson'] = dumps
+    app.jinja_env.globals['idempotency_key'] = new_idempotency_key
     
     # --- CONFIGURATION ---
     DB_HOST = os.getenv('DB_HOST', 'postgres-db')
@@ -47,22 +58,87 @@ def create_app(test_config=None):
     database_url = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # --- RÉPLICA EN LECTURE (optionnel) ---
+    # DB_REPLICA_URL, ou DB_REPLICA_HOST (+ _PORT, _NAME, _USER, _PASSWORD, par défaut ceux du primaire)
+    replica_url = os.getenv('DB_REPLICA_URL')
+    if not replica_url and os.getenv('DB_REPLICA_HOST'):
+        replica_url = 'postgresql://{}:{}@{}:{}/{}'.format(
+            os.getenv('DB_REPLICA_USER', DB_USER), os.getenv('DB_REPLICA_PASSWORD', DB_PASSWORD),
+            os.getenv('DB_REPLICA_HOST'), os.getenv('DB_REPLICA_PORT', DB_PORT), os.getenv('DB_REPLICA_NAME', DB_NAME)
+        )
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND_KEY: replica_url}
+    app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+
+    app.config['AUTO_BOOTSTRAP'] = os.getenv('AUTO_BOOTSTRAP', '0') == '1'
+
     app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+    # --- SESSIONS CÔTÉ SERVEUR (optionnel) ---
+    # cookie (défaut) | memory | sqlite | postgres : voir app/session_store.py
+    app.config['SESSION_BACKEND'] = os.getenv('SESSION_BACKEND', 'cookie')
+    app.config['SESSION_SQLITE_PATH'] = os.getenv('SESSION_SQLITE_PATH', '/tmp/cantina-sessions.db')
+
+    # --- CLÉS D'IDEMPOTENCE (commande, rechargement) : voir app/idempotency.py ---
+    # Durée de conservation des réponses, attente max d'une répétition, délai après lequel
+    # une requête en cours est tenue pour morte (au-delà du timeout des workers)
+    app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+    app.config['IDEMPOTENCY_WAIT'] = float(os.getenv('IDEMPOTENCY_WAIT', '10'))
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
+
+    # --- CONTRÔLE D'ADMISSION (écritures, connexion) : voir app/admission.py ---
+    # off (défaut) | memory | sqlite ; créneaux de commande simultanées à garder sous le
+    # nombre de connexions que l'hôte peut ouvrir vers la base
+    app.config['ADMISSION_BACKEND'] = os.getenv('ADMISSION_BACKEND', 'off')
+    app.config['ADMISSION_SQLITE_PATH'] = os.getenv('ADMISSION_SQLITE_PATH', '/tmp/cantina-admission.db')
+    app.config['ADMISSION_CHECKOUT_SLOTS'] = int(os.getenv('ADMISSION_CHECKOUT_SLOTS', '6'))
+    app.config['ADMISSION_ADMIN_SLOTS'] = int(os.getenv('ADMISSION_ADMIN_SLOTS', '1'))
+    app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))
+
     if test_config:
         app.config.update(test_config)
 
     db.init_app(app)
+    check_dialect(app)
+    # Cache des utilisateurs authentifiés (partagé entre les requêtes du processus) ; un changement de rôle,
+    # de mot de passe ou une suppression le vide dans tous les workers à leur requête suivante (CacheVersion)
+    AppUser.identity_cache.configure(
+        maxsize=app.config.get('USER_CACHE_SIZE', 4096),
+        ttl=app.config.get('USER_CACHE_TTL', 30.0)
+    )
+    # Résultats de la recherche d'utilisateurs (page admin), par requête
+    user_search_cache.configure(
+        maxsize=app.config.get('USER_SEARCH_CACHE_SIZE', 256),
+        ttl=app.config.get('USER_SEARCH_CACHE_TTL', 5.0)
+    )
+    # Index des noms de plats pour l'autocomplétion, reconstruit au plus tard toutes les DISH_INDEX_TTL secondes
+    Dish.prefix_index.configure(ttl=app.config.get('DISH_INDEX_TTL', 300.0))
+    # Cache des menus du jour, par (cafeteria_id, menu_date) ; les écritures des autres workers sont vues
+    # à la requête suivante (CacheVersion), le TTL ne borne que les écritures faites hors de l'application
+    DailyMenu.menu_cache.configure(
+        maxsize=app.config.get('MENU_CACHE_SIZE', 512),
+        ttl=app.config.get('MENU_CACHE_TTL', 300.0)
+    )
+    # Annuaire des cafétérias (8 lignes, modifiées quelques fois par an), invalidé par cafeteria_bp dans tous les workers
+    Cafeteria.directory_cache.configure(ttl=app.config.get('CAFETERIA_CACHE_TTL', 3600.0))
+    # Métriques Prometheus (/metrics), agrégées entre workers via METRICS_DIR
+    init_metrics(app, db)
+    # Lecture-après-écriture : une session qui vient d'écrire reste sur le primaire
+    init_read_replica(app)
+    # Le cookie ne porte plus qu'un identifiant si SESSION_BACKEND n'est pas 'cookie'
+    init_session(app)
+
+    # Seaux de jetons et créneaux de commande devant les écritures (après la session : l'utilisateur est connu)
+    init_admission(app)
     # --- INITIALISATION DE LA BASE DE DONNÉES ---
-    
-    from app.db_seeder import populate_database_if_empty
-    with app.app_context():
-        # Crée les tables si elles n'existent pas
-        db.create_all()
-        # Appelle votre fonction de seeding. Maintenant, elle utilisera
-        # l'instance `db` qui a été correctement initialisée.
-        populate_database_if_empty()
-         
+    # Le schéma et les données de démo sont créés par `flask cantina bootstrap`,
+    # une seule fois par déploiement. AUTO_BOOTSTRAP=1 le refait au démarrage (dev).
+    register_commands(app)
+    if app.config['AUTO_BOOTSTRAP']:
+        with app.app_context():
+            bootstrap_database()
+
     # -------- AUTH "ADMIN WEB" --------
     def admin_web_required(f):
         @wraps(f)
@@ -75,6 +151,16 @@ def create_app(test_config=None):
             return f(current_user=user, *args, **kwargs)
         return decorated_function
 
+    @app.context_processor
+    def inject_cafeterias():
+        # Sélecteur de cafétéria de layout.html, depuis l'annuaire en cache : aucune requête sur cafeteria.
+        # Les vues peuvent passer leur propre current_cafeteria (le dashboard prend celle de l'URL).
+        directory = Cafeteria.directory()
+        current = directory.by_id.get(session.get('current_cafeteria_id'))
+        if current is None and directory.cafeterias:
+            current = directory.cafeterias[0]
+        return {"cafeterias": directory.cafeterias, "current_cafeteria": current}
+
     # ----------- ROUTES WEB -----------
 
     @app.route("/")
@@ -93,6 +179,7 @@ def create_app(test_config=None):
         if request.method == "POST":
             user = AppUser.get_by_email(request.form.get("username"))
             if user and user.verify_password(request.form.get("password")):
+                regenerate_session(session)
                 session["user_id"], session.permanent = user.user_id, True
                 session.pop('cart', None)
                 if user.role == 'admin':
@@ -107,19 +194,31 @@ def create_app(test_config=None):
         return redirect(url_for("login"))
 
     # ------- CART & DASHBOARD UTIL -------
+    def cart_entry(dish, quantity=1):
+        # Nom et prix copiés dans le panier : le panneau s'affiche sans requête sur dish
+        return {'quantity': quantity, 'name': dish.name, 'price': str(dish.dine_in_price)}
+
     def get_cart_details():
         cart_session = session.get('cart', {})
         if not cart_session: return [], Decimal('0.0')
-        dish_ids = [int(k) for k in cart_session.keys()]
-        dishes = Dish.query.filter(Dish.dish_id.in_(dish_ids)).all()
-        dish_map = {str(d.dish_id): d for d in dishes}
+        # Paniers créés avant les copies de prix : complétés une fois depuis la base
+        missing = [int(k) for k, data in cart_session.items() if 'price' not in data]
+        if missing:
+            price_map = Dish.get_price_map(missing)
+            for dish_id in missing:
+                if dish := price_map.get(dish_id):
+                    cart_session[str(dish_id)] = cart_entry(dish, cart_session[str(dish_id)].get('quantity', 1))
+                else:
+                    del cart_session[str(dish_id)]
+            session['cart'] = cart_session
         items, total = [], Decimal('0.0')
         for dish_id_str, data in cart_session.items():
-            if dish := dish_map.get(dish_id_str):
-                quantity = data.get('quantity', 1)
-                subtotal = dish.dine_in_price * quantity
-                total += subtotal
-                items.append({'dish': dish, 'quantity': quantity, 'subtotal': subtotal})
+            price = Decimal(data['price'])
+            quantity = data.get('quantity', 1)
+            subtotal = price * quantity
+            total += subtotal
+            dish = {'dish_id': int(dish_id_str), 'name': data['name'], 'dine_in_price': price}
+            items.append({'dish': dish, 'quantity': quantity, 'subtotal': subtotal})
         return items, total
 
     @app.route("/dashboard")
@@ -129,19 +228,21 @@ def create_app(test_config=None):
         user = get_current_user()
         if user.role == 'admin': return redirect(url_for('admin_dashboard'))
         if not cafeteria_id:
-            if first_caf := Cafeteria.query.first():
-                return redirect(url_for("dashboard", cafeteria_id=first_caf.cafeteria_id))
+            if cafeterias := Cafeteria.directory().cafeterias:
+                return redirect(url_for("dashboard", cafeteria_id=cafeterias[0].cafeteria_id))
             flash("Aucune cafétéria n'est configurée.", "warning")
             return render_template("layout.html", user=user, current_cafeteria=None, cafeterias=[], selected_date=date.today().strftime("%Y-%m-%d"))
-        session['current_cafeteria_id'] = cafeteria_id
-        current_cafeteria = Cafeteria.query.get_or_404(cafeteria_id)
+        current_cafeteria = Cafeteria.lookup(cafeteria_id)
+        if current_cafeteria is None:
+            abort(404)
+        # Réécrit seulement s'il change : une session modifiée est enregistrée (écriture sur le primaire)
+        if session.get('current_cafeteria_id') != cafeteria_id:
+            session['current_cafeteria_id'] = cafeteria_id
         selected_date_str = request.args.get("date", date.today().strftime("%Y-%m-%d"))
         selected_date_obj = datetime.strptime(selected_date_str, "%Y-%m-%d").date()
-        menu_items = []
-        if daily_menu := DailyMenu.query.filter_by(cafeteria_id=cafeteria_id, menu_date=selected_date_obj).first():
-            menu_items = db.session.query(Dish, DailyMenuItem).join(DailyMenuItem).filter(DailyMenuItem.menu_id == daily_menu.menu_id).order_by(DailyMenuItem.display_order).all()
+        menu_items = DailyMenu.get_menu_snapshot(cafeteria_id, selected_date_obj).entries
         cart_items, cart_total = get_cart_details()
-        return render_template("dashboard.html", user=user, cafeterias=Cafeteria.query.all(),
+        return render_template("dashboard.html", user=user,
             current_cafeteria=current_cafeteria, selected_date=selected_date_str,
             menu=menu_items, cart_items=cart_items, cart_total=cart_total)
 
@@ -150,40 +251,49 @@ def create_app(test_config=None):
         if auth_check := require_login(): return auth_check
         cart = session.get('cart', {})
         dish_id_str = str(dish_id)
-        if action == 'add' and Dish.get_by_id(dish_id):
-            cart[dish_id_str] = {'quantity': 1}
-        elif action == 'update' and dish_id_str in cart:
+        was_in_cart = dish_id_str in cart
+        if action == 'add' and not was_in_cart and (dish := Dish.get_price_map([dish_id]).get(dish_id)):
+            cart[dish_id_str] = cart_entry(dish)
+        elif action == 'update' and was_in_cart:
             quantity = int(request.form.get('quantity', 1))
             if quantity > 0: cart[dish_id_str]['quantity'] = quantity
             else: del cart[dish_id_str]
-        elif action == 'remove' and dish_id_str in cart:
+        elif action == 'remove' and was_in_cart:
             del cart[dish_id_str]
         session['cart'] = cart
-        return redirect(url_for('dashboard', cafeteria_id=session.get('current_cafeteria_id')))
+        if 'HX-Request' not in request.headers:
+            return redirect(url_for('dashboard', cafeteria_id=session.get('current_cafeteria_id')))
+        # HTMX : le panneau du panier seul (prix copiés dans le panier, pas de requête sur dish),
+        # et le bouton du menu hors bande s'il passe de « Add » à « Added » ou inversement
+        cart_items, cart_total = get_cart_details()
+        in_cart = dish_id_str in cart
+        changed_dishes = [(dish_id, in_cart)] if in_cart != was_in_cart else []
+        return render_template("partials/cart_update.html", user=get_current_user(),
+            cart_items=cart_items, cart_total=cart_total, changed_dishes=changed_dishes)
 
     @app.route("/order", methods=['POST'])
+    @idempotent
     def place_order():
         if auth_check := require_login(): return auth_check
         user = get_current_user()
-        cart_items, total_cost = get_cart_details()
+        cart = session.get('cart', {})
         cafeteria_id = session.get('current_cafeteria_id')
-        if not all([cart_items, cafeteria_id, user.balance >= total_cost]):
+        if not all([cart, cafeteria_id]):
             flash("Commande impossible : panier vide, pas de cafétéria ou solde insuffisant.", "error")
             return redirect(url_for('dashboard', cafeteria_id=cafeteria_id))
         try:
-            reservation = Reservation(user_id=user.user_id, cafeteria_id=cafeteria_id, total=total_cost, status='completed')
-            db.session.add(reservation)
-            db.session.flush()
-            for item in cart_items:
-                order_item = OrderItem(reservation_id=reservation.reservation_id, dish_id=item['dish'].dish_id, quantity=item['quantity'], applied_price=item['dish'].dine_in_price, is_takeaway=False)
-                db.session.add(order_item)
-            user.balance -= total_cost
+            items = [{'dish_id': int(dish_id), 'quantity': data.get('quantity', 1)} for dish_id, data in cart.items()]
+            Reservation.place_order(user_id=user.user_id, cafeteria_id=cafeteria_id, items=items, status='completed')
             db.session.commit()
             session.pop('cart', None)
             flash("Commande effectuée avec succès !", "success")
             response = make_response()
             response.headers['HX-Redirect'] = url_for('orders')
             return response
+        except OrderError:
+            db.session.rollback()
+            flash("Commande impossible : panier vide, pas de cafétéria ou solde insuffisant.", "error")
+            return redirect(url_for('dashboard', cafeteria_id=cafeteria_id))
         except Exception as e:
             db.session.rollback()
             flash(f"Erreur pendant la commande : {e}", "error")
@@ -193,21 +303,16 @@ def create_app(test_config=None):
     def balance():
         if auth_check := require_login(): return auth_check
         user = get_current_user()
-        cafeteria_id = session.get('current_cafeteria_id')
-        current_cafeteria = Cafeteria.query.get(cafeteria_id) if cafeteria_id else Cafeteria.query.first()
-        cafeterias = Cafeteria.query.all()
         selected_date = date.today().strftime("%Y-%m-%d")
         context = {
             "user": user,
-            "current_cafeteria": current_cafeteria,
-            "cafeterias": cafeterias,
             "selected_date": selected_date
         }
         if request.method == "POST":
             try:
                 amount = Decimal(request.form.get("amount", "0"))
                 if Decimal("0.01") <= amount <= Decimal("500.00"):
-                    user.balance += amount
+                    AppUser.credit_balance(user.user_id, amount)
                     db.session.commit()
                     context.update({"success_msg": f"{amount:.2f} € ajouté avec succès.", "user": get_current_user()})
                 else: context["error_msg"] = "Montant entre 0.01 € et 500.00 €."
@@ -218,44 +323,45 @@ def create_app(test_config=None):
     def orders():
         if auth_check := require_login(): return auth_check
         user = get_current_user()
-        cafeteria_id = session.get('current_cafeteria_id')
-        current_cafeteria = Cafeteria.query.get(cafeteria_id) if cafeteria_id else Cafeteria.query.first()
-        cafeterias = Cafeteria.query.all()
         selected_date = date.today().strftime("%Y-%m-%d")
-        query = Reservation.query.filter_by(user_id=user.user_id).order_by(Reservation.reservation_datetime.desc())
         selected_month = request.args.get("month")
         selected_month_name = "Toutes périodes"
+        reservations, next_cursor = None, None
         if selected_month:
             try:
                 year, month = map(int, selected_month.split("-"))
-                reservations = query.filter(
-                    db.extract('year', Reservation.reservation_datetime) == year,
-                    db.extract('month', Reservation.reservation_datetime) == month
-                ).all()
                 selected_month_name = datetime(year, month, 1).strftime("%B %Y")
+                # Cafétéria, items et plats chargés d'avance : nombre de requêtes fixe
+                reservations = Reservation.get_history(user.user_id, year, month)
             except (ValueError, IndexError):
                 selected_month = None
-                reservations = query.all()
-        else:
-            reservations = query.all()
+        if reservations is None:
+            # Toutes périodes : les plus récentes, par pages de ORDERS_PAGE_SIZE (curseur, pas d'OFFSET)
+            limit = app.config.get('ORDERS_PAGE_SIZE', 50)
+            try:
+                reservations, next_cursor = Reservation.get_history_page(user.user_id, request.args.get("cursor"), limit)
+            except InvalidCursor:
+                reservations, next_cursor = Reservation.get_history_page(user.user_id, None, limit)
 
         context = {
             "user": user,
             "orders": reservations,
+            "next_cursor": next_cursor,
             "selected_month": selected_month,
             "selected_month_name": selected_month_name,
-            "current_cafeteria": current_cafeteria,
-            "cafeterias": cafeterias,
             "selected_date": selected_date
         }
         if 'HX-Request' not in request.headers:
-            monthly_totals = defaultdict(lambda: {"count": 0, "total": Decimal("0.0")})
-            all_user_orders = Reservation.query.filter_by(user_id=user.user_id).all()
-            for r in all_user_orders:
-                month_key = r.reservation_datetime.strftime("%Y-%m")
-                monthly_totals[month_key]["count"] += 1
-                monthly_totals[month_key]["total"] += r.total
-            context["monthly_summary"] = {k: {"month_name": datetime.strptime(k, "%Y-%m").strftime("%B %Y"), **v} for k, v in sorted(monthly_totals.items(), reverse=True)}
+            # Table de cumuls mensuels : une lecture par clé primaire, quel que soit l'historique
+            context["monthly_summary"] = {
+                row.month.strftime("%Y-%m"): {
+                    "month_name": row.month.strftime("%B %Y"),
+                    "count": row.order_count,
+                    "total": row.total,
+                }
+                for row in UserMonthlySpending.get_for_user(user.user_id)
+                if row.order_count
+            }
         return render_template("orders.html", **context)
 
     # ----------- ADMIN -----------
@@ -270,8 +376,8 @@ def create_app(test_config=None):
             selected_date_str = date.today().strftime('%Y-%m-%d')
             selected_date_obj = date.today()
             flash("Format de date invalide, retour à aujourd'hui.", "warning")
-        all_cafeterias = Cafeteria.query.order_by(Cafeteria.name).all()
-        all_dishes = Dish.query.order_by(Dish.name).all()
+        all_cafeterias = sorted(Cafeteria.directory().api, key=lambda c: c['name'])
+        # Le catalogue des plats n'est plus embarqué : l'autocomplétion interroge /api/v1/dish/search
         dishes_on_menu = defaultdict(lambda: {'dish': None, 'cafeteria_ids': set()})
         menu_items_for_date = db.session.query(DailyMenuItem, DailyMenu.cafeteria_id)\
             .join(DailyMenu, DailyMenuItem.menu_id == DailyMenu.menu_id)\
@@ -290,19 +396,29 @@ def create_app(test_config=None):
         menu_for_template.sort(key=lambda x: x['name'])
         return render_template("admin/dashboard.html",
                               user=current_user,
-                              all_cafeterias=[c.to_dict() for c in all_cafeterias],
-                              all_dishes=[d.to_dict() for d in all_dishes],
+                              all_cafeterias=all_cafeterias,
                               dishes_on_menu=menu_for_template,
                               selected_date=selected_date_str)
 
+    MENU_CHANGE_LABELS = (
+        ('dishes_created', "plat(s) créé(s)"), ('dishes_updated', "plat(s) modifié(s)"),
+        ('menus_created', "menu(s) créé(s)"), ('menus_deleted', "menu(s) supprimé(s)"),
+        ('items_added', "élément(s) ajouté(s)"), ('items_updated', "élément(s) modifié(s)"),
+        ('items_removed', "élément(s) retiré(s)"), ('items_deleted', "élément(s) remplacé(s)"),
+        ('items_copied', "élément(s) copié(s)"),
+    )
+
+    def describe_menu_changes(changes):
+        parts = [f"{changes[key]} {label}" for key, label in MENU_CHANGE_LABELS if changes.get(key)]
+        return ", ".join(parts) if parts else "aucun changement"
+
     @app.route("/admin/menu", methods=['POST'])
     @admin_web_required
     def create_admin_menu(current_user):
         menu_date_str = request.form.get('menu_date')
+        wants_json = request.accept_mimetypes.best == 'application/json'
         try:
             menu_date = datetime.strptime(menu_date_str, "%Y-%m-%d").date()
-            DailyMenu.query.filter_by(menu_date=menu_date).delete()
-            db.session.flush()
             dishes_to_process = []
             i = 0
             while f"dishes[{i}][name]" in request.form:
@@ -321,74 +437,60 @@ def create_app(test_config=None):
                         "cafeteria_ids": cafeteria_ids,
                     })
                 i += 1
-            menu_cache = {}
-            for dish_data in dishes_to_process:
-                dish = None
-                if dish_data['dish_id'] and dish_data['dish_id'].isdigit():
-                    temp_dish = Dish.get_by_id(int(dish_data['dish_id']))
-                    if temp_dish and temp_dish.name == dish_data['name']:
-                        dish = temp_dish
-                if not dish:
-                    dish = Dish.query.filter(Dish.name.ilike(dish_data['name'])).first()
-                if dish:
-                    dish.description = dish_data['description']
-                    dish.dine_in_price = dish_data['dine_in_price']
-                    dish.dish_type = dish_data['dish_type']
-                else:
-                    dish = Dish(
-                        name=dish_data['name'],
-                        description=dish_data['description'],
-                        dine_in_price=dish_data['dine_in_price'],
-                        dish_type=dish_data['dish_type']
-                    )
-                db.session.add(dish)
-                db.session.flush()
-                for cid in dish_data['cafeteria_ids']:
-                    menu = menu_cache.get(cid)
-                    if not menu:
-                        menu = DailyMenu(cafeteria_id=cid, menu_date=menu_date)
-                        db.session.add(menu)
-                        db.session.flush()
-                        menu_cache[cid] = menu
-                    item = DailyMenuItem(menu_id=menu.menu_id, dish_id=dish.dish_id, dish_role=dish_data['dish_type'])
-                    db.session.add(item)
-            db.session.commit()
-            flash(f"Menus du {menu_date_str} mis à jour.", "success")
+            # Seules les différences avec les menus existants sont écrites
+            changes = DailyMenu.save_day(menu_date, dishes_to_process)
+            if wants_json:
+                return jsonify({"menu_date": menu_date_str, "changes": changes}), 200
+            flash(f"Menus du {menu_date_str} mis à jour : {describe_menu_changes(changes)}.", "success")
         except Exception as e:
             db.session.rollback()
+            if wants_json:
+                return jsonify({"error": f"Erreur lors de la mise à jour du menu : {e}"}), 400
             flash(f"Erreur lors de la mise à jour du menu : {e}", "error")
             traceback.print_exc()
         return redirect(url_for('admin_dashboard', date=menu_date_str or ''))
 
+    @app.route("/admin/menu/schedule", methods=['POST'])
+    @admin_web_required
+    def schedule_admin_menus(current_user):
+        source_date_str = request.form.get('source_date')
+        # Les listes du formulaire (cases à cocher) sont lues avec getlist
+        data = request.form.to_dict()
+        data['cafeteria_ids'] = request.form.getlist('cafeteria_ids')
+        data['weekdays'] = request.form.getlist('weekdays')
+        try:
+            changes = DailyMenu.schedule(**parse_schedule(data))
+            flash(f"Menus du {data.get('start_date')} au {data.get('end_date')} planifiés : "
+                  f"{describe_menu_changes(changes)}.", "success")
+        except ValueError as e:
+            db.session.rollback()
+            flash(f"Planification impossible : {e}", "error")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Erreur lors de la planification des menus : {e}", "error")
+            traceback.print_exc()
+        return redirect(url_for('admin_dashboard', date=source_date_str or ''))
+
     @app.route("/admin/users")
     @admin_web_required
     def admin_users(current_user):
         search_query = request.args.get('q', '').strip()
         role_filter = request.args.get('role', '').strip()
 
-        query = AppUser.query
-
-        if search_query:
-            like_pattern = f"%{search_query}%"
-            query = query.filter(or_(
-                AppUser.last_name.ilike(like_pattern),
-                AppUser.first_name.ilike(like_pattern),
-                AppUser.email.ilike(like_pattern)
-            ))
-        
-        if role_filter:
-            query = query.filter(AppUser.role == role_filter)
-
-        users = query.order_by(AppUser.last_name, AppUser.first_name).all()
-        
+        # Recherche indexée et bornée : au plus USER_SEARCH_LIMIT lignes, les meilleures d'abord
+        limit = app.config.get('USER_SEARCH_LIMIT', SEARCH_LIMIT)
+        users = AppUser.search(search_query, role=role_filter or None, limit=limit)
+        truncated = len(users) >= limit
+
         # If the request is from HTMX, render only the partial table body
         if 'HX-Request' in request.headers:
-            return render_template("admin/partials/users_table_body.html", users=users)
+            return render_template("admin/partials/users_table_body.html", users=users, truncated=truncated)
 
         return render_template(
             "admin/users.html",
             user=current_user,
             users=users,
+            truncated=truncated,
             search_query=search_query,
             role_filter=role_filter
         )
@@ -396,7 +498,7 @@ def create_app(test_config=None):
     @app.route("/admin/cafeterias")
     @admin_web_required
     def admin_cafeterias(current_user):
-        cafeterias = Cafeteria.query.order_by(Cafeteria.name).all()
+        cafeterias = sorted(Cafeteria.directory().cafeterias, key=lambda c: c.name)
         return render_template("admin/cafeterias.html", user=current_user, cafeterias=cafeterias)
 
     @app.route("/admin/dishes")
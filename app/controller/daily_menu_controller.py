@@ -2,20 +2,68 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 from app.models import db                      # <-- Absolu
 from app.models.daily_menu import DailyMenu    # <-- Absolu
-from app.models.dish import Dish               # <-- Absolu
-from app.models.daily_menu_item import DailyMenuItem  # <-- Absolu
 from app.controller.auth import admin_required, api_require_login  # <-- Absolu
+from app.pagination import paginated_response
 
 daily_menu_bp = Blueprint('daily_menu_bp', __name__, url_prefix='/api/v1/daily-menu')
 
 # --- ROUTES ---
 
-# GET /api/v1/daily-menu/ - Liste tous les menus (ADMIN)
+# GET /api/v1/daily-menu/ - Liste les menus, par pages (?cursor=&limit=) (ADMIN)
 @daily_menu_bp.route('/', methods=['GET'])
 @admin_required
 def get_all_menus():
-    menus = DailyMenu.get_all_dicts()
-    return jsonify(menus), 200
+    return paginated_response(DailyMenu.get_page_records)
+
+def parse_schedule(data):
+    """
+    Read the arguments of DailyMenu.schedule from a JSON body or the dashboard form:
+    source_date, template_days (1 = un jour, 7 = une semaine), start_date, end_date,
+    and optionally cafeteria_ids, source_cafeteria_id, weekdays (0 = lundi) and replace.
+    Raises ValueError with a message for the user.
+    """
+    def parse_date(name):
+        try:
+            return datetime.strptime(data[name], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Paramètre '{name}' manquant ou invalide (format attendu : AAAA-MM-JJ)")
+
+    def parse_ids(name):
+        if not data.get(name):
+            return None
+        try:
+            return [int(v) for v in data[name]]
+        except (TypeError, ValueError):
+            raise ValueError(f"Paramètre '{name}' invalide (liste d'entiers attendue)")
+
+    try:
+        period = int(data.get('template_days') or 1)
+        source_cafeteria_id = int(data['source_cafeteria_id']) if data.get('source_cafeteria_id') else None
+    except (TypeError, ValueError):
+        raise ValueError("Paramètres 'template_days' ou 'source_cafeteria_id' invalides")
+    weekdays = parse_ids('weekdays')
+    if weekdays is not None and not set(weekdays) <= set(range(7)):
+        raise ValueError("Les jours de la semaine vont de 0 (lundi) à 6 (dimanche)")
+    return {
+        'source_start': parse_date('source_date'), 'start_date': parse_date('start_date'), 'end_date': parse_date('end_date'),
+        'period': period, 'cafeteria_ids': parse_ids('cafeteria_ids'), 'source_cafeteria_id': source_cafeteria_id,
+        'weekdays': set(weekdays) if weekdays is not None else None,
+        'replace': data.get('replace') in (True, 'true', '1', 'on'),
+    }
+
+# POST /api/v1/daily-menu/schedule - Copie un jour ou une semaine modèle sur une période (ADMIN)
+@daily_menu_bp.route('/schedule', methods=['POST'])
+@admin_required
+def schedule_menus():
+    try:
+        changes = DailyMenu.schedule(**parse_schedule(request.get_json(silent=True) or {}))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Erreur lors de la planification des menus', 'details': str(e)}), 500
+    return jsonify(changes), 200
 
 # GET /api/v1/daily-menu/<int:menu_id> - Affiche un menu (ADMIN)
 @daily_menu_bp.route('/<int:menu_id>', methods=['GET'])
@@ -36,27 +84,8 @@ def get_menu_for_cafeteria(current_user, cafeteria_id):
     except ValueError:
         return jsonify({"error": "Format de date invalide. Utilisez YYYY-MM-DD."}), 400
 
-    daily_menu = DailyMenu.query.filter_by(
-        cafeteria_id=cafeteria_id,
-        menu_date=selected_date
-    ).first()
-    
-    if not daily_menu:
-        return jsonify({"menu": []})
-    
-    menu_items = db.session.query(Dish, DailyMenuItem).join(
-        DailyMenuItem, Dish.dish_id == DailyMenuItem.dish_id
-    ).filter(
-        DailyMenuItem.menu_id == daily_menu.menu_id
-    ).order_by(DailyMenuItem.display_order).all()
-    
-    menu_data = [
-        {
-            "dish_id": dish.dish_id, "name": dish.name, "description": dish.description,
-            "price": float(dish.dine_in_price), "dish_type": dish.dish_type, "role": menu_item.dish_role
-        } for dish, menu_item in menu_items
-    ]
-    return jsonify({"menu": menu_data}), 200
+    snapshot = DailyMenu.get_menu_snapshot(cafeteria_id, selected_date)
+    return jsonify({"menu": snapshot.api}), 200
 
 
 # POST /api/v1/daily-menu - Créer un menu (ADMIN)
@@ -71,6 +100,7 @@ def create_menu():
             menu_date=menu_date
         )
         db.session.commit()
+        DailyMenu.invalidate_menu_cache(menu.cafeteria_id, menu.menu_date)
         return jsonify(menu.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -85,12 +115,15 @@ def update_menu(menu_id):
         return jsonify({'error': 'Menu non trouvé'}), 404
     data = request.get_json()
     menu_date = datetime.strptime(data['menu_date'], '%Y-%m-%d').date() if data.get('menu_date') else None
+    previous_key = (menu.cafeteria_id, menu.menu_date)
     
     success = menu.update_menu(
         cafeteria_id=data.get('cafeteria_id'),
         menu_date=menu_date
     )
     if success:
+        DailyMenu.invalidate_menu_cache(*previous_key)
+        DailyMenu.invalidate_menu_cache(menu.cafeteria_id, menu.menu_date)
         return jsonify(menu.to_dict()), 200
     else:
         return jsonify({'error': 'Échec de la mise à jour'}), 400
@@ -102,7 +135,9 @@ def delete_menu(menu_id):
     menu = DailyMenu.get_by_id(menu_id)
     if not menu:
         return jsonify({'error': 'Menu non trouvé'}), 404
+    key = (menu.cafeteria_id, menu.menu_date)
     if menu.delete_menu():
+        DailyMenu.invalidate_menu_cache(*key)
         return jsonify({'message': 'Menu supprimé'}), 200
     else:
         return jsonify({'error': 'Suppression impossible'}), 500
\ No newline at end of file
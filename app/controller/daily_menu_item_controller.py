@@ -2,11 +2,18 @@
 
 from flask import Blueprint, request, jsonify
 from app.models import db
+from app.models.daily_menu import DailyMenu
 from app.models.daily_menu_item import DailyMenuItem
 from app.controller.auth import admin_required, api_require_login
 
 daily_menu_item_bp = Blueprint('daily_menu_item_bp', __name__, url_prefix='/api/v1/daily-menu-item')
 
+def invalidate_menu_of(menu_id):
+    """Forget the cached menu an item belongs to."""
+    menu = DailyMenu.get_by_id(menu_id)
+    if menu:
+        DailyMenu.invalidate_menu_cache(menu.cafeteria_id, menu.menu_date)
+
 # --- ROUTES ---
 
 # Note : Les opérations sur les 'daily_menu_item' sont généralement des tâches administratives
@@ -16,7 +23,7 @@ daily_menu_item_bp = Blueprint('daily_menu_item_bp', __name__, url_prefix='/api/
 @daily_menu_item_bp.route('/by-menu/<int:menu_id>', methods=['GET'])
 @admin_required
 def get_items_for_menu(menu_id):
-    items = DailyMenuItem.query.filter_by(menu_id=menu_id).all()
+    items = DailyMenuItem.get_by_menu(menu_id)
     return jsonify([item.to_dict() for item in items]), 200
 
 # POST /api/v1/daily-menu-item - Ajouter un plat à un menu (ADMIN)
@@ -32,6 +39,7 @@ def create_menu_item():
             display_order=data.get('display_order', 1)
         )
         db.session.commit()
+        invalidate_menu_of(item.menu_id)
         return jsonify(item.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -51,6 +59,7 @@ def update_menu_item(item_id):
         display_order=data.get('display_order')
     )
     if success:
+        invalidate_menu_of(item.menu_id)
         return jsonify(item.to_dict()), 200
     else:
         return jsonify({'error': 'Échec de la mise à jour'}), 400
@@ -62,7 +71,9 @@ def delete_menu_item(item_id):
     item = DailyMenuItem.get_by_id(item_id)
     if not item:
         return jsonify({'error': 'Item de menu non trouvé'}), 404
+    menu_id = item.menu_id
     if item.delete_menu_item():
+        invalidate_menu_of(menu_id)
         return jsonify({'message': 'Item de menu supprimé'}), 200
     else:
         return jsonify({'error': 'Suppression impossible'}), 500
\ No newline at end of file
@@ -2,19 +2,36 @@ from flask import Blueprint, request, jsonify, session
 from functools import wraps
 from sqlalchemy.exc import IntegrityError
 from app.models.dish import Dish
+from app.models.dish_index import SUGGESTION_LIMIT
+from app.models.daily_menu import DailyMenu
 from app.models.app_user import AppUser
 from app.models import db
 from app.controller.auth import admin_required, api_require_login
+from app.pagination import paginated_response
 
 dish_bp = Blueprint('dish_bp', __name__, url_prefix='/api/v1/dish')
 
+MAX_SUGGESTIONS = 50
+
 # --- ROUTES ---
 
-# GET /api/v1/dish - Liste tous les plats (lecture publique)
+# GET /api/v1/dish - Liste les plats, par pages (?cursor=&limit=) (lecture publique)
 @dish_bp.route('/', methods=['GET'])
 @api_require_login
 def get_all_dishes(current_user):
-    return jsonify([dish.to_dict() for dish in Dish.query.all()]), 200
+    return paginated_response(Dish.get_page_records)
+
+# GET /api/v1/dish/search?prefix=&limit= - Suggestions pour l'autocomplétion (index en mémoire)
+@dish_bp.route('/search', methods=['GET'])
+@api_require_login
+def search_dishes(current_user):
+    try:
+        limit = int(request.args.get('limit', SUGGESTION_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Paramètre limit invalide'}), 400
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return jsonify({'error': f'Le paramètre limit doit être compris entre 1 et {MAX_SUGGESTIONS}'}), 400
+    return jsonify(Dish.search_prefix(request.args.get('prefix', ''), limit)), 200
 
 # GET /api/v1/dish/<int:dish_id> - Affiche un plat (lecture publique)
 @dish_bp.route('/<int:dish_id>', methods=['GET'])
@@ -39,6 +56,7 @@ def create_dish():
         )
         db.session.add(dish)
         db.session.commit()
+        Dish.reindex(dish)
         return jsonify(dish.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -57,6 +75,9 @@ def update_dish(dish_id):
             if field in data:
                 setattr(dish, field, data[field])
         db.session.commit()
+        # A dish can appear on any number of menus: drop all cached menus
+        DailyMenu.invalidate_menu_cache()
+        Dish.reindex(dish)
         return jsonify(dish.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -72,6 +93,8 @@ def delete_dish(dish_id):
     try:
         db.session.delete(dish)
         db.session.commit()
+        DailyMenu.invalidate_menu_cache()
+        Dish.reindex(dish_id=dish_id)
         # Return an empty response with 200 OK for HTMX.
         return '', 200
     except IntegrityError:
@@ -4,6 +4,8 @@ from flask import Blueprint, request, jsonify
 from app.models import db
 from app.models.order_item import OrderItem
 from app.controller.auth import admin_required, api_require_login
+from app.pagination import paginated_response
+from app.export import export_response
 
 order_item_bp = Blueprint('order_item_bp', __name__, url_prefix='/api/v1/order-item')
 
@@ -11,12 +13,18 @@ order_item_bp = Blueprint('order_item_bp', __name__, url_prefix='/api/v1/order-i
 # Les OrderItems sont normalement gérés via les réservations.
 # Ces routes sont pour l'administration directe.
 
-# GET /api/v1/order-item - Liste tous les items de commande (ADMIN)
+# GET /api/v1/order-item - Liste les items de commande, par pages (?cursor=&limit=) (ADMIN)
 @order_item_bp.route('/', methods=['GET'])
 @admin_required
 def get_all_order_items():
-    items = OrderItem.get_all_dicts()
-    return jsonify(items), 200
+    return paginated_response(OrderItem.get_page_records)
+
+# GET /api/v1/order-item/export - Export en flux (NDJSON ou CSV) des items de commande
+# (?format=&from=&to=&cafeteria_id=, filtres sur la réservation) (ADMIN)
+@order_item_bp.route('/export', methods=['GET'])
+@admin_required
+def export_order_items():
+    return export_response(OrderItem.export_rows, 'order-items')
 
 # GET /api/v1/order-item/<int:item_id> - Affiche un item de commande (ADMIN)
 @order_item_bp.route('/<int:item_id>', methods=['GET'])
@@ -1,18 +1,19 @@
 # app/controller/reservation_controller.py
 
-from flask import Blueprint, request, jsonify
-from decimal import Decimal
+import json
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 
 # Import models et db avec imports absolus (important !)
-from app.models.order_item import OrderItem
-from app.models.reservation import Reservation
-from app.models.dish import Dish
-from app.models.cafeteria import Cafeteria
+from app.models.reservation import Reservation, OrderError
 from app.models.app_user import AppUser
+from app.models.dish import Dish
 from app.models import db
 
 # Import the authentication decorator from the main controller
-from .auth import admin_required, api_require_login
+from .auth import admin_required, api_require_login, kiosk_required
+from app.pagination import paginated_response
+from app.export import export_response
+from app.idempotency import idempotent
 
 # Create a Blueprint for reservation routes
 reservation_bp = Blueprint('reservation_bp', __name__, url_prefix='/api/v1/reservations')
@@ -21,6 +22,7 @@ reservation_bp = Blueprint('reservation_bp', __name__, url_prefix='/api/v1/reser
 
 @reservation_bp.route('/', methods=['POST'])
 @api_require_login
+@idempotent
 def create_reservation(current_user):
     """
     Creates a new reservation (order) for the current user.
@@ -44,86 +46,101 @@ def create_reservation(current_user):
         return jsonify({"error": "The 'items' field must be a non-empty list."}), 400
 
     try:
-        # --- 1. Validation and Cost Calculation ---
-        total_cost = Decimal('0.0')
-        order_details = []
-
-        for item in items_data:
-            dish = Dish.get_by_id(item.get('dish_id'))
-            if not dish:
-                # If any dish is invalid, fail the entire transaction
-                db.session.rollback()
-                return jsonify({"error": f"Dish with ID {item.get('dish_id')} not found."}), 404
-            
-            quantity = int(item.get('quantity', 1))
-            if quantity <= 0:
-                return jsonify({"error": f"Quantity for dish '{dish.name}' must be positive."}), 400
-
-            price = Decimal(dish.dine_in_price)
-            total_cost += price * quantity
-            order_details.append({
-                "dish_id": dish.dish_id,
-                "quantity": quantity,
-                "is_takeaway": bool(item.get('is_takeaway', False)),
-                "applied_price": price
-            })
-        
-        # --- 2. Check User Balance ---
-        if current_user.balance < total_cost:
-            return jsonify({
-                "error": "Insufficient balance.",
-                "required_balance": float(total_cost),
-                "current_balance": float(current_user.balance)
-            }), 402  # 402 Payment Required is a fitting status code
-
-        # --- 3. Create Reservation and Order Items in a Transaction ---
-        # Create the main reservation record
-        new_reservation = Reservation.create_reservation(
+        # Pricing, inserts and balance debit in a fixed number of statements
+        new_reservation = Reservation.place_order(
             user_id=current_user.user_id,
             cafeteria_id=data['cafeteria_id'],
-            total=total_cost,
+            items=items_data,
             status='pending'  # Orders start as pending until fulfilled
         )
-        db.session.add(new_reservation)
-        db.session.flush()  # Assigns an ID to new_reservation without committing
-
-        # Create the individual order items linked to the reservation
-        for detail in order_details:
-            OrderItem.create_order_item(
-                reservation_id=new_reservation.reservation_id,
-                **detail  # Unpacks the dictionary into arguments
-            )
-
-        # --- 4. Deduct from User's Balance ---
-        current_user.balance -= total_cost
-        
-        # --- 5. Commit the Transaction ---
         db.session.commit()
         
         return jsonify(new_reservation.to_dict()), 201  # 201 Created
 
+    except OrderError as e:
+        # If any line is invalid or the balance is insufficient, fail the entire transaction
+        db.session.rollback()
+        return jsonify({"error": e.message, **e.details}), e.status_code
+
     except Exception as e:
         db.session.rollback()  # Roll back all changes if any error occurs
         return jsonify({"error": "An internal error occurred while creating the reservation.", "details": str(e)}), 500
 
 
+@reservation_bp.route('/bulk', methods=['POST'])
+@kiosk_required
+def bulk_create_reservations():
+    """
+    Bulk ingest of reservations replayed by offline kiosks (kiosk or admin account).
+    The body is streamed NDJSON, one reservation per line:
+    { "user_id": 3, "cafeteria_id": 1, "reservation_datetime": "2025-06-30T11:52:00",
+      "items": [{ "dish_id": 1, "quantity": 1, "is_takeaway": false }] }
+
+    Prices are checked against the dish catalog loaded once for the whole request, and
+    records are committed in batches of `?batch_size=` (BULK_INGEST_BATCH_SIZE by default).
+    The response is streamed NDJSON as well: one result per input line, then a summary.
+    """
+    batch_size = request.args.get('batch_size', current_app.config.get('BULK_INGEST_BATCH_SIZE', 500), type=int)
+    if not batch_size or batch_size <= 0:
+        return jsonify({"error": "batch_size must be a positive integer."}), 400
+    dishes = Dish.get_price_map()
+
+    def commit_batch(batch, summary):
+        try:
+            results = Reservation.place_orders_bulk(batch, dishes)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            results = [(line, None, f"Batch failed: {e}") for line, _ in batch]
+        for line, reservation_id, error in results:
+            if error:
+                summary['failed'] += 1
+                yield json.dumps({"line": line, "status": "error", "error": error}) + "\n"
+            else:
+                summary['created'] += 1
+                yield json.dumps({"line": line, "status": "created", "reservation_id": reservation_id}) + "\n"
+
+    def generate():
+        summary = {"created": 0, "failed": 0}
+        batch = []
+        for line, raw in enumerate(request.stream, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                batch.append((line, json.loads(raw)))
+            except ValueError:
+                summary['failed'] += 1
+                yield json.dumps({"line": line, "status": "error", "error": "Invalid JSON."}) + "\n"
+                continue
+            if len(batch) >= batch_size:
+                yield from commit_batch(batch, summary)
+                batch = []
+        if batch:
+            yield from commit_batch(batch, summary)
+        yield json.dumps({"summary": summary}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @reservation_bp.route('/', methods=['GET'])
 @api_require_login
 def get_user_reservations(current_user):
     """
-    Get the current user's full reservation history, newest first.
+    Get the current user's reservation history, newest first, one page at a time (?cursor=&limit=).
     (This functionality is moved from the main controller for better organization).
     """
-    reservations = Reservation.query.filter_by(user_id=current_user.user_id).order_by(Reservation.reservation_datetime.desc()).all()
-    
-    # We create a more detailed dictionary for the response
-    reservations_data = []
-    for r in reservations:
-        data = r.to_dict()
-        data['order_items'] = [item.to_dict() for item in r.order_items]
-        reservations_data.append(data)
+    return paginated_response(Reservation.get_user_page_records, user_id=current_user.user_id)
+
 
-    return jsonify(reservations_data), 200
+@reservation_bp.route('/export', methods=['GET'])
+@admin_required
+def export_reservations():
+    """
+    Stream every reservation (all users) as NDJSON or CSV, for finance exports.
+    Filters: ?from=YYYY-MM-DD&to=YYYY-MM-DD (exclusive)&cafeteria_id=, ?format=ndjson|csv.
+    """
+    return export_response(Reservation.export_rows, 'reservations')
 
 
 @reservation_bp.route('/<int:reservation_id>', methods=['GET'])
@@ -166,18 +183,20 @@ def cancel_reservation(current_user, reservation_id):
         return jsonify({"error": f"Cannot cancel a reservation with status '{reservation.status}'. Only 'pending' orders can be cancelled."}), 409 # 409 Conflict
 
     try:
+        # Update the reservation status (only one concurrent request can win)
+        if not reservation.cancel_if_pending():
+            db.session.rollback()
+            return jsonify({"error": "Cannot cancel this reservation anymore. Only 'pending' orders can be cancelled."}), 409
+
         # Refund the total amount to the user's balance
-        current_user.balance += reservation.total
-        
-        # Update the reservation status
-        reservation.status = 'cancelled'
+        new_balance = AppUser.credit_balance(current_user.user_id, reservation.total)
         
         db.session.commit()
         
         return jsonify({
             "message": "Reservation cancelled successfully. Funds have been returned to your balance.",
             "reservation": reservation.to_dict(),
-            "new_balance": float(current_user.balance)
+            "new_balance": float(new_balance)
         }), 200
 
     except Exception as e:
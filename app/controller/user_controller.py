@@ -8,15 +8,25 @@ from sqlalchemy.exc import IntegrityError
 from app.models.app_user import AppUser
 from app.models import db
 from app.controller.auth import admin_required, api_require_login
+from app.pagination import paginated_response
+from app.export import export_response
+from app.idempotency import idempotent
 
 user_bp = Blueprint('user_bp', __name__, url_prefix='/api/v1/user')
 
 
-# GET /api/v1/user - Liste tous les utilisateurs (admin seulement)
+# GET /api/v1/user - Liste les utilisateurs, par pages (?cursor=&limit=) (admin seulement)
 @user_bp.route('/', methods=['GET'])
 @admin_required
 def list_users():
-    return jsonify(AppUser.get_all_dicts()), 200
+    return paginated_response(AppUser.get_page_records)
+
+
+# GET /api/v1/user/export - Export en flux (NDJSON ou CSV) des utilisateurs (?format=&from=&to=) (admin seulement)
+@user_bp.route('/export', methods=['GET'])
+@admin_required
+def export_users():
+    return export_response(AppUser.export_rows, 'users', with_cafeteria=False)
 
 
 # GET /api/v1/user/<int:user_id> - Récupérer un utilisateur par ID (admin ou soi-même)
@@ -115,6 +125,7 @@ def delete_user(current_user, user_id):
 # POST /api/v1/user/balance - Créditer le solde de l'utilisateur connecté
 @user_bp.route('/balance', methods=['POST'])
 @api_require_login
+@idempotent
 def add_to_balance(current_user):
     """Add funds to the current user's balance."""
     data = request.get_json()
@@ -123,11 +134,11 @@ def add_to_balance(current_user):
     try:
         amount = Decimal(data.get("amount", "0"))
         if Decimal("0.01") <= amount <= Decimal("500.00"):
-            current_user.balance += amount
+            new_balance = AppUser.credit_balance(current_user.user_id, amount)
             db.session.commit()
             return jsonify({
                 "message": f"Montant de ${amount:.2f} ajouté à votre solde avec succès !",
-                "new_balance": float(current_user.balance)
+                "new_balance": float(new_balance)
             }), 200
         else:
             return jsonify({"error": "Veuillez entrer un montant entre 0.01$ et 500.00$"}), 400
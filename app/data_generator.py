@@ -0,0 +1,223 @@
+# app/data_generator.py
+"""
+Synthetic dataset generator for load testing (flask cantina generate).
+
+Unlike db_seeder.py (a handful of demo rows), this writes production-sized volumes:
+tens of thousands of users, years of daily menus for every cafeteria and millions
+of reservations / order items, with most orders around the lunch peak.
+
+- Rows are produced in chunks and written with COPY on PostgreSQL,
+  with multi-row INSERTs (executemany) on other databases.
+- Primary keys are assigned here (after the current maximum), so nothing has to be
+  read back; PostgreSQL sequences are moved past the new ids at the end.
+- Passwords come from a small pool hashed once, every user reuses one of them.
+- The monthly spending rollup is rebuilt at the end.
+- The generator appends: it can run on a bootstrapped database (it needs the
+  cafeterias and dishes) and several times in a row.
+"""
+import csv
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from app.db_seeder import seed_password_hash
+from app.models import db, AppUser, Cafeteria, Dish, DailyMenu, DailyMenuItem, Reservation, OrderItem, UserMonthlySpending
+
+PASSWORDS = ('pass123', 'password', 'cantina2025', 'loadtest')
+FIRST_NAMES = ('Jakub', 'Anna', 'Martin', 'Lucia', 'Peter', 'Zuzana', 'Tomáš', 'Eva', 'Marek', 'Katarína',
+               'John', 'Emma', 'Lukas', 'Sofia', 'Hugo', 'Chloé', 'Louis', 'Léa', 'Jan', 'Mária')
+LAST_NAMES = ('Novák', 'Kováčová', 'Horváth', 'Varga', 'Tóth', 'Nagy', 'Baláž', 'Szabó', 'Molnár', 'Smith',
+              'Martin', 'Bernard', 'Dubois', 'Lefebvre', 'Moreau', 'Kráľ', 'Hudák', 'Urban', 'Král', 'Benko')
+
+# Répartition des commandes dans la journée : (poids, heure moyenne, écart-type en minutes)
+ORDER_TIME_PEAKS = ((0.70, 12.25, 35), (0.20, 18.0, 45))
+OPENING_HOURS = (7, 20)
+ORDER_STATUSES = (('completed', 0.90), ('pending', 0.07), ('cancelled', 0.03))
+
+
+class BulkWriter:
+    """Write rows (tuples) to a table: COPY on PostgreSQL, executemany INSERT elsewhere."""
+
+    def __init__(self, connection, batch_size: int = 10000):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.use_copy = connection.dialect.name == 'postgresql'
+
+    def write(self, table, columns, rows) -> int:
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                count += self._flush(table, columns, batch)
+                batch = []
+        if batch:
+            count += self._flush(table, columns, batch)
+        return count
+
+    def _flush(self, table, columns, batch) -> int:
+        if self.use_copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor = self.connection.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            finally:
+                cursor.close()
+        else:
+            self.connection.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+        return len(batch)
+
+    def reset_sequence(self, table, id_column):
+        """Move the PostgreSQL SERIAL sequence past the ids written explicitly."""
+        if self.use_copy:
+            self.connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{id_column}'), "
+                f"(SELECT COALESCE(MAX({id_column}), 1) FROM {table.name}))"
+            )
+
+
+def _next_id(connection, column) -> int:
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _order_datetime(rng, day: date) -> datetime:
+    """Time of an order on `day`, concentrated around lunch (and a smaller dinner peak)."""
+    draw = rng.random()
+    for weight, hour, sigma in ORDER_TIME_PEAKS:
+        if draw < weight:
+            minutes = rng.gauss(hour * 60, sigma)
+            break
+        draw -= weight
+    else:
+        minutes = rng.uniform(OPENING_HOURS[0] * 60, OPENING_HOURS[1] * 60)
+    minutes = min(max(minutes, OPENING_HOURS[0] * 60), OPENING_HOURS[1] * 60 - 1)
+    return datetime.combine(day, datetime.min.time()) + timedelta(minutes=minutes, seconds=rng.randrange(60))
+
+
+def generate_dataset(users: int = 50000, days: int = 730, orders: int = 1000000, start_date: date = None,
+                     seed: int = 42, batch_size: int = 10000, echo=print) -> dict:
+    """
+    Append a synthetic dataset to the database (needs an app context and bootstrapped cafeterias/dishes).
+    Menus cover `days` days ending today (or starting at `start_date`); orders fall on those days.
+    Returns the number of rows written per table.
+    """
+    rng = random.Random(seed)
+    start_date = start_date or date.today() - timedelta(days=days - 1)
+    day_list = [start_date + timedelta(days=i) for i in range(days)]
+    counts = {}
+
+    with db.engine.begin() as connection:
+        writer = BulkWriter(connection, batch_size)
+        cafeteria_ids = connection.execute(select(Cafeteria.cafeteria_id)).scalars().all()
+        dishes = connection.execute(select(Dish.dish_id, Dish.dish_type, Dish.dine_in_price)).all()
+        if not cafeteria_ids or not dishes:
+            raise RuntimeError("No cafeteria or dish found: run `flask cantina bootstrap` first.")
+        dishes_by_type = {}
+        for dish in dishes:
+            dishes_by_type.setdefault(dish.dish_type, []).append(dish)
+        mains = dishes_by_type.get('main_course') or dishes
+        extras = [d for d in dishes if d.dish_type != 'main_course'] or dishes
+
+        # --- Users ---
+        started = time.perf_counter()
+        hashes = [seed_password_hash(p) for p in PASSWORDS]
+        first_user_id = _next_id(connection, AppUser.user_id)
+        now = datetime.utcnow()
+
+        def user_rows():
+            for user_id in range(first_user_id, first_user_id + users):
+                role = 'staff' if rng.random() < 0.15 else 'student'
+                balance = Decimal(rng.randrange(0, 10000)) / 100
+                yield (user_id, rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES), f"user{user_id}@loadtest.example.com",
+                       rng.choice(hashes), balance, role, now, now)
+
+        counts['app_user'] = writer.write(
+            AppUser.__table__,
+            ('user_id', 'last_name', 'first_name', 'email', 'password', 'balance', 'role', 'created_at', 'updated_at'),
+            user_rows()
+        )
+        writer.reset_sequence(AppUser.__table__, 'user_id')
+        echo(f"  - {counts['app_user']} users in {time.perf_counter() - started:.1f}s")
+
+        # --- Daily menus (the (cafeteria, date) pairs that already exist are kept) ---
+        started = time.perf_counter()
+        existing = set(connection.execute(
+            select(DailyMenu.cafeteria_id, DailyMenu.menu_date).where(DailyMenu.menu_date.between(day_list[0], day_list[-1]))
+        ).all())
+        first_menu_id = _next_id(connection, DailyMenu.menu_id)
+        menus = [(cafeteria_id, day) for day in day_list for cafeteria_id in cafeteria_ids if (cafeteria_id, day) not in existing]
+        counts['daily_menu'] = writer.write(
+            DailyMenu.__table__, ('menu_id', 'cafeteria_id', 'menu_date', 'created_at'),
+            ((first_menu_id + i, cafeteria_id, day, now) for i, (cafeteria_id, day) in enumerate(menus))
+        )
+        writer.reset_sequence(DailyMenu.__table__, 'menu_id')
+
+        first_item_id = _next_id(connection, DailyMenuItem.menu_item_id)
+
+        def menu_item_rows():
+            item_id = first_item_id
+            for menu_id in range(first_menu_id, first_menu_id + len(menus)):
+                chosen = (rng.sample(dishes_by_type.get('soup', extras), 1) + rng.sample(mains, min(3, len(mains)))
+                          + rng.sample(dishes_by_type.get('dessert', extras), 1) + rng.sample(dishes_by_type.get('drink', extras), 1))
+                for order, dish in enumerate(chosen):
+                    yield (item_id, menu_id, dish.dish_id, dish.dish_type, order)
+                    item_id += 1
+
+        counts['daily_menu_item'] = writer.write(
+            DailyMenuItem.__table__, ('menu_item_id', 'menu_id', 'dish_id', 'dish_role', 'display_order'), menu_item_rows()
+        )
+        writer.reset_sequence(DailyMenuItem.__table__, 'menu_item_id')
+        echo(f"  - {counts['daily_menu']} menus, {counts['daily_menu_item']} menu items in {time.perf_counter() - started:.1f}s")
+
+        # --- Reservations and order items (written side by side, chunk by chunk) ---
+        started = time.perf_counter()
+        # Les ids réels (trous laissés par les suppressions, comptes créés à la main), ceux d'avant et les nouveaux
+        user_ids = connection.execute(select(AppUser.user_id).order_by(AppUser.user_id)).scalars().all()
+        # Quelques cafétérias concentrent la majorité des commandes
+        cafeteria_weights = [1.0 / (rank + 1) for rank in range(len(cafeteria_ids))]
+        statuses, status_weights = zip(*ORDER_STATUSES)
+        reservation_id = _next_id(connection, Reservation.reservation_id)
+        item_id = _next_id(connection, OrderItem.item_id)
+        counts['reservation'] = counts['order_item'] = 0
+
+        remaining = orders
+        while remaining > 0:
+            chunk = min(batch_size, remaining)
+            remaining -= chunk
+            reservations, items = [], []
+            for cafeteria_id, status in zip(rng.choices(cafeteria_ids, cafeteria_weights, k=chunk),
+                                            rng.choices(statuses, status_weights, k=chunk)):
+                lines = [rng.choice(mains)] + rng.sample(extras, rng.randrange(0, 4))
+                total = Decimal('0.00')
+                for dish in lines:
+                    quantity = 2 if rng.random() < 0.05 else 1
+                    total += dish.dine_in_price * quantity
+                    items.append((item_id, reservation_id, dish.dish_id, quantity, rng.random() < 0.2, dish.dine_in_price))
+                    item_id += 1
+                reservations.append((reservation_id, rng.choice(user_ids), cafeteria_id,
+                                     _order_datetime(rng, rng.choice(day_list)), total, status))
+                reservation_id += 1
+            counts['reservation'] += writer.write(
+                Reservation.__table__,
+                ('reservation_id', 'user_id', 'cafeteria_id', 'reservation_datetime', 'total', 'status'), reservations
+            )
+            counts['order_item'] += writer.write(
+                OrderItem.__table__,
+                ('item_id', 'reservation_id', 'dish_id', 'quantity', 'is_takeaway', 'applied_price'), items
+            )
+        writer.reset_sequence(Reservation.__table__, 'reservation_id')
+        writer.reset_sequence(OrderItem.__table__, 'item_id')
+        echo(f"  - {counts['reservation']} reservations, {counts['order_item']} order items in {time.perf_counter() - started:.1f}s")
+
+        # --- Monthly spending rollup, recomputed once from the reservations ---
+        started = time.perf_counter()
+        counts['user_monthly_spending'] = UserMonthlySpending.rebuild(connection)
+        echo(f"  - {counts['user_monthly_spending']} monthly spending rows in {time.perf_counter() - started:.1f}s")
+
+    return counts
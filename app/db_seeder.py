@@ -2,6 +2,8 @@ import os
 import sys
 import random
 from datetime import date, timedelta
+from functools import lru_cache
+from werkzeug.security import generate_password_hash
 
 # Add parent directory to path to allow model imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -10,6 +12,11 @@ from app.models import (
     db, AppUser, Cafeteria, Dish, DailyMenu, DailyMenuItem, Reservation, OrderItem
 )
 
+@lru_cache(maxsize=None)
+def seed_password_hash(password):
+    """Hash of a seed password, computed once per process (the seed users share two passwords)."""
+    return generate_password_hash(password)
+
 def populate_database_if_empty():
     """Checks if the database is empty and populates it with initial data if it is."""
     if AppUser.query.first() is not None:
@@ -73,12 +80,12 @@ def populate_database_if_empty():
         dish_map = {d.name: d for d in Dish.query.all()}
 
         # Users
-        user1 = AppUser.create_user(last_name='Student', first_name='One', email='student1@example.com', password='pass123', balance=25.50, role='student')
-        user2 = AppUser.create_user(last_name='Faculty', first_name='One', email='faculty1@example.com', password='pass123', balance=40.00, role='staff')
-        user3 = AppUser.create_user(last_name='Novák', first_name='Jakub', email='jakub.novak@example.com', password='pass123', balance=18.75, role='student')
-        user4 = AppUser.create_user(last_name='Kováčová', first_name='Anna', email='anna.kovacova@example.com', password='pass123', balance=31.00, role='student')
-        user5 = AppUser.create_user(last_name='Smith', first_name='John', email='john.smith@example.com', password='pass123', balance=0.00, role='staff')
-        user6 = AppUser.create_user(last_name='Admin', first_name='Alice', email='admin@example.com', password='password', balance=100.00, role='admin')
+        user1 = AppUser.create_user(last_name='Student', first_name='One', email='student1@example.com', password='pass123', password_hash=seed_password_hash('pass123'), balance=25.50, role='student')
+        user2 = AppUser.create_user(last_name='Faculty', first_name='One', email='faculty1@example.com', password='pass123', password_hash=seed_password_hash('pass123'), balance=40.00, role='staff')
+        user3 = AppUser.create_user(last_name='Novák', first_name='Jakub', email='jakub.novak@example.com', password='pass123', password_hash=seed_password_hash('pass123'), balance=18.75, role='student')
+        user4 = AppUser.create_user(last_name='Kováčová', first_name='Anna', email='anna.kovacova@example.com', password='pass123', password_hash=seed_password_hash('pass123'), balance=31.00, role='student')
+        user5 = AppUser.create_user(last_name='Smith', first_name='John', email='john.smith@example.com', password='pass123', password_hash=seed_password_hash('pass123'), balance=0.00, role='staff')
+        user6 = AppUser.create_user(last_name='Admin', first_name='Alice', email='admin@example.com', password='password', password_hash=seed_password_hash('password'), balance=100.00, role='admin')
         db.session.commit()
         print("  - Users, Cafeterias, and Dishes created successfully.")
 
@@ -0,0 +1,113 @@
+# app/export.py
+"""
+Streaming exports (NDJSON or CSV) of large tables, for finance and reporting.
+
+The rows are read with a server-side cursor (yield_per: psycopg2 named cursor
+on PostgreSQL) as plain column tuples, never as ORM objects, and written to the
+response in chunks by a generator: memory stays flat whatever the size of the
+export, and the first bytes leave as soon as the first row is read.
+
+Query string: ?format=ndjson|csv, ?from=YYYY-MM-DD, ?to=YYYY-MM-DD (exclusive),
+?cafeteria_id= (only for the exports that support it).
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Response, jsonify, request, stream_with_context
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_BATCH_SIZE = 1000  # lignes lues par aller-retour du curseur, et par morceau envoyé
+
+
+class ExportError(ValueError):
+    """Invalid export parameter."""
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_chunks(columns, rows, fmt: str = 'ndjson', batch_size: int = EXPORT_BATCH_SIZE):
+    """Encode `rows` (tuples matching `columns`) as NDJSON or CSV, yielding one string per batch."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        encode = lambda row: writer.writerow([_csv_value(v) for v in row])
+    else:
+        encode = lambda row: buffer.write(json.dumps(dict(zip(columns, map(_json_value, row)))) + '\n')
+    # L'en-tête (CSV) et la première ligne partent tout de suite, le reste par lots.
+    pending = 0
+    first = True
+    for row in rows:
+        encode(row)
+        pending += 1
+        if first or pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending, first = 0, False
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ExportError(f"Paramètre '{name}' invalide (format attendu : AAAA-MM-JJ)")
+
+
+def export_args(with_cafeteria: bool = True):
+    """Read the format and the filters of an export from the query string."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Format inconnu, formats disponibles : {', '.join(EXPORT_FORMATS)}")
+    filters = {'start': _date_arg('from'), 'end': _date_arg('to')}
+    if with_cafeteria:
+        cafeteria_id = request.args.get('cafeteria_id')
+        try:
+            filters['cafeteria_id'] = int(cafeteria_id) if cafeteria_id else None
+        except ValueError:
+            raise ExportError("Paramètre 'cafeteria_id' invalide")
+    if filters['start'] and filters['end'] and filters['start'] >= filters['end']:
+        raise ExportError("La date 'from' doit précéder la date 'to'")
+    return fmt, filters
+
+
+def export_response(export_rows, name: str, with_cafeteria: bool = True):
+    """
+    Stream `export_rows(**filters)` -> (columns, row iterator) as an attachment named after `name`.
+    Parameter errors are answered (400) before anything is streamed.
+    """
+    try:
+        fmt, filters = export_args(with_cafeteria)
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        columns, rows = export_rows(**filters)
+        yield from export_chunks(columns, rows, fmt)
+
+    suffix = ''.join(f"-{d:%Y%m%d}" for d in (filters['start'], filters['end'] and filters['end'] - timedelta(days=1)) if d)
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}{suffix}.{fmt}"'
+    return response
@@ -0,0 +1,62 @@
+# app/gunicorn_conf.py
+"""
+Gunicorn configuration for production:
+    gunicorn -c app/gunicorn_conf.py app.main:app
+
+Every setting can be overridden through the environment (see below).
+The application is loaded once in the master (preload) and forked into the workers;
+each worker then drops the database connections inherited from the master.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5045')
+
+# Processus et threads : le hachage des mots de passe et le rendu des templates
+# sont liés au CPU, on répartit donc sur plusieurs processus.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+
+# Recyclage des workers après un certain nombre de requêtes (fuites mémoire),
+# avec un peu d'aléa pour qu'ils ne redémarrent pas tous en même temps.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+
+# Arrêt propre : les requêtes en cours ont ce délai pour se terminer après SIGTERM.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Les métriques (/metrics) sont agrégées entre les workers via ce répertoire.
+os.environ.setdefault('METRICS_DIR', '/tmp/cantina-metrics')
+
+
+def on_starting(server):
+    """Start from an empty metrics directory (snapshots of a previous run are stale)."""
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def post_fork(server, worker):
+    """
+    Do not share the master's pooled connections with the forked worker. The pool checkout
+    timer of app/metrics.py sits on the Engine, so it survives the new Pool.
+    """
+    from app.models import db
+    app = server.app.wsgi()  # application déjà chargée par le master (preload_app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Fold the metrics of an exited worker into the totals of the retired ones (see app/metrics.py)."""
+    from app.metrics import retire_process
+    retire_process(os.environ['METRICS_DIR'], worker.pid)
@@ -0,0 +1,213 @@
+# app/idempotency.py
+"""
+`Idempotency-Key` support for the write endpoints that charge a student (order, top-up).
+
+A client that retries a request with the same key gets the response of the first
+request back, without running it again: the first request claims the (user, key) row
+of the idempotency_key table before it runs, and stores its response when it ends.
+
+- A retry after the end replays the stored status, body and headers
+  (with `Idempotent-Replayed: true`), reading that row only.
+- A retry while the first request still runs waits for its response (IDEMPOTENCY_WAIT
+  seconds at most, then 409 + Retry-After), instead of running a second transaction.
+- The same key with another method, path or body is refused (422).
+- Responses >= 500 and exceptions are not stored: the key is released, a retry runs again.
+
+The commit of the request marks the row EXECUTED in its own transaction (before_commit of the
+session). A row that is still NULL after IDEMPOTENCY_LOCK_TIMEOUT committed nothing and is taken
+over by a retry; the first request, if it is only slow, then fails its commit (ClaimLost) instead
+of charging twice. An EXECUTED row is never taken over: if its response could not be stored
+(worker killed in between), the retries get a final 409 instead of running again.
+
+Rows live IDEMPOTENCY_TTL seconds; `flask cantina purge-sessions` deletes the older ones.
+Requests without the header, or without a logged-in user, are not affected. The order
+form of the cart carries a key drawn when it is rendered (`idempotency_key()` in the
+templates): a double click or a resent request places the order once.
+"""
+import hashlib
+import json
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, request, session, jsonify
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import db
+from app.models.idempotency_key import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# En-têtes de la première réponse rejoués avec elle
+REPLAYED_HEADERS = ('Content-Type', 'Location', 'HX-Redirect', 'HX-Refresh')
+POLL_INTERVAL = 0.05
+
+# Requêtes en cours dans ce processus : une répétition attend leur fin sans interroger la base en boucle
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+class ClaimLost(Exception):
+    """The key was taken over by a retry while the request ran: its transaction must not commit."""
+
+
+def new_idempotency_key() -> str:
+    """Random key for a form: the same until the form is rendered again."""
+    return secrets.token_urlsafe(16)
+
+
+def _setting(name: str, default: float) -> timedelta:
+    return timedelta(seconds=current_app.config.get(name, default))
+
+
+def _request_hash() -> str:
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(row):
+    response = current_app.response_class(row.body, status=row.status_code, headers=json.loads(row.headers))
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _in_progress(row) -> bool:
+    return row.status_code is None or row.status_code == IdempotencyKey.EXECUTED
+
+
+def _wait_for(user_id: int, key_hash: str, request_hash: str):
+    """
+    The row of a key claimed by another request, once that request has ended (None if it released
+    the key). Returned still in flight after IDEMPOTENCY_WAIT seconds, and at once if the key was
+    used for another request.
+    """
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT', 10.0)
+    while True:
+        db.session.rollback()  # nouvel instantané à chaque lecture (SQLite en WAL garde le sien)
+        row = IdempotencyKey.lookup(user_id, key_hash)
+        if row is None or not _in_progress(row) or row.request_hash != request_hash:
+            return row
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return row
+        event = _in_flight.get((user_id, key_hash))
+        if event is not None:
+            event.wait(min(remaining, 1.0))  # même processus : réveillé dès la fin de la première requête
+        else:
+            time.sleep(min(remaining, POLL_INTERVAL))  # autre worker : seule la base le sait
+
+
+def _run(view, args, kwargs, user_id: int, key_hash: str, claimed_at):
+    done = threading.Event()
+    with _in_flight_lock:
+        _in_flight[(user_id, key_hash)] = done
+    executed, lost = [], []
+    def before_commit(_session):
+        if not executed and not IdempotencyKey.mark_executed(user_id, key_hash, claimed_at):
+            lost.append(True)
+            raise ClaimLost("Clé d'idempotence reprise par une autre requête")
+    def after_commit(_session):
+        executed.append(True)
+
+    db_session = db.session()
+    event.listen(db_session, 'before_commit', before_commit)
+    event.listen(db_session, 'after_commit', after_commit)
+    try:
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _settle(user_id, key_hash, claimed_at, None, executed)
+            raise
+        finally:
+            event.remove(db_session, 'before_commit', before_commit)
+            event.remove(db_session, 'after_commit', after_commit)
+        if lost:
+            db.session.rollback()  # la vue a pu garder la transaction refusée ouverte
+        _settle(user_id, key_hash, claimed_at, response, executed)
+        return response
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop((user_id, key_hash), None)
+        done.set()
+
+
+def _settle(user_id: int, key_hash: str, claimed_at, response, executed):
+    """
+    Store the response of the request, or release the key if the request failed before
+    committing anything. The request is done either way: an error here is only logged
+    (an EXECUTED row then answers a final 409 to the retries).
+    """
+    try:
+        if response is None or response.direct_passthrough or (response.status_code >= 500 and not executed):
+            IdempotencyKey.release(user_id, key_hash, claimed_at)  # sans effet sur une ligne EXECUTED
+        else:
+            headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+            IdempotencyKey.complete(user_id, key_hash, claimed_at, response.status_code, json.dumps(headers), response.get_data())
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("Idempotency key %s of user %s not settled", key_hash, user_id)
+
+
+def key_claimed() -> bool:
+    """
+    True if the `Idempotency-Key` of the request is held by a live row of the logged-in user (one
+    read by primary key): the request will be replayed or wait, unless that row is taken over.
+    """
+    key = request.headers.get(HEADER)
+    user_id = session.get('user_id')
+    if not key or len(key) > MAX_KEY_LENGTH or user_id is None:
+        return False
+    row = IdempotencyKey.lookup(user_id, hashlib.sha256(key.encode()).hexdigest())
+    if row is None:
+        return False
+    now = datetime.utcnow()
+    if row.created_at < now - _setting('IDEMPOTENCY_TTL', 86400):
+        return False
+    return row.status_code is not None or row.created_at >= now - _setting('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+
+
+def idempotent(view):
+    """Replay the first response of a request sent again with the same `Idempotency-Key` header."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        user_id = session.get('user_id')
+        if key is None or user_id is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f"En-tête {HEADER} invalide (1 à {MAX_KEY_LENGTH} caractères)"}), 400
+
+        key_hash = hashlib.sha256(key.encode()).hexdigest()
+        request_hash = _request_hash()
+        ttl = _setting('IDEMPOTENCY_TTL', 86400)
+        lock_timeout = _setting('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+        admission = current_app.extensions.get('admission')
+        yielded_slot = False
+        while (claimed_at := IdempotencyKey.claim(user_id, key_hash, request_hash, ttl, lock_timeout)) is None:
+            # Pas de créneau de commande (app/admission.py) occupé pendant l'attente d'une autre requête
+            if admission is not None:
+                yielded_slot = admission.yield_slot() or yielded_slot
+            row = _wait_for(user_id, key_hash, request_hash)
+            if row is None:
+                # la première requête a échoué et libéré la clé : celle-ci la reprend, avec un créneau
+                if yielded_slot and (refused := admission.reacquire_slot()):
+                    return refused
+                yielded_slot = False
+                continue
+            if row.request_hash != request_hash:
+                return jsonify({'error': "Clé d'idempotence déjà utilisée pour une autre requête"}), 422
+            if row.status_code == IdempotencyKey.EXECUTED and row.created_at < datetime.utcnow() - lock_timeout:
+                return jsonify({'error': "Requête déjà exécutée avec cette clé d'idempotence, sa réponse n'a pas été enregistrée"}), 409
+            if _in_progress(row):
+                response = jsonify({'error': "Une requête avec la même clé d'idempotence est encore en cours"})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            return _replay(row)
+        return _run(view, args, kwargs, user_id, key_hash, claimed_at)
+    return wrapper
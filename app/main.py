@@ -1,7 +1,13 @@
+import os
+
+from app.commands import bootstrap_database
 from app.controller.controller import create_app
 
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5045)
+    # Serveur de développement uniquement. En production : gunicorn -c app/gunicorn_conf.py app.main:app
+    with app.app_context():
+        bootstrap_database()
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1", host="0.0.0.0", port=5045)
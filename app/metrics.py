@@ -0,0 +1,346 @@
+# app/metrics.py
+"""
+Instrumentation exposed at /metrics in the Prometheus text format.
+
+- request latency histograms per endpoint, method and status code
+- SQL statement count and DB time per request (SQLAlchemy engine events)
+- connection pool checkout time, requests in flight
+- admission control: queueing time and requests refused (app/admission.py)
+
+Each process keeps its metrics in memory. When METRICS_DIR is set (one directory
+shared by all the workers of a host), every process regularly writes a snapshot
+of its metrics there and /metrics merges the snapshots of all the processes,
+so whichever worker answers the scrape reports the totals.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 50, 100, 250)
+
+METRICS = {
+    'cantina_http_request_duration_seconds': ('histogram', 'HTTP request latency.'),
+    'cantina_http_requests_in_flight': ('gauge', 'HTTP requests being processed.'),
+    'cantina_db_statements_per_request': ('histogram', 'SQL statements executed per HTTP request.'),
+    'cantina_db_statements_total': ('counter', 'SQL statements executed.'),
+    'cantina_db_time_per_request_seconds': ('histogram', 'Time spent executing SQL per HTTP request.'),
+    'cantina_db_pool_checkout_seconds': ('histogram', 'Time spent obtaining a connection from the pool.'),
+    'cantina_admission_wait_seconds': ('histogram', 'Time a write request waited for a rate token or a checkout slot.'),
+    'cantina_admission_rejected_total': ('counter', 'Write requests refused with 429 by admission control.'),
+}
+
+
+class Registry:
+    """In-memory counters, gauges and histograms of the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels=(), delta=1):
+        with self._lock:
+            key = (name, labels)
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(hist['buckets']):
+                if value <= bound:
+                    hist['counts'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of the metrics."""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in self.gauges.items()],
+                'histograms': [[name, labels, dict(hist, counts=list(hist['counts']))] for (name, labels), hist in self.histograms.items()],
+            }
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+
+
+def metric_labels(**labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ----------- Agrégation multi-processus -----------
+
+class _SnapshotWriter:
+    def __init__(self):
+        self.directory = None
+        self.interval = 1.0
+        self.reset()
+
+    def reset(self):
+        self._last_write = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def path(self, pid=None):
+        return os.path.join(self.directory, f"metrics-{pid or os.getpid()}.json")
+
+    def write(self, force=False):
+        """Write the snapshot of this process, at most once per interval unless forced."""
+        if not self.directory:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < self.interval:
+                # Trop tôt : écriture différée, pour que la dernière requête soit visible.
+                if self._timer is None:
+                    self._timer = threading.Timer(self.interval, self.write, kwargs={'force': True})
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._last_write = now
+            self._timer = None
+            tmp = self.path() + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(registry.snapshot(), f)
+            os.replace(tmp, self.path())
+
+
+writer = _SnapshotWriter()
+os.register_at_fork(after_in_child=writer.reset)
+atexit.register(lambda: writer.write(force=True))
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+RETIRED_FILE = 'metrics-retired.json'
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge(snapshots):
+    """Sum the counters, gauges and histograms of several snapshots."""
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, hist in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = dict(hist, counts=list(hist['counts']))
+            else:
+                merged['counts'] = [a + b for a, b in zip(merged['counts'], hist['counts'])]
+                merged['sum'] += hist['sum']
+                merged['count'] += hist['count']
+    return counters, gauges, histograms
+
+
+def retire_process(directory, pid):
+    """
+    Fold the snapshot of an exited worker into RETIRED_FILE and delete it (gunicorn child_exit):
+    recycled workers (max_requests) do not pile up files that every scrape would read.
+    """
+    path = os.path.join(directory, f"metrics-{pid}.json")
+    snapshot = _load(path)
+    if snapshot is None:
+        return
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    retired = _load(retired_path) or {'pid': None, 'folded': [], 'counters': [], 'gauges': [], 'histograms': []}
+    counters, _, histograms = merge([retired, snapshot])
+    # Fichiers déjà comptés dans le total mais pas encore supprimés : ignorés par collect()
+    folded = [pid] + [p for p in retired['folded'] if os.path.exists(os.path.join(directory, f"metrics-{p}.json"))]
+    tmp = retired_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({
+            'pid': None,
+            'folded': folded,
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'gauges': [],
+            'histograms': [[name, labels, hist] for (name, labels), hist in histograms.items()],
+        }, f)
+    os.replace(tmp, retired_path)
+    os.remove(path)
+
+
+def collect():
+    """Metrics of this process merged with the snapshots of the other processes (if METRICS_DIR is set)."""
+    snapshots = [registry.snapshot()]
+    if writer.directory:
+        writer.write(force=True)
+        loaded = [_load(path) for path in glob.glob(os.path.join(writer.directory, 'metrics-*.json'))]
+        loaded = [snapshot for snapshot in loaded if snapshot is not None]
+        folded = {pid for snapshot in loaded for pid in snapshot.get('folded', ())}
+        for snapshot in loaded:
+            pid = snapshot['pid']
+            if pid == os.getpid() or pid in folded:
+                continue
+            if pid is not None and not pid_alive(pid):
+                # Counters of dead workers still count, their gauges do not.
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+    return merge(snapshots)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format (version 0.0.4)."""
+    counters, gauges, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(hist['buckets'], hist['counts']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(float(bound)))])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+        else:
+            values = counters if kind == 'counter' else gauges
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# ----------- Sondes SQLAlchemy -----------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_query_start')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if has_request_context() and 'metrics_sql' in g:
+        g.metrics_sql[0] += 1
+        g.metrics_sql[1] += elapsed
+    else:
+        registry.inc('cantina_db_statements_total', metric_labels(endpoint='(background)'))
+
+
+def instrument_engine(engine):
+    """Time pool checkouts of an engine (SQL statements are counted for every Engine)."""
+    # Sur l'Engine et non sur son Pool : engine.dispose() (post_fork de gunicorn) remplace le Pool
+    # mais garde l'Engine. Les événements du pool ('checkout') ne partent qu'une fois la connexion
+    # obtenue : ils ne mesurent pas l'attente.
+    if getattr(engine, '_metrics_instrumented', False):
+        return
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        start = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            registry.observe('cantina_db_pool_checkout_seconds', (), time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+    engine._metrics_instrumented = True
+
+
+if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+# ----------- Intégration Flask -----------
+
+def init_metrics(app, db):
+    """Install the request hooks and the /metrics route on the application."""
+    writer.directory = app.config.get('METRICS_DIR') or os.getenv('METRICS_DIR')
+    writer.interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    if writer.directory:
+        os.makedirs(writer.directory, exist_ok=True)
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql = [0, 0.0]
+        registry.gauge_add('cantina_http_requests_in_flight')
+
+    @app.teardown_request
+    def record_request_metrics(exc):
+        if 'metrics_start' not in g:
+            return
+        registry.gauge_add('cantina_http_requests_in_flight', delta=-1)
+        endpoint = request.endpoint or 'unmatched'
+        status = g.pop('metrics_status', 500 if exc else 200)
+        registry.observe(
+            'cantina_http_request_duration_seconds',
+            metric_labels(endpoint=endpoint, method=request.method, status=status),
+            time.perf_counter() - g.pop('metrics_start')
+        )
+        statements, db_time = g.pop('metrics_sql')
+        registry.inc('cantina_db_statements_total', metric_labels(endpoint=endpoint), statements)
+        registry.observe('cantina_db_statements_per_request', metric_labels(endpoint=endpoint), statements, STATEMENT_BUCKETS)
+        registry.observe('cantina_db_time_per_request_seconds', metric_labels(endpoint=endpoint), db_time)
+        writer.write()
+
+    @app.after_request
+    def remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -1,6 +1,8 @@
 # File: app/models/__init__.py
 from flask_sqlalchemy import SQLAlchemy
-db = SQLAlchemy()
+from .routing_session import RoutingSession
+# Les lectures des requêtes GET peuvent être routées vers le réplica (voir routing_session.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # Import tes modèles ici pour qu’ils soient connus de SQLAlchemy
 from .app_user import AppUser
@@ -8,5 +10,21 @@ from .cafeteria import Cafeteria
 from .dish import Dish
 from .daily_menu import DailyMenu
 from .daily_menu_item import DailyMenuItem
-from .reservation import Reservation
-from .order_item import OrderItem
\ No newline at end of file
+from .reservation import Reservation, OrderError
+from .order_item import OrderItem
+from .user_monthly_spending import UserMonthlySpending
+from .web_session import WebSession
+from .idempotency_key import IdempotencyKey
+from .cache_version import CacheVersion
+
+# Les upserts des modèles (INSERT ... ON CONFLICT) n'existent que pour ces dialectes
+SUPPORTED_DIALECTS = ('postgresql', 'sqlite')
+
+def check_dialect(app):
+    """Refuse to start on a database the model upserts do not support, rather than failing its writes."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name not in SUPPORTED_DIALECTS:
+                raise RuntimeError(
+                    f"Unsupported database dialect {engine.dialect.name!r} (expected one of {', '.join(SUPPORTED_DIALECTS)})"
+                )
@@ -1,10 +1,32 @@
 from . import db
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import update, select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
+from decimal import Decimal
+from app.cache import VersionedCache
+from .cache_version import CacheVersion
+from .user_search import search_cache, search_user_ids, SEARCH_LIMIT
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.export import EXPORT_BATCH_SIZE
+from app.serialization import record_type, projected_columns
+
+# Row of the API list (same fields as to_dict), encoded as is by app/serialization.py
+AppUserRecord = record_type('AppUserRecord', 'user_id last_name first_name email balance role created_at updated_at')
+IDENTITY_VERSION = 'identity'  # CacheVersion du cache des utilisateurs (profil, rôle, mot de passe)
+# Colonnes modifiées par chaque débit ou crédit : jamais en cache, relues à leur premier accès
+UNCACHED_COLUMNS = ('balance', 'updated_at')
 
 class AppUser(db.Model):
     __tablename__ = 'app_user'
+    __table_args__ = (
+        # Liste alphabétique de la page admin
+        db.Index('ix_app_user_name', 'last_name', 'first_name'),
+        # Recherche par préfixe du nom, sans tenir compte de la casse (voir user_search.py)
+        db.Index('ix_app_user_lower_name', db.text('lower(last_name)'), db.text('lower(first_name)')),
+    )
 
     user_id = db.Column(db.Integer, primary_key=True)
     last_name = db.Column(db.String(50), nullable=False)
@@ -18,6 +40,11 @@ class AppUser(db.Model):
 
     reservations = db.relationship('Reservation', back_populates='user', lazy=True)
 
+    # Process-wide identity cache: user_id -> column snapshot (see get_by_id_cached). A change of
+    # role or password, or a deletion, drops it in every worker (CacheVersion 'identity').
+    # The balance is not cached: debits and credits of any worker are seen at once.
+    identity_cache = VersionedCache(maxsize=4096, ttl=30.0, shared=lambda: CacheVersion.current(IDENTITY_VERSION))
+
     @classmethod
     def create_user(
         cls,
@@ -26,14 +53,17 @@ class AppUser(db.Model):
         email: str,
         password: str,
         role: str = 'student',
-        balance: float = 0.00
+        balance: float = 0.00,
+        password_hash: str = None
     ):
         """
         Create and add a new user to the session with a hashed password.
+        An already computed `password_hash` can be given to skip hashing (seeding).
         The caller is responsible for committing the session.
         Returns the user instance.
         """
-        password_hash = generate_password_hash(password)
+        if password_hash is None:
+            password_hash = generate_password_hash(password)
         user = cls(
             last_name=last_name,
             first_name=first_name,
@@ -43,6 +73,7 @@ class AppUser(db.Model):
             balance=balance
         )
         db.session.add(user)
+        search_cache.clear()
         return user
 
     @classmethod
@@ -52,6 +83,57 @@ class AppUser(db.Model):
         Returns the AppUser instance or None if not found.
         """
         return db.session.get(cls, user_id)
+
+    @classmethod
+    def get_by_id_cached(cls, user_id: int):
+        """
+        Retrieve a user by their user_id, going through the identity cache.
+        On a hit the cached column snapshot is attached to the current session
+        without emitting a SELECT; on a miss the user is loaded and cached.
+        The balance (UNCACHED_COLUMNS) is left out of the snapshot: it is read from the
+        database the first time the request uses it (one SELECT by primary key).
+        Returns the AppUser instance or None if not found.
+        """
+        snapshot = cls.identity_cache.get_or_build(user_id, lambda: cls._identity_snapshot(user_id))
+        if snapshot is None:
+            return None
+        user = cls(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    @classmethod
+    def _identity_snapshot(cls, user_id: int):
+        user = cls.get_by_id(user_id)
+        if user is None:
+            return None
+        return {column.key: getattr(user, column.key) for column in cls.__table__.columns
+                if column.key not in UNCACHED_COLUMNS}
+
+    @classmethod
+    def invalidate_cache(cls, user_id: int, search: bool = True, shared: bool = True):
+        """
+        Forget the cached snapshot of a user after it has been modified or deleted, and the cached
+        search results if `search` is set (name, email or role changed). With `shared` (profile,
+        role or password changed, user deleted), the other workers drop their snapshots at their
+        next request too. A balance change needs none of this: the balance is not cached.
+        """
+        cls.identity_cache.invalidate(user_id)
+        if search:
+            search_cache.clear()
+        if shared:
+            CacheVersion.bump(IDENTITY_VERSION)
+
+    @classmethod
+    def search(cls, query: str = '', role: str = None, limit: int = SEARCH_LIMIT):
+        """
+        Search users by name or email (indexed, see user_search.py), best match first.
+        An empty query lists the users alphabetically. Returns at most `limit` AppUser instances.
+        """
+        user_ids = search_user_ids(query, role, limit)
+        if not user_ids:
+            return []
+        users = {u.user_id: u for u in cls.query.filter(cls.user_id.in_(user_ids))}
+        return [users[user_id] for user_id in user_ids if user_id in users]
     
     @classmethod
     def get_by_email(cls, email: str):
@@ -102,6 +184,10 @@ class AppUser(db.Model):
         except IntegrityError:
             db.session.rollback()
             return False
+        finally:
+            searchable = any(value is not None for value in (last_name, first_name, email, role))
+            if searchable or password is not None:
+                AppUser.invalidate_cache(self.user_id, search=searchable)
 
     def delete_user(self) -> bool:
         """
@@ -109,6 +195,7 @@ class AppUser(db.Model):
         All related reservations will be deleted via ON DELETE CASCADE.
         Returns True if successful, False otherwise.
         """
+        user_id = self.user_id
         try:
             db.session.delete(self)
             db.session.commit()
@@ -116,6 +203,64 @@ class AppUser(db.Model):
         except Exception:
             db.session.rollback()
             return False
+        finally:
+            AppUser.invalidate_cache(user_id)
+
+    @classmethod
+    def debit_balance(cls, user_id: int, amount: Decimal):
+        """
+        Atomically subtract `amount` from the user's balance, only if the balance covers it:
+        UPDATE app_user SET balance = balance - :amount
+        WHERE user_id = :id AND balance >= :amount RETURNING balance
+        The row is locked only until the caller commits or rolls back.
+        Returns the new balance, or None if the balance is insufficient (or the user is unknown).
+        """
+        amount = Decimal(amount)
+        if amount < 0:
+            raise ValueError("The debited amount must not be negative.")
+        stmt = (
+            update(cls)
+            .where(cls.user_id == user_id, cls.balance >= amount)
+            .values(balance=cls.balance - amount)
+            .returning(cls.balance)
+            .execution_options(synchronize_session=False)
+        )
+        new_balance = db.session.execute(stmt).scalar_one_or_none()
+        if new_balance is not None:
+            cls._sync_balance(user_id, new_balance)
+        return new_balance
+
+    @classmethod
+    def credit_balance(cls, user_id: int, amount: Decimal):
+        """
+        Atomically add `amount` to the user's balance (top-ups and refunds).
+        Returns the new balance, or None if the user does not exist.
+        """
+        amount = Decimal(amount)
+        if amount < 0:
+            raise ValueError("The credited amount must not be negative.")
+        stmt = (
+            update(cls)
+            .where(cls.user_id == user_id)
+            .values(balance=cls.balance + amount)
+            .returning(cls.balance)
+            .execution_options(synchronize_session=False)
+        )
+        new_balance = db.session.execute(stmt).scalar_one_or_none()
+        if new_balance is not None:
+            cls._sync_balance(user_id, new_balance)
+        return new_balance
+
+    @classmethod
+    def _sync_balance(cls, user_id: int, new_balance):
+        """
+        Reflect a balance written by SQL on the instance already loaded in the session
+        (without marking it dirty, so no absolute value is written back on flush). The identity
+        cache holds no balance, so nothing else needs dropping.
+        """
+        user = db.session.identity_map.get(db.session.identity_key(cls, user_id))
+        if user is not None:
+            set_committed_value(user, 'balance', new_balance)
 
     def verify_password(self, password: str) -> bool:
         """
@@ -140,4 +285,27 @@ class AppUser(db.Model):
     @classmethod
     def get_all_dicts(cls):
         """Return all users as a list of dictionaries (excluding password)."""
-        return [user.to_dict() for user in cls.query.all()]
\ No newline at end of file
+        return [user.to_dict() for user in cls.query.all()]
+
+    @classmethod
+    def get_page_records(cls, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of users ordered by user_id as AppUserRecord (columns only, no password,
+        no ORM entities), and the cursor of the next page (or None).
+        """
+        rows, next_cursor = keyset_page(db.session.query(*projected_columns(cls, AppUserRecord)), [cls.user_id], cursor, limit)
+        return [AppUserRecord(*row) for row in rows], next_cursor
+
+    @classmethod
+    def export_rows(cls, start: datetime = None, end: datetime = None):
+        """
+        Return (columns, rows) for an export of the users created in [start, end) (no password).
+        Rows are plain tuples read through a server-side cursor.
+        """
+        columns = ('user_id', 'last_name', 'first_name', 'email', 'balance', 'role', 'created_at', 'updated_at')
+        stmt = select(*(getattr(cls, c) for c in columns)).order_by(cls.user_id)
+        if start:
+            stmt = stmt.where(cls.created_at >= start)
+        if end:
+            stmt = stmt.where(cls.created_at < end)
+        return columns, db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
\ No newline at end of file
@@ -0,0 +1,35 @@
+from . import db
+from flask import g
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+class CacheVersion(db.Model):
+    """
+    Version of a dataset cached in every worker (menus, ...), shared through the database.
+
+    A write moves the version of its dataset forward after committing (`bump`), and the caches
+    key their entries on the current version (`current`): the other workers see the change at
+    their next request instead of serving their copy until its TTL. The versions are read with
+    one SELECT per request, whatever the number of cached lookups.
+    """
+    __tablename__ = 'cache_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        """Version of `name` as read at the first call of the request (0 if never bumped)."""
+        versions = g.get('cache_versions')
+        if versions is None:
+            versions = g.cache_versions = dict(db.session.execute(select(cls.name, cls.version)).all())
+        return versions.get(name, 0)
+
+    @classmethod
+    def bump(cls, name: str):
+        """Move the version of `name` forward for every worker, and commit (call it after the write is committed)."""
+        dialect = db.session.get_bind(mapper=cls.__mapper__).dialect.name  # vérifié au démarrage (check_dialect)
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(cls).values(name=name, version=1)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=[cls.name], set_={'version': cls.version + 1}))
+        db.session.commit()
+        g.pop('cache_versions', None)
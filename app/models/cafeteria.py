@@ -1,6 +1,21 @@
 from . import db
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+from collections import namedtuple
+from app.cache import VersionedCache
+from .cache_version import CacheVersion
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.serialization import record_type, projected_columns
+
+# Read-only view of a cafeteria, shared by every request that hits the directory cache.
+CafeteriaView = namedtuple('CafeteriaView', 'cafeteria_id name address phone created_at')
+# `cafeterias` in cafeteria_id order (sidebar switcher), `by_id` for lookups, `api` as to_dict() payloads.
+CafeteriaDirectory = namedtuple('CafeteriaDirectory', 'cafeterias by_id api')
+DIRECTORY_KEY = 'all'
+DIRECTORY_VERSION = 'cafeteria'  # CacheVersion de l'annuaire
+# Row of the API list (same fields as to_dict), encoded as is by app/serialization.py
+CafeteriaRecord = record_type('CafeteriaRecord', 'cafeteria_id name address created_at')
 
 class Cafeteria(db.Model):
     __tablename__ = 'cafeteria'
@@ -14,6 +29,10 @@ class Cafeteria(db.Model):
     menus = db.relationship('DailyMenu', back_populates='cafeteria', lazy=True)
     reservations = db.relationship('Reservation', back_populates='cafeteria', lazy=True)
 
+    # Annuaire des cafétérias (une seule entrée) : lu une fois, invalidé par les écritures de cafeteria_bp
+    # dans tous les workers (CacheVersion 'cafeteria')
+    directory_cache = VersionedCache(maxsize=1, ttl=3600.0, shared=lambda: CacheVersion.current(DIRECTORY_VERSION))
+
     @classmethod
     def create_cafeteria(
         cls,
@@ -38,6 +57,37 @@ class Cafeteria(db.Model):
         """
         return db.session.get(cls, cafeteria_id)
 
+    @classmethod
+    def directory(cls) -> CafeteriaDirectory:
+        """
+        Return every cafeteria as a CafeteriaDirectory, from the directory cache
+        (one SELECT on a miss). Feeds the cafeteria switcher of every page.
+        """
+        return cls.directory_cache.get_or_build(DIRECTORY_KEY, cls._build_directory)
+
+    @classmethod
+    def _build_directory(cls):
+        rows = db.session.execute(
+            select(cls.cafeteria_id, cls.name, cls.address, cls.phone, cls.created_at).order_by(cls.cafeteria_id)
+        ).all()
+        cafeterias = tuple(CafeteriaView(*row) for row in rows)
+        return CafeteriaDirectory(
+            cafeterias,
+            {cafeteria.cafeteria_id: cafeteria for cafeteria in cafeterias},
+            tuple(cls.to_dict(cafeteria) for cafeteria in cafeterias)
+        )
+
+    @classmethod
+    def lookup(cls, cafeteria_id: int):
+        """Return the CafeteriaView of `cafeteria_id` from the directory, or None if it does not exist."""
+        return cls.directory().by_id.get(cafeteria_id)
+
+    @classmethod
+    def invalidate_directory(cls):
+        """Forget the cached directory in every worker, after a cafeteria was created, modified or deleted (and committed)."""
+        cls.directory_cache.clear()
+        CacheVersion.bump(DIRECTORY_VERSION)
+
     @classmethod
     def get_all_dicts(cls):
         """
@@ -45,6 +95,15 @@ class Cafeteria(db.Model):
         """
         return [cafeteria.to_dict() for cafeteria in cls.query.all()]
 
+    @classmethod
+    def get_page_records(cls, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of cafeterias ordered by cafeteria_id as CafeteriaRecord (columns only),
+        and the cursor of the next page (or None).
+        """
+        rows, next_cursor = keyset_page(db.session.query(*projected_columns(cls, CafeteriaRecord)), [cls.cafeteria_id], cursor, limit)
+        return [CafeteriaRecord(*row) for row in rows], next_cursor
+
     def update_cafeteria(
         self,
         name: str = None
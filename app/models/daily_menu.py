@@ -1,9 +1,32 @@
 from . import db
+from sqlalchemy import select, insert, update, delete, values, column, exists, and_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import namedtuple
+from app.cache import VersionedCache
+from .cache_version import CacheVersion
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.serialization import record_type, projected_columns
+
+# Read-only views of a menu, built once and shared by every request that hits the cache.
+DishView = namedtuple('DishView', 'dish_id name description dine_in_price dish_type')
+MenuItemView = namedtuple('MenuItemView', 'menu_item_id dish_role display_order')
+MenuEntry = namedtuple('MenuEntry', 'dish menu_item')
+# `entries` feeds the dashboard template, `api` is the JSON payload of the menu API.
+MenuSnapshot = namedtuple('MenuSnapshot', 'menu_id entries api')
+# Row of the API list (same fields as to_dict), encoded as is by app/serialization.py
+DailyMenuRecord = record_type('DailyMenuRecord', 'menu_id cafeteria_id menu_date created_at')
+
+MAX_SCHEDULE_DAYS = 366  # une année scolaire par requête au plus
+MENU_VERSION = 'menu'    # CacheVersion des menus en cache
 
 class DailyMenu(db.Model):
     __tablename__ = 'daily_menu'
+    __table_args__ = (
+        # Un menu par cafétéria et par jour (cible de ON CONFLICT dans schedule)
+        db.UniqueConstraint('cafeteria_id', 'menu_date', name='daily_menu_cafeteria_id_menu_date_key'),
+    )
 
     menu_id = db.Column(db.Integer, primary_key=True)
     cafeteria_id = db.Column(db.Integer, db.ForeignKey('cafeteria.cafeteria_id'), nullable=False)
@@ -13,6 +36,10 @@ class DailyMenu(db.Model):
     # Relationships (if you want to list all items of a menu)
     cafeteria = db.relationship('Cafeteria', back_populates='menus')
     items = db.relationship('DailyMenuItem', back_populates='menu', lazy=True, cascade="all, delete-orphan")
+
+    # Process-wide cache: (cafeteria_id, menu_date) -> MenuSnapshot (see get_menu_snapshot),
+    # dropped in every worker when another one changes a menu or a dish (CacheVersion 'menu').
+    menu_cache = VersionedCache(maxsize=512, ttl=300.0, shared=lambda: CacheVersion.current(MENU_VERSION))
     
     @classmethod
     def create_menu(
@@ -41,6 +68,253 @@ class DailyMenu(db.Model):
         return db.session.get(cls, menu_id)
 
 
+    @classmethod
+    def get_menu_snapshot(cls, cafeteria_id: int, menu_date):
+        """
+        Return the menu of a cafeteria for a date as a MenuSnapshot, from the menu cache.
+        On a miss the menu is read with a single query (daily_menu JOIN daily_menu_item JOIN dish).
+        menu_id is None if there is no menu for that day.
+        """
+        return cls.menu_cache.get_or_build(
+            (cafeteria_id, menu_date),
+            lambda: cls._build_menu_snapshot(cafeteria_id, menu_date)
+        )
+
+    @classmethod
+    def _build_menu_snapshot(cls, cafeteria_id: int, menu_date):
+        from .daily_menu_item import DailyMenuItem
+        from .dish import Dish
+        rows = db.session.execute(
+            select(
+                cls.menu_id, Dish.dish_id, Dish.name, Dish.description, Dish.dine_in_price, Dish.dish_type,
+                DailyMenuItem.menu_item_id, DailyMenuItem.dish_role, DailyMenuItem.display_order
+            )
+            .select_from(cls)
+            .outerjoin(DailyMenuItem, DailyMenuItem.menu_id == cls.menu_id)
+            .outerjoin(Dish, Dish.dish_id == DailyMenuItem.dish_id)
+            .where(cls.cafeteria_id == cafeteria_id, cls.menu_date == menu_date)
+            .order_by(DailyMenuItem.display_order)
+        ).all()
+        if not rows:
+            return MenuSnapshot(None, (), ())
+        entries = tuple(
+            MenuEntry(
+                DishView(r.dish_id, r.name, r.description, r.dine_in_price, r.dish_type),
+                MenuItemView(r.menu_item_id, r.dish_role, r.display_order)
+            ) for r in rows if r.menu_item_id is not None
+        )
+        api = tuple(
+            {
+                "dish_id": dish.dish_id, "name": dish.name, "description": dish.description,
+                "price": float(dish.dine_in_price), "dish_type": dish.dish_type, "role": menu_item.dish_role
+            } for dish, menu_item in entries
+        )
+        return MenuSnapshot(rows[0].menu_id, entries, api)
+
+    @classmethod
+    def invalidate_menu_cache(cls, cafeteria_id: int = None, menu_date=None):
+        """
+        Forget the cached menu of a cafeteria for a date, or every cached menu
+        when called without arguments (e.g. after a dish was modified).
+        Call it after the change is committed: the other workers drop their whole
+        menu cache at their next request (the shared version is per dataset, not per menu).
+        """
+        if cafeteria_id is None or menu_date is None:
+            cls.menu_cache.clear()
+        else:
+            cls.menu_cache.invalidate((cafeteria_id, menu_date))
+        CacheVersion.bump(MENU_VERSION)
+
+    @classmethod
+    def save_day(cls, menu_date, rows) -> dict:
+        """
+        Make the menus of `menu_date` match the admin editor: `rows` are dicts with dish_id, name,
+        description, dine_in_price, dish_type and cafeteria_ids.
+        Kept items keep their display_order, new ones are appended. Only the differences with the current menus are written, with batched statements
+        (dishes, then menus, then menu items), and the session is committed.
+        Returns the number of dishes created/updated, menus created/deleted and items added/updated/removed.
+        """
+        from .daily_menu_item import DailyMenuItem
+        from .dish import Dish
+        dish_ids, created_dishes, updated_dishes = Dish.sync_catalog(rows)
+
+        # État voulu : cafeteria_id -> {dish_id: dish_role}
+        wanted = {}
+        for row, dish_id in zip(rows, dish_ids):
+            for cafeteria_id in row['cafeteria_ids']:
+                wanted.setdefault(cafeteria_id, {}).setdefault(dish_id, row['dish_type'])
+
+        menu_of, stale_menus = {}, {}
+        for menu_id, cafeteria_id in db.session.execute(
+            select(cls.menu_id, cls.cafeteria_id).where(cls.menu_date == menu_date).order_by(cls.menu_id)
+        ):
+            if cafeteria_id in wanted and cafeteria_id not in menu_of:
+                menu_of[cafeteria_id] = menu_id
+            else:
+                stale_menus[menu_id] = cafeteria_id
+        new_cafeterias = [cafeteria_id for cafeteria_id in wanted if cafeteria_id not in menu_of]
+        if new_cafeterias:
+            result = db.session.execute(
+                insert(cls).returning(cls.menu_id, sort_by_parameter_order=True),
+                [{'cafeteria_id': cafeteria_id, 'menu_date': menu_date} for cafeteria_id in new_cafeterias]
+            )
+            menu_of.update(zip(new_cafeterias, result.scalars()))
+
+        current, removed = {}, []
+        if menu_of:
+            for item in db.session.execute(
+                select(DailyMenuItem.menu_item_id, DailyMenuItem.menu_id, DailyMenuItem.dish_id,
+                       DailyMenuItem.dish_role, DailyMenuItem.display_order)
+                .where(DailyMenuItem.menu_id.in_(menu_of.values()))
+            ):
+                if (item.menu_id, item.dish_id) in current:
+                    removed.append(item.menu_item_id)  # doublon
+                else:
+                    current[(item.menu_id, item.dish_id)] = item
+        last_order = {}
+        for item in current.values():
+            last_order[item.menu_id] = max(last_order.get(item.menu_id, 0), item.display_order or 0)
+        added, changed, touched = [], [], set(stale_menus.values()) | set(new_cafeterias)
+        for cafeteria_id, entries in wanted.items():
+            menu_id = menu_of[cafeteria_id]
+            for dish_id, dish_role in entries.items():
+                item = current.pop((menu_id, dish_id), None)
+                if item is None:
+                    last_order[menu_id] = last_order.get(menu_id, 0) + 1
+                    added.append({'menu_id': menu_id, 'dish_id': dish_id, 'dish_role': dish_role,
+                                  'display_order': last_order[menu_id]})
+                elif item.dish_role != dish_role:
+                    changed.append({'menu_item_id': item.menu_item_id, 'dish_role': dish_role})
+                else:
+                    continue
+                touched.add(cafeteria_id)
+        cafeteria_of = {menu_id: cafeteria_id for cafeteria_id, menu_id in menu_of.items()}
+        for (menu_id, _), item in current.items():
+            removed.append(item.menu_item_id)
+            touched.add(cafeteria_of[menu_id])
+
+        if added:
+            db.session.execute(insert(DailyMenuItem), added)
+        if changed:
+            db.session.execute(update(DailyMenuItem), changed)
+        if removed:
+            db.session.execute(delete(DailyMenuItem).where(DailyMenuItem.menu_item_id.in_(removed)))
+        if stale_menus:
+            db.session.execute(delete(DailyMenuItem).where(DailyMenuItem.menu_id.in_(stale_menus)))
+            db.session.execute(delete(cls).where(cls.menu_id.in_(stale_menus)))
+        db.session.commit()
+
+        # Un plat modifié peut figurer dans n'importe quel menu
+        if updated_dishes:
+            cls.invalidate_menu_cache()
+        else:
+            for cafeteria_id in touched:
+                cls.invalidate_menu_cache(cafeteria_id, menu_date)
+        if created_dishes or updated_dishes:
+            for dish in Dish.query.filter(Dish.dish_id.in_(created_dishes + updated_dishes)):
+                Dish.reindex(dish)
+        return {
+            'dishes_created': len(created_dishes), 'dishes_updated': len(updated_dishes),
+            'menus_created': len(new_cafeterias), 'menus_deleted': len(stale_menus),
+            'items_added': len(added), 'items_updated': len(changed), 'items_removed': len(removed),
+        }
+
+    @staticmethod
+    def schedule_dates(source_start, start_date, end_date, period: int = 1, weekdays=None) -> list:
+        """
+        Return the (target_date, source_date) pairs of a schedule: every day of [start_date, end_date]
+        (restricted to `weekdays`, 0 = Monday) copies the day of the `period`-day template starting at
+        `source_start` that falls on the same position (a 7-day template maps Monday to Monday).
+        The template days themselves are never targets.
+        """
+        template = {source_start + timedelta(days=i) for i in range(period)}
+        pairs = []
+        day = start_date
+        while day <= end_date:
+            if (weekdays is None or day.weekday() in weekdays) and day not in template:
+                pairs.append((day, source_start + timedelta(days=(day - source_start).days % period)))
+            day += timedelta(days=1)
+        return pairs
+
+    @classmethod
+    def schedule(cls, source_start, start_date, end_date, period: int = 1, cafeteria_ids=None,
+                 source_cafeteria_id: int = None, weekdays=None, replace: bool = False) -> dict:
+        """
+        Copy the menus of a template (one day, or `period` days such as a week) onto a date range,
+        with set-based statements whatever the number of days: INSERT ... SELECT ... ON CONFLICT
+        (cafeteria_id, menu_date) DO NOTHING for the menus, then INSERT ... SELECT for their items.
+
+        Each cafeteria of `cafeteria_ids` (default: those having template menus) copies its own
+        template menus, or those of `source_cafeteria_id` if given. Target days that already have
+        dishes are left alone, unless `replace` is set: their items are then replaced.
+        Commits and returns the number of menus created and of items deleted / copied.
+        """
+        from .daily_menu_item import DailyMenuItem
+        from .cafeteria import Cafeteria
+        if end_date < start_date or (end_date - start_date).days >= MAX_SCHEDULE_DAYS:
+            raise ValueError(f"La période doit couvrir entre 1 et {MAX_SCHEDULE_DAYS} jours")
+        if not 1 <= period <= 31:
+            raise ValueError("La période du modèle doit être comprise entre 1 et 31 jours")
+        pairs = cls.schedule_dates(source_start, start_date, end_date, period, weekdays)
+        if not pairs:
+            return {'menus_created': 0, 'items_deleted': 0, 'items_copied': 0}
+
+        dates = values(column('target_date', db.Date), column('source_date', db.Date), name='dates') \
+            .data(pairs).cte('schedule_dates', nesting=True)
+        source = cls.__table__.alias('source_menu')
+        target = cls.__table__.alias('target_menu')
+        if source_cafeteria_id is not None:
+            targets = select(Cafeteria.cafeteria_id.label('cafeteria_id'))
+            if cafeteria_ids is not None:
+                targets = targets.where(Cafeteria.cafeteria_id.in_(cafeteria_ids))
+            targets = targets.subquery('schedule_cafeterias')
+            # (cafeteria cible, date cible, menu source)
+            plan = select(targets.c.cafeteria_id, dates.c.target_date, source.c.menu_id.label('source_menu_id')) \
+                .select_from(dates) \
+                .join(source, and_(source.c.menu_date == dates.c.source_date, source.c.cafeteria_id == source_cafeteria_id)) \
+                .join(targets, db.true())
+        else:
+            plan = select(source.c.cafeteria_id, dates.c.target_date, source.c.menu_id.label('source_menu_id')) \
+                .select_from(dates) \
+                .join(source, source.c.menu_date == dates.c.source_date)
+            if cafeteria_ids is not None:
+                plan = plan.where(source.c.cafeteria_id.in_(cafeteria_ids))
+        plan = plan.subquery('schedule_plan')
+
+        dialect = db.session.get_bind(mapper=cls.__mapper__).dialect.name  # vérifié au démarrage (check_dialect)
+        # Le WHERE lève l'ambiguïté de SQLite entre ON CONFLICT et la clause ON d'une jointure
+        menus = (postgresql if dialect == 'postgresql' else sqlite).insert(cls).from_select(
+            ['cafeteria_id', 'menu_date', 'created_at'],
+            select(plan.c.cafeteria_id, plan.c.target_date, db.literal(datetime.utcnow(), db.DateTime)).where(db.true())
+        ).on_conflict_do_nothing(index_elements=['cafeteria_id', 'menu_date'])
+        menus_created = db.session.execute(menus).rowcount
+
+        # Menus cibles, appariés à leur menu source
+        matched = select(target.c.menu_id, plan.c.source_menu_id).select_from(plan).join(
+            target, and_(target.c.cafeteria_id == plan.c.cafeteria_id, target.c.menu_date == plan.c.target_date)
+        )
+        has_items = exists().where(DailyMenuItem.menu_id == target.c.menu_id)
+        items_deleted = 0
+        if replace:
+            targets_with_items = select(target.c.menu_id).select_from(plan).join(
+                target, and_(target.c.cafeteria_id == plan.c.cafeteria_id, target.c.menu_date == plan.c.target_date)
+            )
+            items_deleted = db.session.execute(
+                delete(DailyMenuItem).where(DailyMenuItem.menu_id.in_(targets_with_items))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        else:
+            matched = matched.where(~has_items)
+        matched = matched.subquery('schedule_matched')
+        items_copied = db.session.execute(insert(DailyMenuItem).from_select(
+            ['menu_id', 'dish_id', 'dish_role', 'display_order'],
+            select(matched.c.menu_id, DailyMenuItem.dish_id, DailyMenuItem.dish_role, DailyMenuItem.display_order)
+            .join_from(matched, DailyMenuItem, DailyMenuItem.menu_id == matched.c.source_menu_id)
+        )).rowcount
+        db.session.commit()
+        cls.invalidate_menu_cache()
+        return {'menus_created': menus_created, 'items_deleted': items_deleted, 'items_copied': items_copied}
+
     @classmethod
     def get_all_dicts(cls):
         """
@@ -48,6 +322,15 @@ class DailyMenu(db.Model):
         """
         return [menu.to_dict() for menu in cls.query.all()]
 
+    @classmethod
+    def get_page_records(cls, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of daily menus ordered by menu_id as DailyMenuRecord (columns only),
+        and the cursor of the next page (or None).
+        """
+        rows, next_cursor = keyset_page(db.session.query(*projected_columns(cls, DailyMenuRecord)), [cls.menu_id], cursor, limit)
+        return [DailyMenuRecord(*row) for row in rows], next_cursor
+
     def update_menu(
         self,
         cafeteria_id: int = None,
@@ -10,6 +10,11 @@ class DailyMenuItem(db.Model):
     dish_role = db.Column(db.String(20), nullable=False)  # e.g. 'main_course', 'side_dish', 'soup', 'drink', 'dessert'
     display_order = db.Column(db.Integer, default=1)
 
+    __table_args__ = (
+        # Items d'un menu dans l'ordre d'affichage
+        db.Index('ix_daily_menu_item_menu_order', 'menu_id', 'display_order'),
+    )
+
     # Relationships (if you want to access the menu or dish from this item)
     menu = db.relationship('DailyMenu', back_populates='items')
     dish = db.relationship('Dish', back_populates='menu_items')
@@ -36,6 +41,13 @@ class DailyMenuItem(db.Model):
         db.session.add(item)
         return item
 
+    @classmethod
+    def get_by_menu(cls, menu_id: int):
+        """
+        Return the items of a menu in display order.
+        """
+        return cls.query.filter_by(menu_id=menu_id).order_by(cls.display_order, cls.menu_item_id).all()
+
     @classmethod
     def get_by_id(cls, menu_item_id: int):
         """
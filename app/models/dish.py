@@ -1,6 +1,14 @@
 from . import db
 from datetime import datetime
+from sqlalchemy import select, func, insert, update, or_
+from decimal import Decimal
 from sqlalchemy.exc import IntegrityError
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.serialization import record_type, projected_columns
+from .dish_index import DishPrefixIndex, SUGGESTION_FIELDS, SUGGESTION_LIMIT
+
+# Row of the API list (same fields as to_dict), encoded as is by app/serialization.py
+DishRecord = record_type('DishRecord', 'dish_id name description dine_in_price dish_type created_at updated_at')
 
 class Dish(db.Model):
     __tablename__ = 'dish'
@@ -12,9 +20,17 @@ class Dish(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Recherche d'un plat par nom, sans tenir compte de la casse (voir get_by_name)
+        db.Index('ix_dish_lower_name', func.lower(name)),
+    )
+
     menu_items = db.relationship('DailyMenuItem', back_populates='dish', lazy=True)
     order_items = db.relationship('OrderItem', back_populates='dish', lazy=True)
 
+    # Index des noms pour l'autocomplétion (voir dish_index.py), propre au processus
+    prefix_index = DishPrefixIndex(ttl=300.0)
+
     def to_dict(self):
         return {
             'dish_id': self.dish_id,
@@ -26,11 +42,119 @@ class Dish(db.Model):
             'updated_at': self.updated_at.isoformat(),
     }
 
+    @classmethod
+    def get_by_name(cls, name: str):
+        """
+        Return the first dish with this name, ignoring case, or None.
+        Uses `lower(name) = lower(:name)` so that ix_dish_lower_name can serve it (ILIKE cannot).
+        """
+        return cls.query.filter(func.lower(cls.name) == name.lower()).order_by(cls.dish_id).first()
+
+    def suggestion(self):
+        """The fields of this dish needed by the autocomplete (see dish_index.py)."""
+        return {
+            'dish_id': self.dish_id,
+            'name': self.name,
+            'description': self.description,
+            'dine_in_price': float(self.dine_in_price),
+            'dish_type': self.dish_type,
+        }
+
+    @classmethod
+    def _load_suggestions(cls):
+        rows = db.session.execute(select(*(getattr(cls, f) for f in SUGGESTION_FIELDS)))
+        return [dict(row._mapping, dine_in_price=float(row.dine_in_price)) for row in rows]
+
+    @classmethod
+    def search_prefix(cls, prefix: str, limit: int = SUGGESTION_LIMIT):
+        """
+        Return up to `limit` dish suggestions (dicts) whose name or one of its words starts
+        with `prefix`, ignoring case and accents. Served from the in-process prefix index.
+        """
+        return cls.prefix_index.search(prefix, cls._load_suggestions, limit)
+
+    @classmethod
+    def reindex(cls, dish=None, dish_id: int = None):
+        """Update the prefix index after `dish` was created or modified, or after `dish_id` was deleted."""
+        if dish is not None:
+            cls.prefix_index.upsert(dish.suggestion())
+        else:
+            cls.prefix_index.remove(dish_id)
+
+    @classmethod
+    def sync_catalog(cls, rows):
+        """
+        Find or create the dishes of the menu editor rows (dicts with dish_id, name, description,
+        dine_in_price, dish_type) and update the fields that changed, with batched statements:
+        one SELECT, one multi-row INSERT and one executemany UPDATE at most.
+        A row's dish_id is kept if that dish still has the row's name, else the name is looked up
+        ignoring case (the oldest dish wins, as in get_by_name).
+        Returns (dish_id of every row, ids of the created dishes, ids of the updated dishes).
+        The caller is responsible for committing the session.
+        """
+        given_ids = {int(r['dish_id']) for r in rows if str(r.get('dish_id') or '').isdigit()}
+        names = {r['name'].lower() for r in rows}
+        existing = db.session.execute(
+            select(cls.dish_id, cls.name, cls.description, cls.dine_in_price, cls.dish_type)
+            .where(or_(cls.dish_id.in_(given_ids), func.lower(cls.name).in_(names)))
+            .order_by(cls.dish_id)
+        ).all()
+        by_id = {d.dish_id: d for d in existing}
+        by_name = {}
+        for d in existing:
+            by_name.setdefault(d.name.lower(), d)
+
+        matched, to_create = [], {}
+        for row in rows:
+            dish = None
+            if str(row.get('dish_id') or '').isdigit():
+                dish = by_id.get(int(row['dish_id']))
+                if dish is not None and dish.name != row['name']:
+                    dish = None
+            dish = dish or by_name.get(row['name'].lower())
+            matched.append(dish)
+            if dish is None:
+                to_create.setdefault(row['name'].lower(), row)
+
+        created = {}
+        if to_create:
+            new_rows = [
+                {'name': r['name'], 'description': r['description'], 'dine_in_price': r['dine_in_price'], 'dish_type': r['dish_type']}
+                for r in to_create.values()
+            ]
+            result = db.session.execute(insert(cls).returning(cls.dish_id, sort_by_parameter_order=True), new_rows)
+            created = dict(zip(to_create, result.scalars()))
+
+        changes = {}
+        for row, dish in zip(rows, matched):
+            if dish is None:
+                continue
+            price = Decimal(row['dine_in_price']).quantize(Decimal('0.01'))
+            if (dish.description or '', dish.dine_in_price, dish.dish_type) != (row['description'] or '', price, row['dish_type']):
+                changes[dish.dish_id] = {
+                    'dish_id': dish.dish_id, 'description': row['description'],
+                    'dine_in_price': price, 'dish_type': row['dish_type']
+                }
+        if changes:
+            db.session.execute(update(cls), list(changes.values()))
+
+        dish_ids = [dish.dish_id if dish is not None else created[row['name'].lower()] for row, dish in zip(rows, matched)]
+        return dish_ids, list(created.values()), list(changes)
+
     @classmethod
     def get_all_dicts(cls):
         """Return all dishes as a list of dictionaries, ordered by name."""
         return [dish.to_dict() for dish in cls.query.order_by(cls.name).all()]
 
+    @classmethod
+    def get_page_records(cls, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of dishes ordered by dish_id as DishRecord (columns only, no ORM entities),
+        and the cursor of the next page (or None).
+        """
+        rows, next_cursor = keyset_page(db.session.query(*projected_columns(cls, DishRecord)), [cls.dish_id], cursor, limit)
+        return [DishRecord(*row) for row in rows], next_cursor
+
     def update_from_dict(self, data):
         for field in ['name', 'description', 'dine_in_price', 'dish_type']:
             if field in data:
@@ -39,6 +163,17 @@ class Dish(db.Model):
     @classmethod
     def get_by_id(cls, dish_id):
         return db.session.get(cls, dish_id)
+
+    @classmethod
+    def get_price_map(cls, dish_ids=None):
+        """
+        Return {dish_id: row} with the (dish_id, name, dine_in_price) columns only,
+        for the given ids (one SELECT ... IN) or for the whole catalog if dish_ids is None.
+        """
+        stmt = select(cls.dish_id, cls.name, cls.dine_in_price)
+        if dish_ids is not None:
+            stmt = stmt.where(cls.dish_id.in_(dish_ids))
+        return {row.dish_id: row for row in db.session.execute(stmt)}
     
     @classmethod
     def create_dish(cls, name, description, dine_in_price, dish_type):
@@ -73,9 +208,11 @@ class Dish(db.Model):
         Returns True if successful, False otherwise.
         Catches IntegrityError if the dish is referenced by a foreign key.
         """
+        dish_id = self.dish_id
         try:
             db.session.delete(self)
             db.session.commit()
+            Dish.reindex(dish_id=dish_id)
             return True
         except IntegrityError:
             db.session.rollback()
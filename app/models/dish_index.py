@@ -0,0 +1,133 @@
+"""
+In-process prefix index of the dish catalog, for the autocomplete of the admin dashboard
+(GET /api/v1/dish/search?prefix=).
+
+Names are normalized (case, accents, spaces) and kept in two sorted arrays searched with
+bisect: the whole names, and every word of the names, so 'chick' finds 'Grilled Chicken'.
+Matches on the start of the name come first.
+
+The index is built from the database on first use and updated in place when a dish is
+created, modified or deleted in this process; `ttl` bounds how long the changes made by
+other worker processes can stay invisible.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+SUGGESTION_LIMIT = 10
+SUGGESTION_FIELDS = ('dish_id', 'name', 'description', 'dine_in_price', 'dish_type')
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accents removed, single spaces: 'Crème  Brûlée' -> 'creme brulee'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+class DishPrefixIndex:
+    """Sorted arrays of (normalized key, dish_id) plus the suggestion of every dish."""
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._suggestions = {}   # dish_id -> dict (SUGGESTION_FIELDS)
+        self._names = []         # [(nom normalisé, dish_id)], trié
+        self._words = []         # [(mot normalisé, dish_id)], trié
+        self._expires_at = None  # None : pas encore construit
+
+    def configure(self, ttl: float = None):
+        """Change the rebuild period. The index is rebuilt on next use."""
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._suggestions, self._names, self._words = {}, [], []
+            self._expires_at = None
+
+    @staticmethod
+    def _keys(suggestion):
+        name = normalize(suggestion['name'])
+        words = name.split(' ')
+        return (name, suggestion['dish_id']), [(' '.join(words[i:]), suggestion['dish_id']) for i in range(1, len(words))]
+
+    def build(self, suggestions):
+        """Replace the content of the index with `suggestions` (dicts with SUGGESTION_FIELDS)."""
+        names, words, by_id = [], [], {}
+        for suggestion in suggestions:
+            by_id[suggestion['dish_id']] = suggestion
+            name_key, word_keys = self._keys(suggestion)
+            names.append(name_key)
+            words.extend(word_keys)
+        names.sort()
+        words.sort()
+        with self._lock:
+            self._suggestions, self._names, self._words = by_id, names, words
+            self._expires_at = time.monotonic() + self.ttl
+
+    def _ensure(self, load):
+        with self._lock:
+            if self._expires_at is None or self._expires_at < time.monotonic():
+                self.build(load())
+
+    def upsert(self, suggestion):
+        """Add a dish, or re-index it after its name or its fields changed (no-op before the first build)."""
+        with self._lock:
+            if self._expires_at is None:
+                return
+            self._remove(suggestion['dish_id'])
+            self._suggestions[suggestion['dish_id']] = suggestion
+            name_key, word_keys = self._keys(suggestion)
+            self._insert(self._names, name_key)
+            for key in word_keys:
+                self._insert(self._words, key)
+
+    def remove(self, dish_id: int):
+        with self._lock:
+            self._remove(dish_id)
+
+    @staticmethod
+    def _insert(array, key):
+        array.insert(bisect_left(array, key), key)
+
+    def _remove(self, dish_id):
+        old = self._suggestions.pop(dish_id, None)
+        if old is None:
+            return
+        name_key, word_keys = self._keys(old)
+        for array, key in [(self._names, name_key)] + [(self._words, k) for k in word_keys]:
+            position = bisect_left(array, key)
+            if position < len(array) and array[position] == key:
+                del array[position]
+
+    @staticmethod
+    def _scan(array, prefix):
+        position = bisect_left(array, (prefix,))
+        while position < len(array) and array[position][0].startswith(prefix):
+            yield array[position][1]
+            position += 1
+
+    def search(self, prefix: str, load, limit: int = SUGGESTION_LIMIT) -> list:
+        """
+        Return the suggestions whose name, or one of its words, starts with `prefix`:
+        name matches first, each group in alphabetical order. `load()` returns the
+        whole catalog when the index has to be (re)built.
+        """
+        self._ensure(load)
+        prefix = normalize(prefix)
+        results, seen = [], set()
+        with self._lock:
+            for array in (self._names, self._words):
+                for dish_id in self._scan(array, prefix):
+                    if dish_id not in seen:
+                        seen.add(dish_id)
+                        results.append(self._suggestions[dish_id])
+                        if len(results) >= limit:
+                            return results
+        return results
+
+    def __len__(self):
+        return len(self._suggestions)
@@ -0,0 +1,93 @@
+from . import db
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, timedelta
+
+class IdempotencyKey(db.Model):
+    """
+    First response of a user's request sent with an `Idempotency-Key` header (see app/idempotency.py).
+
+    The row is claimed (status_code NULL) before the request runs, so a concurrent duplicate
+    finds it and waits. The commit of the request marks it EXECUTED in the same transaction,
+    so a row is taken over only if nothing was committed; the response is stored when the
+    request ends, and replayed to the retries until the row expires. Keys are stored as a
+    SHA-256 digest: the row stays small whatever the client sends.
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        db.Index('ix_idempotency_key_created_at', 'created_at'),
+    )
+    # status_code d'une requête dont la transaction est validée, réponse pas encore enregistrée
+    EXECUTED = 0
+
+    user_id = db.Column(db.Integer, db.ForeignKey('app_user.user_id', ondelete='CASCADE'), primary_key=True)
+    key_hash = db.Column(db.String(64), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # méthode, chemin et corps de la requête
+    status_code = db.Column(db.SmallInteger)                 # NULL : requête en cours, 0 : exécutée
+    headers = db.Column(db.Text)                             # JSON des en-têtes rejoués
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # identifie la requête qui a la clé
+
+    @classmethod
+    def claim(cls, user_id: int, key_hash: str, request_hash: str, ttl: timedelta, lock_timeout: timedelta):
+        """
+        Insert the in-flight row of a request and commit it. Returns its created_at, which the
+        other methods take to act on this claim only, or None if the key is already taken (by a
+        stored response or a request still running). Expired rows, and in-flight rows older than
+        `lock_timeout` that committed nothing (their worker died), are replaced.
+        """
+        dialect = db.session.get_bind(mapper=cls.__mapper__).dialect.name
+        now = datetime.utcnow()
+        db.session.execute(delete(cls).where(
+            cls.user_id == user_id, cls.key_hash == key_hash,
+            or_(cls.created_at < now - ttl, and_(cls.status_code.is_(None), cls.created_at < now - lock_timeout))
+        ))
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(cls).values(
+            user_id=user_id, key_hash=key_hash, request_hash=request_hash, created_at=now
+        ).on_conflict_do_nothing(index_elements=[cls.user_id, cls.key_hash])
+        claimed = db.session.execute(stmt).rowcount == 1
+        db.session.commit()
+        return now if claimed else None
+
+    @classmethod
+    def lookup(cls, user_id: int, key_hash: str):
+        """Return the (request_hash, status_code, headers, body, created_at) row of a key, or None."""
+        return db.session.execute(
+            select(cls.request_hash, cls.status_code, cls.headers, cls.body, cls.created_at)
+            .where(cls.user_id == user_id, cls.key_hash == key_hash)
+        ).first()
+
+    @classmethod
+    def mark_executed(cls, user_id: int, key_hash: str, claimed_at: datetime) -> bool:
+        """
+        Mark the claimed row EXECUTED in the transaction about to be committed. Returns False
+        if the claim was lost (taken over after `lock_timeout`): that transaction must not commit.
+        """
+        return db.session.execute(
+            update(cls).where(cls.user_id == user_id, cls.key_hash == key_hash,
+                              cls.created_at == claimed_at, cls.status_code.is_(None))
+            .values(status_code=cls.EXECUTED)
+        ).rowcount == 1
+
+    @classmethod
+    def complete(cls, user_id: int, key_hash: str, claimed_at: datetime, status_code: int, headers: str, body: bytes):
+        """Store the response of the claimed request (the caller commits)."""
+        db.session.execute(
+            update(cls).where(cls.user_id == user_id, cls.key_hash == key_hash, cls.created_at == claimed_at)
+            .values(status_code=status_code, headers=headers, body=body)
+        )
+
+    @classmethod
+    def release(cls, user_id: int, key_hash: str, claimed_at: datetime):
+        """
+        Delete the in-flight row of a request that failed before committing anything, so that
+        a retry runs it again (the caller commits).
+        """
+        db.session.execute(delete(cls).where(
+            cls.user_id == user_id, cls.key_hash == key_hash, cls.created_at == claimed_at, cls.status_code.is_(None)
+        ))
+
+    @classmethod
+    def purge(cls, ttl: timedelta) -> int:
+        """Delete the rows older than `ttl`. Returns the number of rows deleted (the caller commits)."""
+        return db.session.execute(delete(cls).where(cls.created_at < datetime.utcnow() - ttl)).rowcount
@@ -1,5 +1,12 @@
 from . import db
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.export import EXPORT_BATCH_SIZE
+from app.serialization import record_type, projected_columns
+
+# Row of the API lists (same fields as to_dict), encoded as is by app/serialization.py
+OrderItemRecord = record_type('OrderItemRecord', 'item_id reservation_id dish_id quantity is_takeaway applied_price')
 
 class OrderItem(db.Model):
     __tablename__ = 'order_item'
@@ -11,6 +18,10 @@ class OrderItem(db.Model):
     is_takeaway = db.Column(db.Boolean, nullable=False)
     applied_price = db.Column(db.Numeric(10,2), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_order_item_reservation', 'reservation_id'),
+    )
+
     # Relationships (optional, for navigation)
     reservation = db.relationship('Reservation', back_populates='order_items')
     dish = db.relationship('Dish', back_populates='order_items')
@@ -55,6 +66,52 @@ class OrderItem(db.Model):
         """
         return [item.to_dict() for item in cls.query.all()]
 
+    @classmethod
+    def get_page_records(cls, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of order items ordered by item_id as OrderItemRecord (columns only,
+        no ORM entities), and the cursor of the next page (or None).
+        """
+        rows, next_cursor = keyset_page(db.session.query(*projected_columns(cls, OrderItemRecord)), [cls.item_id], cursor, limit)
+        return [OrderItemRecord(*row) for row in rows], next_cursor
+
+    @classmethod
+    def get_records_by_reservation(cls, reservation_ids) -> dict:
+        """Return {reservation_id: [OrderItemRecord]} for these reservations (one SELECT ... IN)."""
+        by_reservation = {reservation_id: [] for reservation_id in reservation_ids}
+        if by_reservation:
+            rows = db.session.execute(
+                select(*projected_columns(cls, OrderItemRecord))
+                .where(cls.reservation_id.in_(by_reservation)).order_by(cls.item_id)
+            )
+            for row in rows:
+                by_reservation[row.reservation_id].append(OrderItemRecord(*row))
+        return by_reservation
+
+    @classmethod
+    def export_rows(cls, start=None, end=None, cafeteria_id: int = None):
+        """
+        Return (columns, rows) for an export of the items of the reservations made in [start, end),
+        optionally in one cafeteria, with the reservation's date, user and cafeteria.
+        Rows are plain tuples read through a server-side cursor.
+        """
+        from .reservation import Reservation
+        columns = ('item_id', 'reservation_id', 'reservation_datetime', 'user_id', 'cafeteria_id',
+                   'dish_id', 'quantity', 'is_takeaway', 'applied_price')
+        stmt = (
+            select(cls.item_id, cls.reservation_id, Reservation.reservation_datetime, Reservation.user_id,
+                   Reservation.cafeteria_id, cls.dish_id, cls.quantity, cls.is_takeaway, cls.applied_price)
+            .join(Reservation, Reservation.reservation_id == cls.reservation_id)
+            .order_by(cls.item_id)
+        )
+        if start:
+            stmt = stmt.where(Reservation.reservation_datetime >= start)
+        if end:
+            stmt = stmt.where(Reservation.reservation_datetime < end)
+        if cafeteria_id:
+            stmt = stmt.where(Reservation.cafeteria_id == cafeteria_id)
+        return columns, db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
     def update_order_item(
         self,
         reservation_id: int = None,
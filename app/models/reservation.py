@@ -1,6 +1,29 @@
 from . import db
+from sqlalchemy import update, insert, select, or_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
+from decimal import Decimal
+from app.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.export import EXPORT_BATCH_SIZE
+from app.serialization import record_type, projected_columns
+
+# Row of the API list (to_dict fields and the order items), encoded as is by app/serialization.py
+ReservationRecord = record_type(
+    'ReservationRecord', 'reservation_id user_id cafeteria_id reservation_datetime total status order_items'
+)
+
+class OrderError(Exception):
+    """
+    Raised by Reservation.place_order when an order cannot be placed.
+    Carries the HTTP status the API should answer with and extra details for the response.
+    """
+    def __init__(self, message: str, status_code: int = 400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
 
 class Reservation(db.Model):
     __tablename__ = 'reservation'
@@ -12,6 +35,13 @@ class Reservation(db.Model):
     total = db.Column(db.Numeric(10,2), nullable=False)
     status = db.Column(db.String(20), default='pending')
 
+    __table_args__ = (
+        # Historique d'un utilisateur, du plus récent au plus ancien (et pagination par curseur)
+        db.Index('ix_reservation_user_datetime', 'user_id', 'reservation_datetime', 'reservation_id'),
+        # Exports et rapports par période
+        db.Index('ix_reservation_datetime', 'reservation_datetime'),
+    )
+
     # Relationships for navigation
     user = db.relationship('AppUser', back_populates='reservations')
     cafeteria = db.relationship('Cafeteria', back_populates='reservations')
@@ -27,7 +57,7 @@ class Reservation(db.Model):
         status: str = 'pending'
     ):
         """
-        Create and add a new reservation to the session.
+        Create and add a new reservation to the session, counted in the monthly spending rollup.
         The caller is responsible for committing the session.
         Returns the Reservation instance.
         """
@@ -39,8 +69,210 @@ class Reservation(db.Model):
             status=status
         )
         db.session.add(reservation)
+        cls._record_spending(reservation._spending(), 1)
         return reservation
 
+    @classmethod
+    def counted_in_rollup(cls):
+        """SQL condition of the reservations counted in the spending rollup: not cancelled (a NULL status counts)."""
+        return or_(cls.status.is_(None), cls.status != 'cancelled')
+
+    def _spending(self) -> tuple:
+        """What the rollup counts of this reservation: (user_id, reservation_datetime, total, status)."""
+        return self.user_id, self.reservation_datetime, self.total, self.status
+
+    @staticmethod
+    def _record_spending(spending: tuple, sign: int):
+        """Add (sign=1) or remove (sign=-1) a reservation from the monthly spending rollup, if it counts."""
+        from .user_monthly_spending import UserMonthlySpending
+        user_id, moment, total, status = spending
+        if status != 'cancelled':
+            UserMonthlySpending.record(user_id, moment, sign, sign * Decimal(str(total)))
+
+    @classmethod
+    def price_items(cls, items: list, dishes: dict):
+        """
+        Validate order lines against a {dish_id: row} price map (see Dish.get_price_map)
+        and compute the total. Raises OrderError on an unknown dish or a bad quantity.
+        Returns (total, lines) where lines are ready to be inserted as OrderItem rows.
+        """
+        total_cost = Decimal('0.0')
+        lines = []
+        for item in items:
+            try:
+                dish = dishes.get(int(item.get('dish_id')))
+            except (TypeError, ValueError):
+                dish = None
+            if dish is None:
+                raise OrderError(f"Dish with ID {item.get('dish_id')} not found.", 404)
+            quantity = int(item.get('quantity', 1))
+            if quantity <= 0:
+                raise OrderError(f"Quantity for dish '{dish.name}' must be positive.", 400)
+            price = Decimal(dish.dine_in_price)
+            total_cost += price * quantity
+            lines.append({
+                "dish_id": dish.dish_id,
+                "quantity": quantity,
+                "is_takeaway": bool(item.get('is_takeaway', False)),
+                "applied_price": price
+            })
+        return total_cost, lines
+
+    @classmethod
+    def place_order(
+        cls,
+        user_id: int,
+        cafeteria_id: int,
+        items: list,
+        status: str = 'pending'
+    ):
+        """
+        Price and record an order for a user, debiting their balance.
+        `items` is a list of dicts: { "dish_id": 1, "quantity": 2, "is_takeaway": false }.
+
+        The number of statements does not depend on the number of lines:
+        one SELECT ... IN for the dish prices, one INSERT for the reservation,
+        one upsert of the monthly spending rollup, one bulk INSERT for the order
+        items and one conditional balance debit.
+        The caller is responsible for committing, or rolling back on OrderError.
+        Returns the Reservation instance.
+        """
+        from .app_user import AppUser
+        from .dish import Dish
+        from .order_item import OrderItem
+
+        dish_ids = set()
+        for item in items:
+            try:
+                dish_ids.add(int(item.get('dish_id')))
+            except (TypeError, ValueError):
+                raise OrderError(f"Dish with ID {item.get('dish_id')} not found.", 404)
+        total_cost, lines = cls.price_items(items, Dish.get_price_map(dish_ids))
+
+        # --- Reservation (INSERT ... RETURNING) and all its items (one bulk INSERT) ---
+        reservation = cls.create_reservation(
+            user_id=user_id,
+            cafeteria_id=cafeteria_id,
+            total=total_cost,
+            status=status
+        )
+        db.session.flush()
+        for line in lines:
+            line['reservation_id'] = reservation.reservation_id
+        db.session.execute(insert(OrderItem), lines)
+
+        # --- Debit last, so the user row is locked only until the commit ---
+        if AppUser.debit_balance(user_id, total_cost) is None:
+            current_balance = db.session.execute(
+                select(AppUser.balance).where(AppUser.user_id == user_id)
+            ).scalar()
+            raise OrderError(
+                "Insufficient balance.", 402,
+                required_balance=float(total_cost),
+                current_balance=float(current_balance or 0)
+            )
+        return reservation
+
+    @classmethod
+    def place_orders_bulk(cls, orders: list, dishes: dict):
+        """
+        Record many orders (e.g. replayed by a kiosk) with set-based statements.
+        `orders` is a list of (key, record) pairs, where a record holds user_id, cafeteria_id,
+        items and optionally reservation_datetime (ISO 8601) and status.
+        Prices are checked against the preloaded `dishes` map and cafeterias against the cached
+        directory (Cafeteria.lookup). Balances are read with one
+        SELECT ... IN and debited once per user; reservations and items use one bulk INSERT each.
+        Invalid records are skipped, the others are recorded.
+        The caller is responsible for committing the session.
+        Returns a list of (key, reservation_id, error) in the input order.
+        """
+        from .app_user import AppUser
+        from .cafeteria import Cafeteria
+        from .order_item import OrderItem
+        from .user_monthly_spending import UserMonthlySpending
+
+        results = {}
+        accepted = []
+        for key, record in orders:
+            try:
+                if not isinstance(record, dict) or not all(record.get(k) for k in ('user_id', 'cafeteria_id', 'items')):
+                    raise OrderError("Missing user_id, cafeteria_id or items.", 400)
+                user_id = int(record['user_id'])
+                # Vérifiée ici (annuaire en cache, sans requête) : une clé étrangère invalide ferait
+                # échouer l'INSERT groupé, donc tout le lot
+                cafeteria_id = record['cafeteria_id']
+                if type(cafeteria_id) is not int or Cafeteria.lookup(cafeteria_id) is None:
+                    raise OrderError(f"Cafeteria with ID {cafeteria_id} not found.", 404)
+                if not isinstance(record['items'], list):
+                    raise OrderError("The 'items' field must be a non-empty list.", 400)
+                total_cost, lines = cls.price_items(record['items'], dishes)
+                reservation_datetime = record.get('reservation_datetime')
+                if reservation_datetime:
+                    reservation_datetime = datetime.fromisoformat(reservation_datetime)
+                status = record.get('status', 'pending')
+                if status not in ('pending', 'completed'):
+                    raise OrderError(f"Invalid status '{status}'.", 400)
+            except OrderError as e:
+                results[key] = (None, e.message)
+                continue
+            except (KeyError, TypeError, ValueError):
+                results[key] = (None, "Invalid record.")
+                continue
+            accepted.append({
+                "key": key, "user_id": user_id, "cafeteria_id": cafeteria_id,
+                "reservation_datetime": reservation_datetime or datetime.utcnow(),
+                "status": status, "total": total_cost, "lines": lines
+            })
+
+        # --- Balances: one read, a running check in order, then one debit per user ---
+        balances = dict(db.session.execute(
+            select(AppUser.user_id, AppUser.balance)
+            .where(AppUser.user_id.in_({order['user_id'] for order in accepted}))
+        ).all())
+        to_debit = {}
+        payable = []
+        for order in accepted:
+            user_id = order['user_id']
+            if user_id not in balances:
+                results[order['key']] = (None, f"User with ID {user_id} not found.")
+            elif balances[user_id] < order['total']:
+                results[order['key']] = (None, "Insufficient balance.")
+            else:
+                balances[user_id] -= order['total']
+                to_debit[user_id] = to_debit.get(user_id, Decimal('0.0')) + order['total']
+                payable.append(order)
+        refused = {
+            user_id for user_id, amount in to_debit.items()
+            if AppUser.debit_balance(user_id, amount) is None
+        }
+        for order in payable:
+            if order['user_id'] in refused:
+                # The balance changed concurrently since it was read: refuse this user's orders.
+                results[order['key']] = (None, "Insufficient balance.")
+        payable = [order for order in payable if order['user_id'] not in refused]
+
+        # --- Reservations and order items: one bulk INSERT each ---
+        if payable:
+            reservation_ids = db.session.scalars(
+                insert(cls).returning(cls.reservation_id, sort_by_parameter_order=True),
+                [{
+                    "user_id": order['user_id'], "cafeteria_id": order['cafeteria_id'],
+                    "reservation_datetime": order['reservation_datetime'],
+                    "total": order['total'], "status": order['status']
+                } for order in payable]
+            ).all()
+            items = []
+            for order, reservation_id in zip(payable, reservation_ids):
+                results[order['key']] = (reservation_id, None)
+                for line in order['lines']:
+                    items.append({**line, "reservation_id": reservation_id})
+            db.session.execute(insert(OrderItem), items)
+            UserMonthlySpending.record_many(
+                [(order['user_id'], order['reservation_datetime'], order['total']) for order in payable]
+            )
+
+        return [(key, *results[key]) for key, _ in orders]
+
     @classmethod
     def get_by_id(cls, reservation_id: int):
         """
@@ -57,6 +289,81 @@ class Reservation(db.Model):
         """
         return [res.to_dict() for res in cls.query.all()]
 
+    @classmethod
+    def history_options(cls):
+        """
+        Loader options to display reservations with their cafeteria, order items and dishes
+        in a fixed number of queries (instead of lazy loads per reservation and per item).
+        """
+        from .order_item import OrderItem
+        return (
+            joinedload(cls.cafeteria),
+            selectinload(cls.order_items).joinedload(OrderItem.dish),
+        )
+
+    @classmethod
+    def history_query(cls, user_id: int, year: int = None, month: int = None):
+        """
+        Query of a user's reservations (optionally of one month), newest first.
+        The month is a half-open range on reservation_datetime, so that
+        ix_reservation_user_datetime serves both the filter and the order.
+        """
+        query = cls.query.filter_by(user_id=user_id)
+        if year and month:
+            start = datetime(year, month, 1)
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+            query = query.filter(cls.reservation_datetime >= start, cls.reservation_datetime < end)
+        return query.order_by(cls.reservation_datetime.desc())
+
+    @classmethod
+    def get_history(cls, user_id: int, year: int = None, month: int = None):
+        """
+        Return a user's reservations (optionally of one month), newest first,
+        with cafeteria, order items and dishes already loaded.
+        """
+        return cls.history_query(user_id, year, month).options(*cls.history_options()).all()
+
+    @classmethod
+    def get_history_page(cls, user_id: int, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of a user's reservations, newest first, loaded as get_history does,
+        and the cursor of the next page (or None). Bounds the "all periods" history.
+        """
+        return keyset_page(
+            cls.query.filter_by(user_id=user_id).options(*cls.history_options()),
+            [cls.reservation_datetime, cls.reservation_id], cursor, limit, descending=True
+        )
+
+    @classmethod
+    def get_user_page_records(cls, user_id: int, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """
+        Return one page of a user's reservations, newest first, as ReservationRecord with their
+        OrderItemRecord (two column-only SELECTs, no ORM entities), and the cursor of the next page (or None).
+        """
+        from .order_item import OrderItem
+        rows, next_cursor = keyset_page(
+            db.session.query(*projected_columns(cls, ReservationRecord)).filter(cls.user_id == user_id),
+            [cls.reservation_datetime, cls.reservation_id], cursor, limit, descending=True
+        )
+        items = OrderItem.get_records_by_reservation([row.reservation_id for row in rows])
+        return [ReservationRecord(*row, items[row.reservation_id]) for row in rows], next_cursor
+
+    @classmethod
+    def export_rows(cls, start: datetime = None, end: datetime = None, cafeteria_id: int = None):
+        """
+        Return (columns, rows) for an export of the reservations made in [start, end),
+        optionally in one cafeteria. Rows are plain tuples read through a server-side cursor.
+        """
+        columns = ('reservation_id', 'user_id', 'cafeteria_id', 'reservation_datetime', 'total', 'status')
+        stmt = select(*(getattr(cls, c) for c in columns)).order_by(cls.reservation_id)
+        if start:
+            stmt = stmt.where(cls.reservation_datetime >= start)
+        if end:
+            stmt = stmt.where(cls.reservation_datetime < end)
+        if cafeteria_id:
+            stmt = stmt.where(cls.cafeteria_id == cafeteria_id)
+        return columns, db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
     def update_reservation(
         self,
         user_id: int = None,
@@ -67,8 +374,10 @@ class Reservation(db.Model):
     ) -> bool:
         """
         Update the reservation fields. Only provided fields will be updated.
+        The monthly spending rollup follows (user, month, total and cancelled status).
         Returns True if update is successful, False otherwise.
         """
+        before = self._spending()
         updated = False
         if user_id is not None:
             self.user_id = user_id
@@ -87,6 +396,9 @@ class Reservation(db.Model):
             updated = True
         if not updated:
             return False
+        if self._spending() != before:
+            self._record_spending(before, -1)
+            self._record_spending(self._spending(), 1)
         try:
             db.session.commit()
             return True
@@ -94,12 +406,34 @@ class Reservation(db.Model):
             db.session.rollback()
             return False
 
+    def cancel_if_pending(self) -> bool:
+        """
+        Move this reservation from 'pending' to 'cancelled' with a conditional UPDATE,
+        so that two concurrent cancellations cannot both succeed (and refund twice).
+        The order is removed from the user's monthly spending rollup.
+        The caller is responsible for committing the session.
+        Returns True if this call performed the transition, False otherwise.
+        """
+        cls = type(self)
+        result = db.session.execute(
+            update(cls)
+            .where(cls.reservation_id == self.reservation_id, cls.status == 'pending')
+            .values(status='cancelled')
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        self._record_spending(self._spending(), -1)
+        set_committed_value(self, 'status', 'cancelled')
+        return True
+
     def delete_reservation(self) -> bool:
         """
-        Delete this reservation from the database.
+        Delete this reservation from the database (and from the monthly spending rollup).
         Returns True if successful, False otherwise.
         """
         try:
+            self._record_spending(self._spending(), -1)
             db.session.delete(self)
             db.session.commit()
             return True
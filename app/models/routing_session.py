@@ -0,0 +1,61 @@
+# app/models/routing_session.py
+
+import time
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_KEY = 'replica'
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the queries of read-only requests to the read replica.
+
+    The replica is the 'replica' entry of SQLALCHEMY_BINDS (built from DB_REPLICA_*).
+    Queries stay on the primary when:
+    - the request is not a GET/HEAD/OPTIONS,
+    - this session already wrote (flush, INSERT/UPDATE/DELETE) during the request,
+    - the user session wrote less than DB_REPLICA_STICKY_SECONDS ago (read-your-writes),
+    - the view asked for it with use_primary().
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and REPLICA_BIND_KEY in self._db.engines:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                mark_write()
+            elif _replica_allowed():
+                return self._db.engines[REPLICA_BIND_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_allowed() -> bool:
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return False
+    if g.get('_db_use_primary'):
+        return False
+    return session.get('_db_primary_until', 0) < time.time()
+
+
+def mark_write():
+    """Remember that the current request wrote to the primary: it reads from the primary from now on."""
+    if has_request_context():
+        g._db_use_primary = True
+        g._db_wrote = True
+
+
+def use_primary():
+    """Force the rest of the current request onto the primary database."""
+    if has_request_context():
+        g._db_use_primary = True
+
+
+def init_read_replica(app):
+    """Keep a user session on the primary for a while after it wrote, to hide replication lag."""
+    sticky_seconds = app.config.get('DB_REPLICA_STICKY_SECONDS', 5.0)
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if g.get('_db_wrote'):
+            session['_db_primary_until'] = time.time() + sticky_seconds
+        return response
@@ -0,0 +1,105 @@
+from . import db
+from sqlalchemy import select, delete, insert, func, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import date, datetime
+from decimal import Decimal
+
+class UserMonthlySpending(db.Model):
+    """
+    Rollup of the reservations of a user per calendar month: number of orders and amount spent.
+    Cancelled (refunded) reservations are not counted; those without a status are.
+
+    Maintained incrementally by Reservation.create_reservation (and so place_order),
+    place_orders_bulk, update_reservation, cancel_if_pending and delete_reservation;
+    `flask cantina rebuild-rollups` recomputes it from the reservation table (after a bulk
+    load or SQL edits of reservations).
+    """
+    __tablename__ = 'user_monthly_spending'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('app_user.user_id', ondelete='CASCADE'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # premier jour du mois
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    @staticmethod
+    def month_of(moment) -> date:
+        return date(moment.year, moment.month, 1)
+
+    @classmethod
+    def _upsert(cls, rows: list):
+        """Add rows of {user_id, month, order_count, total} to the existing counters (INSERT ... ON CONFLICT)."""
+        dialect = db.session.get_bind(mapper=cls.__mapper__).dialect.name  # vérifié au démarrage (check_dialect)
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(cls)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.month],
+            set_={
+                'order_count': cls.order_count + stmt.excluded.order_count,
+                'total': cls.total + stmt.excluded.total,
+            }
+        )
+        db.session.execute(stmt, rows)
+
+    @classmethod
+    def record(cls, user_id: int, moment: datetime, order_count: int, total):
+        """
+        Add `order_count` orders worth `total` to the month of `moment` (negative values to remove).
+        The caller is responsible for committing the session, with the reservation change.
+        """
+        cls._upsert([{
+            'user_id': user_id, 'month': cls.month_of(moment or datetime.utcnow()),
+            'order_count': order_count, 'total': Decimal(str(total))
+        }])
+
+    @classmethod
+    def record_many(cls, reservations: list):
+        """Add reservations given as (user_id, reservation_datetime, total) tuples, one row per (user, month)."""
+        rows = {}
+        for user_id, moment, total in reservations:
+            key = (user_id, cls.month_of(moment))
+            row = rows.setdefault(key, {'user_id': user_id, 'month': key[1], 'order_count': 0, 'total': Decimal('0.00')})
+            row['order_count'] += 1
+            row['total'] += Decimal(total)
+        if rows:
+            cls._upsert(list(rows.values()))
+
+    @classmethod
+    def get_for_user(cls, user_id: int):
+        """
+        Return the months of a user, newest first, as UserMonthlySpending rows
+        (one range scan of the primary key).
+        """
+        return cls.query.filter_by(user_id=user_id).order_by(cls.month.desc()).all()
+
+    @classmethod
+    def rebuild(cls, connection=None) -> int:
+        """
+        Recompute the whole rollup from the reservation table with one INSERT ... SELECT ... GROUP BY.
+        Runs on `connection` if given, else in the current session (the caller commits).
+        Returns the number of (user, month) rows.
+        """
+        from .reservation import Reservation
+        executor = connection if connection is not None else db.session
+        dialect = (connection.dialect if connection is not None else db.session.get_bind(mapper=cls.__mapper__).dialect).name
+        if dialect == 'postgresql':
+            month = func.date_trunc('month', Reservation.reservation_datetime).cast(db.Date)
+        else:
+            month = func.date(Reservation.reservation_datetime, literal_column("'start of month'"))
+        executor.execute(delete(cls))
+        executor.execute(insert(cls).from_select(
+            ['user_id', 'month', 'order_count', 'total'],
+            select(Reservation.user_id, month, func.count(Reservation.reservation_id), func.sum(Reservation.total))
+            .where(Reservation.counted_in_rollup())
+            .group_by(Reservation.user_id, month)
+        ))
+        return executor.execute(select(func.count()).select_from(cls)).scalar()
+
+    def to_dict(self):
+        """
+        Return this rollup row as a dictionary.
+        """
+        return {
+            'user_id': self.user_id,
+            'month': self.month.isoformat(),
+            'order_count': self.order_count,
+            'total': float(self.total)
+        }
@@ -0,0 +1,159 @@
+"""
+Search of users by name or email, for the admin users page (fired on every keystroke).
+
+- PostgreSQL: GIN trigram index (pg_trgm) on lower(first_name || ' ' || last_name || ' ' || email),
+  for substring matches and close spellings (similarity).
+- SQLite: FTS5 shadow table with the trigram tokenizer (external content = app_user,
+  kept in sync by triggers).
+- Queries shorter than a trigram match the start of the last name, whatever its case
+  (range of ix_app_user_lower_name).
+
+At most SEARCH_CANDIDATES matches are ranked (name starting with the query, then email,
+then the others; similarity on PostgreSQL) and the first `limit` are returned. The ranked
+user_ids of a query are kept a few seconds in `search_cache`, so typing back and forth
+does not query the database again.
+"""
+from sqlalchemy import text
+
+from . import db
+from app.cache import TTLCache
+
+SEARCH_LIMIT = 50
+SEARCH_CANDIDATES = 500  # correspondances classées au plus (une requête trop large n'en trie pas 50 000)
+MIN_TERM_LENGTH = 3  # longueur d'un trigramme
+
+# (query, role, limit) -> tuple des user_id classés
+search_cache = TTLCache(maxsize=256, ttl=5.0)
+
+SEARCH_EXPRESSION = "lower(first_name || ' ' || last_name || ' ' || email)"
+
+POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_app_user_search_trgm ON app_user USING gin (({SEARCH_EXPRESSION}) gin_trgm_ops)",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS app_user_fts USING fts5("
+    "first_name, last_name, email, content='app_user', content_rowid='user_id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS app_user_fts_ai AFTER INSERT ON app_user BEGIN "
+    "INSERT INTO app_user_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.user_id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS app_user_fts_ad AFTER DELETE ON app_user BEGIN "
+    "INSERT INTO app_user_fts(app_user_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.user_id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS app_user_fts_au AFTER UPDATE OF first_name, last_name, email ON app_user BEGIN "
+    "INSERT INTO app_user_fts(app_user_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.user_id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO app_user_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.user_id, new.first_name, new.last_name, new.email); END",
+)
+
+
+def install_search(connection):
+    """
+    Create the search index of the dialect (idempotent, called by bootstrap_database).
+    On SQLite a new FTS table is filled from the existing users.
+    """
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+    elif dialect == 'sqlite':
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'app_user_fts'"
+        ).first()
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO app_user_fts(app_user_fts) VALUES ('rebuild')")
+
+
+def _terms(query: str) -> list:
+    return [term for term in query.lower().split() if term]
+
+
+def _like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Classement des candidats : le nom ou le prénom commence par le premier terme, puis l'email, puis le reste
+RANK_EXPRESSION = ("CASE WHEN lower(u.last_name) LIKE :prefix ESCAPE '\\' OR lower(u.first_name) LIKE :prefix ESCAPE '\\' "
+                   "THEN 0 WHEN lower(u.email) LIKE :prefix ESCAPE '\\' THEN 1 ELSE 2 END")
+
+
+def _name_range_search(terms, role, limit):
+    """
+    Queries shorter than a trigram: the last name starts with the first term
+    (a range of ix_app_user_lower_name), the first name with the next ones.
+    """
+    low = terms[0]  # déjà en minuscules : "de la Fontaine" et "MCDONALD" sont trouvés
+    params = {'low': low, 'high': low[:-1] + chr(ord(low[-1]) + 1), 'limit': limit, 'role': role}
+    clauses = ["lower(last_name) >= :low", "lower(last_name) < :high"]
+    for i, term in enumerate(terms[1:]):
+        clauses.append(f"lower(first_name) LIKE :t{i} ESCAPE '\\'")
+        params[f't{i}'] = _like(term) + '%'
+    if role:
+        clauses.append("role = :role")
+    return text(f"SELECT user_id FROM app_user WHERE {' AND '.join(clauses)} "
+                f"ORDER BY lower(last_name), lower(first_name), user_id LIMIT :limit"), params
+
+
+def _alphabetical(role, limit):
+    role_clause = "WHERE role = :role" if role else ''
+    return text(f"SELECT user_id FROM app_user {role_clause} ORDER BY last_name, first_name, user_id LIMIT :limit"), \
+        {'role': role, 'limit': limit}
+
+
+def _postgres_search(query, terms, role, limit):
+    """Every term is a substring (trigram index), or the whole query is close to the user (similarity)."""
+    params = {'q': query, 'prefix': _like(terms[0]) + '%', 'role': role,
+              'candidates': SEARCH_CANDIDATES, 'limit': limit}
+    likes = []
+    for i, term in enumerate(terms):
+        likes.append(f"{SEARCH_EXPRESSION} LIKE :t{i}")
+        params[f't{i}'] = f"%{_like(term)}%"
+    role_clause = "AND role = :role" if role else ''
+    return text(
+        f"SELECT u.user_id FROM (SELECT user_id, similarity({SEARCH_EXPRESSION}, :q) AS score FROM app_user "
+        f"WHERE (({' AND '.join(likes)}) OR {SEARCH_EXPRESSION} % :q) {role_clause} LIMIT :candidates) c "
+        f"JOIN app_user u ON u.user_id = c.user_id "
+        f"ORDER BY {RANK_EXPRESSION}, c.score DESC, u.last_name, u.first_name, u.user_id LIMIT :limit"
+    ), params
+
+
+def _sqlite_search(terms, role, limit):
+    """FTS5 trigram MATCH: every term is a substring of one of the columns."""
+    match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+    # Rôle filtré parmi les candidats, comme sur PostgreSQL : sinon LIMIT :candidates peut ne garder que d'autres rôles
+    role_join = "JOIN app_user r ON r.user_id = app_user_fts.rowid AND r.role = :role" if role else ''
+    return text(
+        f"SELECT u.user_id FROM (SELECT app_user_fts.rowid AS user_id FROM app_user_fts {role_join} "
+        f"WHERE app_user_fts MATCH :match LIMIT :candidates) c JOIN app_user u ON u.user_id = c.user_id "
+        f"ORDER BY {RANK_EXPRESSION}, u.last_name, u.first_name, u.user_id LIMIT :limit"
+    ), {'match': match, 'prefix': _like(terms[0]) + '%', 'role': role,
+        'candidates': SEARCH_CANDIDATES, 'limit': limit}
+
+
+def search_user_ids(query: str = '', role: str = None, limit: int = SEARCH_LIMIT) -> tuple:
+    """Return the user_ids matching `query` (and `role`), best match first, at most `limit`."""
+    query = ' '.join(_terms(query or ''))
+    key = (query, role or None, limit)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Les termes plus courts qu'un trigramme ne sont pas indexés : ils sont ignorés s'il y en a d'autres
+    terms = [t for t in _terms(query) if len(t) >= MIN_TERM_LENGTH] or _terms(query)
+    dialect = db.session.get_bind().dialect.name
+    if not terms:
+        statement, params = _alphabetical(role, limit)
+    elif max(len(t) for t in terms) < MIN_TERM_LENGTH:
+        statement, params = _name_range_search(terms, role, limit)
+    elif dialect == 'postgresql':
+        statement, params = _postgres_search(query, terms, role, limit)
+    else:
+        statement, params = _sqlite_search(terms, role, limit)
+
+    user_ids = tuple(db.session.execute(statement, params).scalars())
+    search_cache.set(key, user_ids)
+    return user_ids
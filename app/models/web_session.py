@@ -0,0 +1,49 @@
+from . import db
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
+
+class WebSession(db.Model):
+    """
+    Server-side storage of the Flask sessions (SESSION_BACKEND = 'postgres' or 'sqlite',
+    see app/session_store.py): the cookie only carries `sid`, the session dict is
+    kept here serialized, until `expires_at`.
+
+    The methods take a connection rather than using db.session: sessions are read and
+    written outside the unit of work of the request, always on the primary.
+    """
+    __tablename__ = 'web_session'
+    __table_args__ = (
+        db.Index('ix_web_session_expires_at', 'expires_at'),
+    )
+
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def load(cls, connection, sid: str):
+        """Return the serialized session `sid`, or None if it does not exist or has expired."""
+        return connection.execute(
+            select(cls.data).where(cls.sid == sid, cls.expires_at > datetime.utcnow())
+        ).scalar()
+
+    @classmethod
+    def store(cls, connection, sid: str, data: str, expires_at: datetime):
+        """Insert or replace the session `sid` (INSERT ... ON CONFLICT DO UPDATE)."""
+        dialect = connection.dialect.name  # SQLite du backend sqlite, ou la base de l'app (check_dialect)
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(cls)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cls.sid],
+            set_={'data': stmt.excluded.data, 'expires_at': stmt.excluded.expires_at}
+        )
+        connection.execute(stmt, {'sid': sid, 'data': data, 'expires_at': expires_at})
+
+    @classmethod
+    def remove(cls, connection, sid: str):
+        connection.execute(delete(cls).where(cls.sid == sid))
+
+    @classmethod
+    def purge(cls, connection) -> int:
+        """Delete the expired sessions. Returns the number of rows deleted."""
+        return connection.execute(delete(cls).where(cls.expires_at <= datetime.utcnow())).rowcount
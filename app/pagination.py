@@ -0,0 +1,98 @@
+# app/pagination.py
+"""
+Keyset (cursor) pagination for the API list endpoints.
+
+A page is read with `WHERE (k1, k2) > (:last_k1, :last_k2) ORDER BY k1, k2 LIMIT n`
+on indexed columns (the primary key, plus a timestamp where the order needs it),
+so page N costs the same as page 1, unlike OFFSET.
+
+The body of a paginated response is still the JSON array of the page; the next
+page is announced in the `Link: <...>; rel="next"` header and in `X-Next-Cursor`.
+The cursor is opaque for clients (base64 of the last key of the page).
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from flask import jsonify, request, url_for
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    """The `cursor` or `limit` query parameter cannot be used."""
+
+
+def encode_cursor(values) -> str:
+    payload = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, columns) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type in (datetime, date):
+                value = python_type.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError):
+        raise InvalidCursor("Curseur de pagination invalide")
+
+
+def keyset_page(query, columns, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, descending: bool = False):
+    """
+    Return (rows, next_cursor) for the page of `query` that follows `cursor`,
+    ordered by `columns` (which must identify a row uniquely, e.g. end with the primary key).
+    next_cursor is None on the last page.
+    """
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        last = tuple_(*values) if len(columns) > 1 else values[0]
+        query = query.filter(key < last if descending else key > last)
+    query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last_row = rows[-1]
+    return rows, encode_cursor([getattr(last_row, c.key) for c in columns])
+
+
+def page_args():
+    """Read `cursor` and `limit` from the query string."""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor("Paramètre limit invalide")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise InvalidCursor(f"Le paramètre limit doit être compris entre 1 et {MAX_PAGE_SIZE}")
+    return request.args.get('cursor') or None, limit
+
+
+def paginated_response(fetch_page, **kwargs):
+    """
+    Call `fetch_page(cursor=..., limit=..., **kwargs)` -> (items, next_cursor) with the
+    request's parameters and answer with the page, plus the link to the next one.
+    """
+    try:
+        cursor, limit = page_args()
+        items, next_cursor = fetch_page(cursor=cursor, limit=limit, **kwargs)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify(items)
+    if next_cursor:
+        args = dict(request.view_args or {}, **request.args.to_dict())
+        args.update(cursor=next_cursor, limit=limit)
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
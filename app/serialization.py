@@ -0,0 +1,67 @@
+# app/serialization.py
+"""
+Fast path for the JSON of the API lists.
+
+- A list is read as column tuples (a select of the columns it returns: no ORM entity,
+  no identity map) and each row becomes a slotted record, see `record_type`.
+- The JSON is written by orjson when it is installed, else by the json module, with the
+  same conversions as the to_dict() methods: Decimal as a number, date / datetime as
+  ISO 8601, records as objects. FastJSONProvider plugs it into jsonify, and `dumps`
+  is the `tojson` filter of the templates.
+"""
+import dataclasses
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : repli sur le module json
+    orjson = None
+
+
+def record_type(name: str, fields: str):
+    """Slotted record class with these space-separated fields, built positionally from a row."""
+    return dataclasses.make_dataclass(name, fields.split(), slots=True)
+
+
+def projected_columns(model, record) -> list:
+    """The columns of `model` that fill `record` (fields that are not columns are filled by the caller)."""
+    return [getattr(model, name) for name in record.__slots__ if name in model.__table__.c]
+
+
+def _default(value):
+    # orjson encode lui-même date, datetime et les dataclasses ; le module json passe par ici
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if dataclasses.is_dataclass(value):
+        return {name: getattr(value, name) for name in value.__slots__}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode()
+else:
+    def dumps(obj) -> str:
+        return json.dumps(obj, default=_default, separators=(',', ':'))
+
+
+class FastJSONProvider(JSONProvider):
+    """jsonify() through `dumps` (orjson when available). Keys keep their order, they are not sorted."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(f"{dumps(obj)}\n", mimetype='application/json')
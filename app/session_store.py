@@ -0,0 +1,192 @@
+# app/session_store.py
+"""
+Server-side Flask sessions: the cookie only carries an opaque random id, the session
+dict (user_id, cart, cafeteria...) is kept in a store, chosen with SESSION_BACKEND:
+
+- 'cookie'   (default) Flask's signed cookie session, nothing stored on the server
+- 'memory'   in-process LRU (SESSION_CACHE_SIZE entries): one process only (dev, tests)
+- 'sqlite'   SQLite file SESSION_SQLITE_PATH (WAL), shared by the workers of one host
+- 'postgres' web_session table of the application database, shared by every host
+
+The session is written to the store, and the cookie sent, only when the session changed
+(its serialized form differs from the stored one, not merely a key assigned again):
+most requests neither ship a growing cookie nor sign/verify one, nor write the store. A stored session
+expires PERMANENT_SESSION_LIFETIME after its last change; `flask cantina purge-sessions`
+deletes the expired rows of the 'sqlite' and 'postgres' stores.
+"""
+import os
+import secrets
+import threading
+from datetime import datetime
+
+from flask.sessions import SessionInterface, SecureCookieSession
+from flask.json.tag import TaggedJSONSerializer
+from sqlalchemy import create_engine, event
+
+from app.cache import TTLCache
+from app.models import db, WebSession
+
+SESSION_BACKENDS = ('cookie', 'memory', 'sqlite', 'postgres')
+
+
+def new_sid() -> str:
+    """256 random bits: the id cannot be guessed, so the cookie does not need a signature."""
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(SecureCookieSession):
+    """Session dict (with the modified / accessed flags of the cookie session) and its id in the store."""
+
+    def __init__(self, initial=None, sid=None, new=False, stored=None):
+        super().__init__(initial)
+        self.sid = sid or new_sid()
+        self.new = new
+        self.previous_sid = None
+        self.stored = stored  # forme sérialisée lue dans le store
+
+    def regenerate(self):
+        """Move the session to a new id (on login), so an id known before authentication becomes useless."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+
+def regenerate_session(session):
+    """Give the session a new id if it is stored server-side (no-op for the cookie session)."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+class MemorySessionStore:
+    """Serialized sessions in a TTLCache of the process."""
+
+    def __init__(self, maxsize: int, lifetime: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=lifetime)
+
+    def load(self, sid):
+        return self._cache.get(sid)
+
+    def save(self, sid, data, expires_at):
+        self._cache.set(sid, data)
+
+    def delete(self, sid):
+        self._cache.invalidate(sid)
+
+    def purge(self) -> int:
+        return 0  # les entrées expirées sont ignorées puis évincées par le cache
+
+
+class DatabaseSessionStore:
+    """Rows of the web_session table (WebSession), read and written on their own connection."""
+
+    def __init__(self, get_engine):
+        self._get_engine = get_engine
+
+    def load(self, sid):
+        with self._get_engine().connect() as connection:
+            return WebSession.load(connection, sid)
+
+    def save(self, sid, data, expires_at):
+        with self._get_engine().begin() as connection:
+            WebSession.store(connection, sid, data, expires_at)
+
+    def delete(self, sid):
+        with self._get_engine().begin() as connection:
+            WebSession.remove(connection, sid)
+
+    def purge(self) -> int:
+        with self._get_engine().begin() as connection:
+            return WebSession.purge(connection)
+
+
+class SQLiteSessionStore(DatabaseSessionStore):
+    """web_session table in a local SQLite file, opened lazily by each (forked) worker process."""
+
+    def __init__(self, path: str):
+        super().__init__(self._engine)
+        self.path = path
+        self._lock = threading.Lock()
+        self._engines = {}  # pid -> engine (pas de connexions héritées du master)
+
+    def _engine(self):
+        pid = os.getpid()
+        engine = self._engines.get(pid)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(pid)
+                if engine is None:
+                    engine = create_engine(f"sqlite:///{self.path}")
+                    event.listen(engine, 'connect', self._configure_connection)
+                    WebSession.__table__.create(engine, checkfirst=True)
+                    self._engines = {pid: engine}
+        return engine
+
+    @staticmethod
+    def _configure_connection(dbapi_connection, connection_record):
+        # WAL : les lectures des autres workers ne bloquent pas les écritures
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+        dbapi_connection.execute("PRAGMA busy_timeout=5000")
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keep the session in `store`, and only its id in the cookie."""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSession(self.serializer.loads(data), sid=sid, stored=data)
+        # Id inconnu ou expiré : nouvel id, jamais celui proposé par le client
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+        if not session:
+            # Session vidée (déconnexion) : l'entrée et le cookie sont supprimés
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+        data = self.serializer.dumps(dict(session))
+        if data == session.stored and session.previous_sid is None:
+            return  # marquée modifiée mais identique : ni écriture ni cookie, l'expiration n'est pas repoussée
+        lifetime = app.permanent_session_lifetime
+        self.store.save(session.sid, data, datetime.utcnow() + lifetime)
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app), domain=domain, path=path,
+        )
+
+
+def init_session(app):
+    """Install the server-side session interface selected by SESSION_BACKEND."""
+    backend = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"SESSION_BACKEND must be one of {', '.join(SESSION_BACKENDS)}, not {backend!r}")
+    if backend == 'cookie':
+        return
+    if backend == 'memory':
+        store = MemorySessionStore(app.config.get('SESSION_CACHE_SIZE', 100000),
+                                   app.permanent_session_lifetime.total_seconds())
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore(app.config.get('SESSION_SQLITE_PATH', '/tmp/cantina-sessions.db'))
+    else:
+        # Toujours le primaire : une session écrite doit être relue à la requête suivante
+        store = DatabaseSessionStore(lambda: db.engine)
+    app.session_interface = ServerSessionInterface(store)
@@ -6,7 +6,7 @@
 =========================================================== */
 
 -- Drop all tables if they exist, for a clean install
-DROP TABLE IF EXISTS order_item, reservation, daily_menu_item, daily_menu, dish, cafeteria, app_user CASCADE;
+DROP TABLE IF EXISTS cache_version, idempotency_key, web_session, user_monthly_spending, order_item, reservation, daily_menu_item, daily_menu, dish, cafeteria, app_user CASCADE;
 
 -- 1. USERS (app_user)
 -- Matches app/models/app_user.py
@@ -18,7 +18,7 @@ CREATE TABLE app_user (
     password    VARCHAR(255) NOT NULL,
     balance     NUMERIC(10, 2) DEFAULT 0.00,
     role        VARCHAR(20) NOT NULL DEFAULT 'student'
-                  CHECK (role IN ('student', 'staff', 'admin')),
+                  CHECK (role IN ('student', 'staff', 'admin', 'kiosk')),
     created_at  TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at  TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -91,4 +91,66 @@ CREATE TABLE order_item (
     applied_price   NUMERIC(10,2) NOT NULL
 );
 
+-- INDEXES (same names as the __table_args__ of the models)
+-- User history, newest first, and keyset pagination of reservations
+CREATE INDEX ix_reservation_user_datetime ON reservation (user_id, reservation_datetime, reservation_id);
+-- Exports and reports over a period
+CREATE INDEX ix_reservation_datetime ON reservation (reservation_datetime);
+-- Items of a reservation (eager loading of order history)
+CREATE INDEX ix_order_item_reservation ON order_item (reservation_id);
+-- Items of a menu in display order
+CREATE INDEX ix_daily_menu_item_menu_order ON daily_menu_item (menu_id, display_order);
+-- Case-insensitive lookup of a dish by name (Dish.get_by_name)
+CREATE INDEX ix_dish_lower_name ON dish (lower(name));
+-- Alphabetical list of the admin users page
+CREATE INDEX ix_app_user_name ON app_user (last_name, first_name);
+-- Admin user search by last-name prefix, case-insensitive (app/models/user_search.py)
+CREATE INDEX ix_app_user_lower_name ON app_user (lower(last_name), lower(first_name));
+-- Admin user search (app/models/user_search.py): substring / fuzzy match on name and email
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX ix_app_user_search_trgm ON app_user USING gin ((lower(first_name || ' ' || last_name || ' ' || email)) gin_trgm_ops);
+
+-- 8. MONTHLY SPENDING ROLLUP (user_monthly_spending = orders and amount per user and month)
+-- Matches app/models/user_monthly_spending.py
+-- Maintained by the application; rebuilt with `flask cantina rebuild-rollups`
+CREATE TABLE user_monthly_spending (
+    user_id      INT NOT NULL REFERENCES app_user(user_id) ON DELETE CASCADE,
+    month        DATE NOT NULL,
+    order_count  INT NOT NULL DEFAULT 0,
+    total        NUMERIC(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, month)
+);
+
+-- 9. SERVER-SIDE SESSIONS (web_session = Flask session of a browser, by opaque id)
+-- Matches app/models/web_session.py, used when SESSION_BACKEND=postgres
+-- Expired rows are deleted by `flask cantina purge-sessions`
+CREATE TABLE web_session (
+    sid         VARCHAR(64) PRIMARY KEY,
+    data        TEXT NOT NULL,
+    expires_at  TIMESTAMP WITHOUT TIME ZONE NOT NULL
+);
+CREATE INDEX ix_web_session_expires_at ON web_session (expires_at);
+
+-- 10. IDEMPOTENCY KEYS (first response of a request retried with the same Idempotency-Key header)
+-- Matches app/models/idempotency_key.py; status_code NULL while the first request runs, 0 once it has committed
+-- Rows older than IDEMPOTENCY_TTL are deleted by `flask cantina purge-sessions`
+CREATE TABLE idempotency_key (
+    user_id       INT NOT NULL REFERENCES app_user(user_id) ON DELETE CASCADE,
+    key_hash      VARCHAR(64) NOT NULL,
+    request_hash  VARCHAR(64) NOT NULL,
+    status_code   SMALLINT,
+    headers       TEXT,
+    body          BYTEA,
+    created_at    TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, key_hash)
+);
+CREATE INDEX ix_idempotency_key_created_at ON idempotency_key (created_at);
+
+-- 11. CACHE VERSIONS (cache_version = version of a dataset cached in every worker)
+-- Matches app/models/cache_version.py; bumped after each write, read once per request
+CREATE TABLE cache_version (
+    name     VARCHAR(50) PRIMARY KEY,
+    version  INT NOT NULL DEFAULT 0
+);
+
 -- END OF SCRIPT
\ No newline at end of file
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: debit de solde concurrent sur un même compte.
+
+Compare l'ancien chemin (lecture du solde en Python, `balance -= total`, commit)
+au débit conditionnel `AppUser.debit_balance` (UPDATE ... WHERE balance >= :t RETURNING).
+Affiche le débit (opérations/s) et le nombre de mises à jour perdues.
+
+Usage (depuis la racine du dépôt) :
+    python tests/benchmarks/bench_balance_debit.py [--threads 8] [--ops 200] [--db-url sqlite:////tmp/bench.db]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.controller.controller import create_app
+from app.models import db, AppUser
+
+
+def naive_debit(user_id, amount):
+    user = db.session.get(AppUser, user_id)
+    if user.balance < amount:
+        db.session.rollback()
+        return False
+    user.balance -= amount
+    db.session.commit()
+    return True
+
+
+def atomic_debit(user_id, amount):
+    ok = AppUser.debit_balance(user_id, amount) is not None
+    db.session.commit()
+    return ok
+
+
+def run(app, debit, threads_count, ops_per_thread):
+    initial = Decimal(threads_count * ops_per_thread)
+    with app.app_context():
+        user = AppUser.get_by_email('bench@example.com') or AppUser.create_user('Bench', 'User', 'bench@example.com', 'x')
+        user.balance = initial
+        db.session.commit()
+        user_id = user.user_id
+
+    successes = []
+    failures = []
+
+    def worker():
+        with app.app_context():
+            for _ in range(ops_per_thread):
+                try:
+                    if debit(user_id, Decimal('1')):
+                        successes.append(1)
+                except Exception:
+                    db.session.rollback()
+                    failures.append(1)
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        final = db.session.get(AppUser, user_id).balance
+    lost = int(final - (initial - len(successes)))
+    return len(successes), len(failures), elapsed, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=200, help='debits per thread')
+    parser.add_argument('--db-url', default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_url, 'AUTO_BOOTSTRAP': True})
+
+    for name, debit in (('read-modify-write', naive_debit), ('conditional UPDATE', atomic_debit)):
+        ok, errors, elapsed, lost = run(app, debit, args.threads, args.ops)
+        print(f"{name:>20}: {ok / elapsed:8.0f} debits/s  ({ok} ok, {errors} errors, {lost} lost updates, {elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
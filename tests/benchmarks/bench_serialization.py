@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sérialisation JSON des listes de l'API (plats, réservations, éléments de commande).
+
+Compare l'ancien chemin (entités ORM, to_dict(), json du DefaultJSONProvider de Flask)
+au chemin par projection (colonnes seules, enregistrements slottés, app/serialization.py :
+orjson s'il est installé). Chaque liste est parcourue page par page (pagination par curseur),
+dans une session neuve à chaque passage ; affiche les lignes sérialisées par seconde.
+
+Usage (depuis la racine du dépôt) :
+    python tests/benchmarks/bench_serialization.py [--users 500] [--orders 50000] [--limit 1000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.controller.controller import create_app
+from app.data_generator import generate_dataset
+from app.models import db, AppUser, Dish, Reservation, OrderItem
+from app.pagination import keyset_page
+from app import serialization
+
+
+# --- Ancien chemin : entités ORM + to_dict() ---
+
+def orm_dishes(cursor, limit):
+    dishes, next_cursor = keyset_page(Dish.query, [Dish.dish_id], cursor, limit)
+    return [dish.to_dict() for dish in dishes], next_cursor
+
+
+def orm_order_items(cursor, limit):
+    items, next_cursor = keyset_page(OrderItem.query, [OrderItem.item_id], cursor, limit)
+    return [item.to_dict() for item in items], next_cursor
+
+
+def orm_reservations(user_id, cursor, limit):
+    reservations, next_cursor = keyset_page(
+        Reservation.query.filter_by(user_id=user_id).options(selectinload(Reservation.order_items)),
+        [Reservation.reservation_datetime, Reservation.reservation_id], cursor, limit, descending=True
+    )
+    page = []
+    for r in reservations:
+        data = r.to_dict()
+        data['order_items'] = [item.to_dict() for item in r.order_items]
+        page.append(data)
+    return page, next_cursor
+
+
+def walk(fetch_page, dumps, limit, **kwargs) -> int:
+    """Serialize every page of a list, as paginated_response would. Returns the number of rows."""
+    rows, cursor = 0, None
+    while True:
+        items, cursor = fetch_page(cursor=cursor, limit=limit, **kwargs)
+        dumps(items)
+        rows += len(items)
+        if not cursor:
+            return rows
+
+
+def measure(app, run, repeat) -> float:
+    best = 0.0
+    for _ in range(repeat):
+        with app.app_context():
+            start = time.perf_counter()
+            rows = run()
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+        best = max(best, rows / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=1000, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per path (the best one is kept)')
+    parser.add_argument('--db-url', default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app = create_app({'SQLALCHEMY_DATABASE_URI': db_url, 'AUTO_BOOTSTRAP': True})
+    with app.app_context():
+        if db.session.execute(select(OrderItem.item_id).limit(1)).first() is None:
+            generate_dataset(users=args.users, days=args.days, orders=args.orders, echo=lambda *_: None)
+        user_ids = db.session.execute(select(AppUser.user_id).order_by(AppUser.user_id).limit(50)).scalars().all()
+
+    old_dumps = DefaultJSONProvider(app).dumps
+    fast_dumps = serialization.dumps
+    encoder = 'orjson' if serialization.orjson is not None else 'json'
+    lists = (
+        ('Dish (x50)',
+         lambda: sum(walk(orm_dishes, old_dumps, args.limit) for _ in range(50)),
+         lambda: sum(walk(Dish.get_page_records, fast_dumps, args.limit) for _ in range(50))),
+        ('Reservation (50 users)',
+         lambda: sum(walk(orm_reservations, old_dumps, args.limit, user_id=u) for u in user_ids),
+         lambda: sum(walk(Reservation.get_user_page_records, fast_dumps, args.limit, user_id=u) for u in user_ids)),
+        ('OrderItem',
+         lambda: walk(orm_order_items, old_dumps, args.limit),
+         lambda: walk(OrderItem.get_page_records, fast_dumps, args.limit)),
+    )
+    print(f"pages of {args.limit} rows, encoder: {encoder}")
+    for name, before, after in lists:
+        old_rate, new_rate = measure(app, before, args.repeat), measure(app, after, args.repeat)
+        print(f"{name:>24}: {old_rate:10.0f} rows/s -> {new_rate:10.0f} rows/s  (x{new_rate / old_rate:.1f})")
+
+
+if __name__ == '__main__':
+    main()
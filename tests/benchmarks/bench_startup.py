@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: temps de démarrage d'un processus applicatif.
+
+Mesure, dans un processus Python neuf à chaque fois (comme un nouveau worker ou réplica) :
+- import de l'application + create_app,
+- temps jusqu'à la première réponse de /health.
+Compare le démarrage par défaut (sans bootstrap) à AUTO_BOOTSTRAP=1 (create_all + seeding à chaque démarrage),
+sur une base déjà initialisée par `flask cantina bootstrap`.
+
+Usage (depuis la racine du dépôt) :
+    python tests/benchmarks/bench_startup.py [--runs 5] [--db-url sqlite:////tmp/bench.db]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app.controller.controller import create_app
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'AUTO_BOOTSTRAP': sys.argv[2] == '1'})
+created = time.perf_counter()
+response = app.test_client().get('/health')
+assert response.status_code == 200, response.status_code
+print(json.dumps({'create_app': created - start, 'first_response': time.perf_counter() - start}))
+"""
+
+
+def measure(db_url, auto_bootstrap):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD, db_url, '1' if auto_bootstrap else '0'],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--db-url', default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app.controller.controller:create_app({"SQLALCHEMY_DATABASE_URI": "%s"})' % db_url,
+         'cantina', 'bootstrap'],
+        cwd=ROOT, check=True, capture_output=True
+    )
+
+    for label, auto_bootstrap in (('serving (default)', False), ('AUTO_BOOTSTRAP=1', True)):
+        runs = [measure(db_url, auto_bootstrap) for _ in range(args.runs)]
+        create = statistics.median(r['create_app'] for r in runs)
+        first = statistics.median(r['first_response'] for r in runs)
+        print(f"{label:>18}: create_app {create * 1000:7.1f} ms, first response {first * 1000:7.1f} ms (median of {args.runs})")
+
+
+if __name__ == '__main__':
+    main()
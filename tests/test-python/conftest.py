@@ -1,5 +1,11 @@
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
 from app.controller.controller import create_app
+from app.commands import bootstrap_database
 from app.models import db
 
 @pytest.fixture
@@ -12,11 +18,48 @@ def app():
     }
     app = create_app(test_config)
     with app.app_context():
-        db.create_all()
+        bootstrap_database()
         yield app
         db.session.remove()
-        db.drop_all()
+        db.drop_all(bind_key=None)
 
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+@pytest.fixture
+def file_app(tmp_path):
+    """Application backed by an SQLite file, for tests that need several concurrent connections."""
+    test_config = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'cantina.db'}",
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SECRET_KEY": "test-secret-key"
+    }
+    app = create_app(test_config)
+    with app.app_context():
+        bootstrap_database()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def count_sql():
+    """
+    Record the SQL statements executed (on any engine) inside a block:
+
+        with count_sql() as statements:
+            client.get("/orders")
+        assert len(statements) <= BUDGET
+    """
+    @contextmanager
+    def counter():
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(Engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, "before_cursor_execute", listener)
+    return counter
@@ -0,0 +1,133 @@
+# tests/test-python/controller/test_admin_menu.py
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+from werkzeug.datastructures import MultiDict
+
+from app.models import db, DailyMenu, DailyMenuItem, Dish
+
+MENU_DATE = date(2030, 1, 7)
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def menu_form(rows):
+    """Form of the dashboard editor: rows are (dish_id, name, price, dish_type, cafeteria_ids), descriptions unchanged."""
+    form = MultiDict({"menu_date": MENU_DATE.isoformat()})
+    for i, (dish_id, name, price, dish_type, cafeteria_ids) in enumerate(rows):
+        form.add(f"dishes[{i}][dish_id]", str(dish_id or ""))
+        form.add(f"dishes[{i}][name]", name)
+        form.add(f"dishes[{i}][description]", (Dish.get_by_id(dish_id).description or "") if dish_id else "")
+        form.add(f"dishes[{i}][dine_in_price]", price)
+        form.add(f"dishes[{i}][dish_type]", dish_type)
+        for cafeteria_id in cafeteria_ids:
+            form.add(f"dishes[{i}][cafeterias]", str(cafeteria_id))
+    return form
+
+
+def save(client, rows=None, form=None):
+    resp = client.post("/admin/menu", data=form or menu_form(rows), headers={"Accept": "application/json"})
+    assert resp.status_code == 200
+    return resp.get_json()["changes"]
+
+
+def menu_items():
+    return {
+        (m.cafeteria_id, i.dish_id): i.menu_item_id
+        for i, m in db.session.query(DailyMenuItem, DailyMenu).join(DailyMenu).filter(DailyMenu.menu_date == MENU_DATE)
+    }
+
+
+def test_save_menu_writes_only_the_difference(app, client):
+    login(client, "admin@example.com", "password")
+    chicken = Dish.get_by_id(5).name
+    rows = [
+        (5, chicken, "3.60", "main_course", [1, 2]),
+        (27, "Mineral Water", "0.70", "drink", [1]),
+        (None, "Pumpkin Pie", "2.10", "dessert", [2]),
+    ]
+    changes = save(client, rows)
+    assert changes == {"dishes_created": 1, "dishes_updated": 0, "menus_created": 2, "menus_deleted": 0,
+                       "items_added": 4, "items_updated": 0, "items_removed": 0}
+    before = menu_items()
+
+    # Un prix modifié, l'eau retirée : les autres lignes ne sont pas réécrites
+    pie_id = Dish.get_by_name("Pumpkin Pie").dish_id
+    rows = [(5, chicken, "3.90", "main_course", [1, 2]), (pie_id, "Pumpkin Pie", "2.10", "dessert", [2])]
+    changes = save(client, rows)
+    assert changes == {"dishes_created": 0, "dishes_updated": 1, "menus_created": 0, "menus_deleted": 0,
+                       "items_added": 0, "items_updated": 0, "items_removed": 1}
+    db.session.expire_all()
+    after = menu_items()
+    assert after == {key: item_id for key, item_id in before.items() if key != (1, 27)}
+    assert str(Dish.get_by_id(5).dine_in_price) == "3.90"
+
+    assert save(client, rows) == dict.fromkeys(changes, 0)
+
+
+def test_save_menu_drops_emptied_menus_and_reports_in_flash(app, client):
+    login(client, "admin@example.com", "password")
+    soup = Dish.get_by_id(1).name
+    save(client, [(1, soup, "0.00", "soup", [1, 3])])
+    resp = client.post("/admin/menu", data=menu_form([(1, soup, "0.00", "soup", [1])]),
+                       follow_redirects=True)
+    assert "1 menu(s) supprimé(s)" in resp.get_data(as_text=True)
+    assert DailyMenu.query.filter_by(menu_date=MENU_DATE).count() == 1
+
+
+def test_save_menu_statement_count(app, client, count_sql):
+    login(client, "admin@example.com", "password")
+    rows = [(dish_id, Dish.get_by_id(dish_id).name, "1.00", "main_course", range(1, 9)) for dish_id in range(1, 11)]
+    save(client, rows)
+    rows[0] = rows[0][:2] + ("1.50",) + rows[0][3:]
+    form = menu_form(rows)
+    with count_sql() as statements:
+        changes = save(client, form=form)
+    assert changes["dishes_updated"] == 1 and changes["items_added"] == 0
+    # utilisateur, plats, UPDATE du prix, menus, éléments, version partagée des menus, puis
+    # rechargement du plat pour l'index de préfixes (80 éléments sur 8 cafétérias : rien n'est réécrit)
+    assert len(statements) <= 7
+
+
+def test_schedule_api_repeats_a_week(app, client):
+    login(client, "admin@example.com", "password")
+    resp = client.post("/api/v1/daily-menu/schedule", json={
+        "source_date": "2025-06-30", "template_days": 7, "start_date": "2030-01-07", "end_date": "2030-01-20",
+        "cafeteria_ids": [1, 2], "weekdays": [0, 1, 2, 3, 4],
+    })
+    assert resp.status_code == 200
+    assert resp.get_json()["menus_created"] == 20
+    # Le lundi copie le lundi du modèle
+    copy = DailyMenu.query.filter_by(cafeteria_id=2, menu_date=date(2030, 1, 14)).one()
+    source = DailyMenu.query.filter_by(cafeteria_id=2, menu_date=date(2025, 6, 30)).one()
+    assert sorted(i.dish_id for i in copy.items) == sorted(i.dish_id for i in source.items)
+
+    resp = client.post("/api/v1/daily-menu/schedule", json={"source_date": "2025-06-30", "start_date": "2030-01-07"})
+    assert resp.status_code == 400 and "end_date" in resp.get_json()["error"]
+
+
+def test_schedule_form_reports_in_flash(app, client):
+    login(client, "admin@example.com", "password")
+    form = MultiDict({"source_date": "2025-06-30", "template_days": "1", "start_date": "2030-02-04",
+                      "end_date": "2030-02-05", "source_cafeteria_id": "1"})
+    form.add("cafeteria_ids", "4")
+    resp = client.post("/admin/menu/schedule", data=form, follow_redirects=True)
+    assert "2 menu(s) créé(s)" in resp.get_data(as_text=True)
+    assert DailyMenu.query.filter(DailyMenu.menu_date >= date(2030, 2, 4)).count() == 2
+
+
+def test_schedule_database_errors_are_rolled_back_and_reported(app, client, monkeypatch):
+    login(client, "admin@example.com", "password")
+
+    def failing_commit():
+        raise OperationalError("INSERT INTO daily_menu_item", {}, Exception("database is locked"))
+    monkeypatch.setattr(db.session, "commit", failing_commit)
+    resp = client.post("/api/v1/daily-menu/schedule", json={
+        "source_date": "2025-06-30", "start_date": "2030-03-04", "end_date": "2030-03-05",
+    })
+    assert resp.status_code == 500 and "database is locked" in resp.get_json()["details"]
+    form = {"source_date": "2025-06-30", "start_date": "2030-03-04", "end_date": "2030-03-05"}
+    assert "Erreur lors de la planification" in client.post("/admin/menu/schedule", data=form, follow_redirects=True).get_data(as_text=True)
+    assert DailyMenu.query.filter(DailyMenu.menu_date >= date(2030, 3, 4)).count() == 0
@@ -0,0 +1,48 @@
+# tests/test-python/controller/test_admin_users.py
+from sqlalchemy import text
+
+from app.models import db, CacheVersion
+from app.models.app_user import IDENTITY_VERSION
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_admin_users_search_renders_ranked_partial(app, client):
+    login(client, "admin@example.com", "password")
+    resp = client.get("/admin/users?q=kov", headers={"HX-Request": "true"})
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert "anna.kovacova@example.com" in html
+    assert "student1@example.com" not in html
+    assert "<html" not in html
+
+
+def test_admin_users_list_is_limited(app, client):
+    app.config["USER_SEARCH_LIMIT"] = 2
+    login(client, "admin@example.com", "password")
+    resp = client.get("/admin/users?role=student")
+    assert resp.status_code == 200
+    html = resp.get_data(as_text=True)
+    assert html.count('hx-delete="/api/v1/user/') == 2
+    assert "Showing the first 2 matches only" in html
+
+
+def test_demoted_or_deleted_users_lose_access_in_every_worker(file_app):
+    client = file_app.test_client()
+    login(client, "admin@example.com", "password")
+    assert client.get("/admin/users").status_code == 200
+
+    def other_worker(sql):
+        # Écriture d'un autre worker : seule la version partagée change, pas le cache de ce processus
+        with file_app.app_context():
+            db.session.execute(text(sql))
+            db.session.commit()
+            CacheVersion.bump(IDENTITY_VERSION)
+
+    other_worker("UPDATE app_user SET role = 'student' WHERE email = 'admin@example.com'")
+    assert client.get("/admin/users").status_code == 302
+    assert client.get("/api/v1/user/").status_code == 403
+    other_worker("DELETE FROM app_user WHERE email = 'admin@example.com'")
+    assert client.get("/balance").headers["Location"] == "/login"
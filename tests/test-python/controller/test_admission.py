@@ -0,0 +1,136 @@
+# tests/test-python/controller/test_admission.py
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from app.admission import SQLiteAdmissionStore
+from app.commands import bootstrap_database
+from app.controller.controller import create_app
+from app.models import db
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def admission_app(request, tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'cantina.db'}",
+        "SECRET_KEY": "test-secret-key",
+        "ADMISSION_BACKEND": request.param,
+        "ADMISSION_SQLITE_PATH": str(tmp_path / "admission.db"),
+        "ADMISSION_LIMITS": {"write_user": (0.5, 2), "login_account": (0.01, 2)},
+        "ADMISSION_CHECKOUT_SLOTS": 2,
+        "ADMISSION_ADMIN_SLOTS": 1,
+        "ADMISSION_QUEUE_TIMEOUT": 0.2,
+    })
+    with app.app_context():
+        bootstrap_database()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def login(client, email="student1@example.com", password="pass123"):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_writes_over_the_user_rate_are_refused_but_not_admin_ones(admission_app):
+    client = admission_app.test_client()
+    login(client)
+    top_up = lambda: client.post("/api/v1/user/balance", json={"amount": "1"})
+    assert [top_up().status_code for _ in range(2)] == [200, 200]
+    refused = top_up()
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
+    assert "error" in refused.get_json()
+    # Lectures jamais limitées
+    assert client.get("/api/v1/reservations/").status_code == 200
+
+    client.get("/logout")
+    login(client, "admin@example.com", "password")
+    assert all(top_up().status_code == 200 for _ in range(5))
+
+
+def test_login_attempts_are_limited_per_account(admission_app):
+    client = admission_app.test_client()
+    for _ in range(2):
+        assert login(client, password="wrong").status_code == 200
+    refused = login(client)
+    assert refused.status_code == 429 and "Retry-After" in refused.headers
+    # Un autre compte, derrière la même IP, se connecte toujours
+    assert login(client, "admin@example.com", "password").status_code == 302
+
+
+def test_checkouts_queue_then_shed_and_admins_keep_a_slot(admission_app):
+    store = admission_app.extensions["admission"].store
+    assert store.acquire("other-worker", 2)
+    client = admission_app.test_client()
+    login(client)
+    order = lambda: client.post("/api/v1/reservations/", json={"cafeteria_id": 1, "items": [{"dish_id": 27}]})
+
+    start = time.monotonic()
+    assert order().status_code == 429
+    assert time.monotonic() - start >= 0.2  # a attendu un créneau avant de refuser
+
+    admin = admission_app.test_client()
+    login(admin, "admin@example.com", "password")
+    assert admin.post("/api/v1/reservations/", json={"cafeteria_id": 1, "items": [{"dish_id": 27}]}).status_code != 429
+
+    store.release("other-worker")
+    assert order().status_code == 201
+    # Créneaux rendus à la fin des requêtes
+    assert store.acquire("a", 2) and store.acquire("b", 2)
+
+
+def test_sqlite_store_is_shared_and_reclaims_slots_of_dead_workers(tmp_path):
+    path = str(tmp_path / "admission.db")
+    worker_a, worker_b = SQLiteAdmissionStore(path), SQLiteAdmissionStore(path)
+    now = time.time()
+    assert worker_a.take("write_user:1", 1.0, 2, now) == 0
+    assert worker_b.take("write_user:1", 1.0, 2, now) == 0
+    assert worker_a.take("write_user:1", 1.0, 2, now) == pytest.approx(1.0)
+
+    # Un créneau pris par un processus mort est libéré quand la limite est atteinte
+    dead = multiprocessing.get_context("fork").Process(target=worker_a.acquire, args=("dead-worker", 1))
+    dead.start()
+    dead.join()
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT holder, pid FROM admission_slot").fetchall() == [("dead-worker", dead.pid)]
+    assert worker_b.acquire("live", 1)
+    assert not worker_a.acquire("queued", 1)
+
+
+def test_duplicate_orders_take_no_checkout_slot(admission_app):
+    client = admission_app.test_client()
+    login(client)
+    order = lambda: client.post("/api/v1/reservations/", json={"cafeteria_id": 1, "items": [{"dish_id": 27}]},
+                                headers={"Idempotency-Key": "lunch"})
+    first = order()
+    assert first.status_code == 201
+
+    # Créneaux des étudiants tous pris : la répétition est rejouée sans en attendre un
+    store = admission_app.extensions["admission"].store
+    assert store.acquire("other-worker", 1)
+    retry = order()
+    assert (retry.status_code, retry.headers.get("Idempotent-Replayed")) == (201, "true")
+    store.release("other-worker")
+
+
+def test_duplicate_waiting_for_the_first_order_gives_its_slot_back(admission_app):
+    admission = admission_app.extensions["admission"]
+    with admission_app.test_request_context("/api/v1/reservations/", method="POST"):
+        assert admission.acquire_slot(None, time.monotonic()) is None
+        assert not admission.store.acquire("other-worker", 1)  # créneau étudiant occupé
+        assert admission.yield_slot() and not admission.yield_slot()
+        assert admission.store.acquire("other-worker", 1)
+
+
+def test_refusals_of_htmx_requests_are_shown_on_the_page(admission_app):
+    client = admission_app.test_client()
+    login(client)
+    assert admission_app.extensions["admission"].store.acquire("other-worker", 1)
+    refused = client.post("/order", headers={"HX-Request": "true"})
+    assert refused.status_code == 429
+    assert (refused.headers["HX-Retarget"], refused.headers["HX-Reswap"]) == ("body", "beforeend")
+    assert "réessayez dans" in refused.get_data(as_text=True)
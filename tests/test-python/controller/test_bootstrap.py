@@ -0,0 +1,102 @@
+# tests/test-python/controller/test_bootstrap.py
+from datetime import date
+
+from sqlalchemy import inspect
+
+from app.controller.controller import create_app
+from app.models import db, AppUser, Cafeteria, DailyMenu, Reservation
+
+
+def make_app(tmp_path, **config):
+    return create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'cantina.db'}",
+        "SECRET_KEY": "test-secret-key",
+        **config,
+    })
+
+
+def test_create_app_does_not_touch_the_database_by_default(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+        db.engine.dispose()
+
+
+def test_bootstrap_command_creates_schema_and_seeds_once(tmp_path):
+    app = make_app(tmp_path)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["cantina", "bootstrap"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert AppUser.query.count() == 6
+        menus = DailyMenu.query.count()
+        assert menus > 0
+
+    # Idempotent : un second bootstrap ne réinsère rien
+    result = runner.invoke(args=["cantina", "bootstrap"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert AppUser.query.count() == 6
+        assert DailyMenu.query.count() == menus
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_bootstrap_without_seed_only_creates_the_schema(tmp_path):
+    app = make_app(tmp_path)
+    result = app.test_cli_runner().invoke(args=["cantina", "bootstrap", "--no-seed"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert "app_user" in inspect(db.engine).get_table_names()
+        assert AppUser.query.count() == 0
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_auto_bootstrap_flag_bootstraps_at_startup(tmp_path):
+    app = make_app(tmp_path, AUTO_BOOTSTRAP=True)
+    with app.app_context():
+        assert AppUser.query.count() == 6
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_generate_command_appends_a_consistent_dataset(tmp_path):
+    app = make_app(tmp_path)
+    runner = app.test_cli_runner()
+    runner.invoke(args=["cantina", "bootstrap"])
+
+    args = ["cantina", "generate", "--users", "40", "--days", "3", "--orders", "120",
+            "--start-date", "2026-01-05", "--batch-size", "50"]
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    # Une seconde génération s'ajoute à la première (identifiants et emails sans collision)
+    result = runner.invoke(args=args + ["--seed", "7"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert AppUser.query.count() == 6 + 80
+        assert Reservation.query.count() == 240
+        assert DailyMenu.query.filter(DailyMenu.menu_date >= date(2026, 1, 5)).count() == 3 * Cafeteria.query.count()
+        for reservation in Reservation.query.all():
+            assert 7 <= reservation.reservation_datetime.hour < 20
+            assert reservation.order_items
+            assert reservation.total == sum(i.applied_price * i.quantity for i in reservation.order_items)
+        # Les séquences/identifiants continuent après les données générées
+        AppUser.create_user("Après", "Génération", "after@example.com", "pass123")
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_generate_command_requires_a_bootstrapped_database(tmp_path):
+    app = make_app(tmp_path)
+    runner = app.test_cli_runner()
+    runner.invoke(args=["cantina", "bootstrap", "--no-seed"])
+    result = runner.invoke(args=["cantina", "generate", "--users", "1", "--days", "1", "--orders", "1"])
+    assert result.exit_code != 0
+    assert "cantina bootstrap" in result.output
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,51 @@
+# tests/test-python/controller/test_cafeteria_directory.py
+from app.models import db, Cafeteria, CacheVersion
+from app.models.cafeteria import DIRECTORY_VERSION
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def cafeteria_queries(statements):
+    return [s for s in statements if "FROM cafeteria" in s]
+
+
+def test_page_views_do_not_query_cafeterias(app, client, count_sql):
+    login(client, "student1@example.com", "pass123")
+    client.get("/dashboard/2")
+    with count_sql() as statements:
+        for url in ("/dashboard/2", "/balance", "/orders", "/orders?month=2025-07"):
+            resp = client.get(url)
+            assert resp.status_code == 200
+    assert cafeteria_queries(statements) == []
+    # La cafétéria courante (celle du dashboard) est reprise par les autres pages
+    assert Cafeteria.lookup(2).name in resp.get_data(as_text=True)
+    assert client.get("/dashboard/999").status_code == 404
+
+
+def test_cafeteria_api_writes_invalidate_the_directory(app, client):
+    login(client, "admin@example.com", "password")
+    count = len(Cafeteria.directory().cafeterias)
+
+    resp = client.post("/api/v1/cafeteria/", json={"name": "Menza Nová Budova"})
+    cafeteria_id = resp.get_json()["cafeteria_id"]
+    assert len(Cafeteria.directory().cafeterias) == count + 1
+
+    client.put(f"/api/v1/cafeteria/{cafeteria_id}", json={"name": "Menza Stará Budova"})
+    assert Cafeteria.lookup(cafeteria_id).name == "Menza Stará Budova"
+    assert "Menza Stará Budova" in client.get("/admin/cafeterias").get_data(as_text=True)
+
+    client.delete(f"/api/v1/cafeteria/{cafeteria_id}")
+    assert Cafeteria.lookup(cafeteria_id) is None
+
+
+def test_directory_follows_the_writes_of_other_workers(app):
+    count = len(Cafeteria.directory().cafeterias)
+    with app.app_context():
+        # Écriture d'un autre worker : la version partagée change, pas le cache de ce processus
+        db.session.add(Cafeteria(name="Menza Jinde"))
+        db.session.commit()
+        CacheVersion.bump(DIRECTORY_VERSION)
+    with app.app_context():
+        assert len(Cafeteria.directory().cafeterias) == count + 1
@@ -0,0 +1,62 @@
+# tests/test-python/controller/test_cart_fragment.py
+HX = {"HX-Request": "true"}
+
+
+def login(client):
+    return client.post("/login", data={"username": "student1@example.com", "password": "pass123"})
+
+
+def test_cart_actions_return_the_cart_fragment(app, client, count_sql):
+    login(client)
+    client.get("/dashboard/1")
+
+    with count_sql() as statements:
+        resp = client.post("/cart/action/add/5", headers=HX)
+    page = resp.get_data(as_text=True)
+    assert resp.status_code == 200
+    assert 'id="order-section"' in page and "Grilled Chicken Breast" in page
+    assert 'id="menu-action-5" hx-target="#order-section" hx-swap="outerHTML" hx-swap-oob="true"' in page
+    assert "Available Menu" not in page and "sidebar-nav-wrapper" not in page
+    # Le prix et le nom du plat, rien d'autre
+    assert len(statements) == 1
+
+    # Changer la quantité : le panneau seul, sans requête ni bouton hors bande
+    with count_sql() as statements:
+        page = client.post("/cart/action/update/5", data={"quantity": 3}, headers=HX).get_data(as_text=True)
+    assert statements == []
+    assert "hx-swap-oob" not in page and 'value="3"' in page
+
+    page = client.post("/cart/action/remove/5", headers=HX).get_data(as_text=True)
+    assert "Your order is empty." in page
+    assert 'id="menu-action-5"' in page and "action/add/5" in page
+
+
+def test_cart_actions_without_htmx_redirect_to_the_dashboard(app, client):
+    login(client)
+    client.get("/dashboard/1")
+    resp = client.post("/cart/action/add/5")
+    assert resp.status_code == 302 and resp.headers["Location"].endswith("/dashboard/1")
+
+
+def test_balance_changed_by_another_worker_is_shown_at_once(file_app):
+    from sqlalchemy import text
+    from app.controller.controller import create_app
+    from app.models import db
+
+    # Second worker sur la même base (créé d'abord : create_app remet les caches à zéro). Le cache
+    # d'identité est commun aux deux applications de ce processus : son écriture passe par SQL,
+    # comme le débit fait par un autre processus.
+    other_worker = create_app(dict(file_app.config))
+    client = file_app.test_client()
+    login(client)
+    page = client.get("/dashboard/1").get_data(as_text=True)
+    assert "Balance: $25.50" in page
+    client.post("/cart/action/add/5", headers=HX)
+
+    with other_worker.app_context():
+        db.session.execute(text("UPDATE app_user SET balance = 0 WHERE email = 'student1@example.com'"))
+        db.session.commit()
+
+    page = client.get("/dashboard/1").get_data(as_text=True)
+    assert "Balance: $0.00" in page
+    assert "Insufficient balance to place this order." in page
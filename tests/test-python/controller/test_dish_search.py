@@ -0,0 +1,34 @@
+# tests/test-python/controller/test_dish_search.py
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_dish_search_returns_suggestions(app, client):
+    login(client, "student1@example.com", "pass123")
+    resp = client.get("/api/v1/dish/search?prefix=soup&limit=5")
+    assert resp.status_code == 200
+    names = [d["name"] for d in resp.get_json()]
+    assert names and all("soup" in n.lower() for n in names)
+    assert set(resp.get_json()[0]) == {"dish_id", "name", "description", "dine_in_price", "dish_type"}
+
+    assert client.get("/api/v1/dish/search?prefix=soup&limit=0").status_code == 400
+
+
+def test_dish_changes_through_api_are_searchable(app, client):
+    login(client, "admin@example.com", "password")
+    assert client.get("/api/v1/dish/search?prefix=tiramisu").get_json() == []
+    created = client.post("/api/v1/dish/", json={"name": "Tiramisu", "dine_in_price": 2.9, "dish_type": "dessert"}).get_json()
+    assert [d["dish_id"] for d in client.get("/api/v1/dish/search?prefix=tira").get_json()] == [created["dish_id"]]
+
+    client.put(f"/api/v1/dish/{created['dish_id']}", json={"name": "Panna Cotta"})
+    assert client.get("/api/v1/dish/search?prefix=tira").get_json() == []
+    assert client.get("/api/v1/dish/search?prefix=panna").get_json()[0]["dish_id"] == created["dish_id"]
+
+
+def test_admin_dashboard_no_longer_embeds_catalog(app, client):
+    login(client, "admin@example.com", "password")
+    html = client.get("/admin/dashboard?date=2030-01-01").get_data(as_text=True)
+    assert "/api/v1/dish/search" in html
+    assert "Grilled Chicken" not in html  # aucun menu ce jour-là : aucun plat dans la page
@@ -0,0 +1,71 @@
+# tests/test-python/controller/test_export.py
+import csv
+import io
+import json
+from datetime import datetime
+
+from app.models import db, Reservation, OrderItem
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def add_reservation(cafeteria_id, when, dish_id=5, price=3.60):
+    reservation = Reservation.create_reservation(user_id=1, cafeteria_id=cafeteria_id, reservation_datetime=when, total=price)
+    db.session.flush()
+    OrderItem.create_order_item(reservation.reservation_id, dish_id, quantity=1, is_takeaway=False, applied_price=price)
+    return reservation
+
+
+def test_order_items_export_streams_ndjson_with_filters(app, client):
+    in_range = add_reservation(1, datetime(2025, 5, 10, 12, 5))
+    add_reservation(2, datetime(2025, 5, 11, 12, 0))   # autre cafétéria
+    add_reservation(1, datetime(2025, 6, 1, 0, 0))     # borne 'to' exclue
+    db.session.commit()
+
+    login(client, "admin@example.com", "password")
+    resp = client.get("/api/v1/order-item/export?from=2025-05-01&to=2025-06-01&cafeteria_id=1")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "application/x-ndjson"
+    assert 'filename="order-items-20250501-20250531.ndjson"' in resp.headers["Content-Disposition"]
+
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["reservation_id"] for r in rows] == [in_range.reservation_id]
+    assert rows[0]["applied_price"] == 3.6
+    assert rows[0]["reservation_datetime"] == "2025-05-10T12:05:00"
+
+
+def test_reservations_export_as_csv(app, client):
+    for day in range(1, 4):
+        add_reservation(3, datetime(2025, 4, day, 12, 0))
+    db.session.commit()
+
+    login(client, "admin@example.com", "password")
+    resp = client.get("/api/v1/reservations/export?format=csv&cafeteria_id=3")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert len(rows) == 3
+    assert rows[0]["total"] == "3.60"
+    assert rows[0]["cafeteria_id"] == "3"
+
+
+def test_users_export_has_no_passwords(client):
+    login(client, "admin@example.com", "password")
+    resp = client.get("/api/v1/user/export?format=csv")
+    body = resp.get_data(as_text=True)
+    header = body.splitlines()[0].split(",")
+    assert "password" not in header and "email" in header
+    assert len(body.splitlines()) == 1 + 6
+
+
+def test_export_rejects_bad_parameters_and_non_admins(client):
+    login(client, "admin@example.com", "password")
+    assert client.get("/api/v1/reservations/export?format=xml").status_code == 400
+    assert client.get("/api/v1/reservations/export?from=01/05/2025").status_code == 400
+    assert client.get("/api/v1/reservations/export?from=2025-06-01&to=2025-05-01").status_code == 400
+    client.get("/logout")
+    login(client, "student1@example.com", "pass123")
+    assert client.get("/api/v1/order-item/export").status_code == 403
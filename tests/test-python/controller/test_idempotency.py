@@ -0,0 +1,149 @@
+# tests/test-python/controller/test_idempotency.py
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import OperationalError
+
+from app.models import db, AppUser, IdempotencyKey, Reservation
+
+
+def login(client, email="student1@example.com", password="pass123"):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def entity_queries(statements):
+    return [s for s in statements if re.search(r"\b(dish|reservation|order_item|app_user)\b", s)]
+
+
+def test_retried_order_is_replayed_without_touching_the_order_tables(app, client, count_sql):
+    login(client)
+    user = AppUser.get_by_email("student1@example.com")
+    balance = user.balance
+    body = {"cafeteria_id": 1, "items": [{"dish_id": 5, "quantity": 2}]}
+    headers = {"Idempotency-Key": "order-1"}
+
+    first = client.post("/api/v1/reservations/", json=body, headers=headers)
+    assert first.status_code == 201
+    with count_sql() as statements:
+        retry = client.post("/api/v1/reservations/", json=body, headers=headers)
+    assert entity_queries(statements) == []
+    assert (retry.status_code, retry.get_json()) == (201, first.get_json())
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert Reservation.query.filter_by(user_id=user.user_id).count() == 1
+    assert AppUser.get_by_id(user.user_id).balance == balance - Decimal(str(first.get_json()["total"]))
+
+    # Même clé, autre requête : refusée ; autre clé : nouvelle commande
+    assert client.post("/api/v1/reservations/", json=dict(body, cafeteria_id=2), headers=headers).status_code == 422
+    assert client.post("/api/v1/reservations/", json=body, headers={"Idempotency-Key": "order-2"}).status_code == 201
+    assert Reservation.query.filter_by(user_id=user.user_id).count() == 2
+
+
+def test_keys_are_per_user_and_expire(app, client):
+    login(client)
+    headers = {"Idempotency-Key": "top-up"}
+    assert client.post("/api/v1/user/balance", json={"amount": "10"}, headers=headers).status_code == 200
+    client.get("/logout")
+    login(client, "admin@example.com", "password")
+    assert "Idempotent-Replayed" not in client.post("/api/v1/user/balance", json={"amount": "10"}, headers=headers).headers
+
+    app.config["IDEMPOTENCY_TTL"] = 0
+    assert "Idempotent-Replayed" not in client.post("/api/v1/user/balance", json={"amount": "10"}, headers=headers).headers
+    assert IdempotencyKey.purge(timedelta(0)) == 2
+    assert client.post("/api/v1/user/balance", json={"amount": "10"}, headers={"Idempotency-Key": ""}).status_code == 400
+
+
+def test_web_order_form_carries_a_key(app, client):
+    login(client)
+    client.get("/dashboard/1")
+    client.post("/cart/action/add/27")
+    page = client.get("/dashboard/1").get_data(as_text=True)
+    key = re.search(r'"Idempotency-Key": "([^"]+)"', page).group(1)
+
+    htmx = {"HX-Request": "true", "Idempotency-Key": key}
+    first = client.post("/order", headers=htmx)
+    retry = client.post("/order", headers=htmx)
+    assert first.headers["HX-Redirect"] == retry.headers["HX-Redirect"] == "/orders"
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert Reservation.query.filter_by(user_id=AppUser.get_by_email("student1@example.com").user_id).count() == 1
+
+
+def test_concurrent_duplicate_waits_for_the_original(file_app, monkeypatch):
+    client = file_app.test_client()
+    login(client)
+    original_credit = AppUser.credit_balance.__func__
+
+    def slow_credit(cls, user_id, amount):
+        time.sleep(0.5)
+        return original_credit(cls, user_id, amount)
+    monkeypatch.setattr(AppUser, "credit_balance", classmethod(slow_credit))
+
+    with file_app.app_context():
+        user = AppUser.get_by_email("student1@example.com")
+        user_id, balance = user.user_id, user.balance
+        db.session.remove()
+
+    responses = []
+    def top_up():
+        retry_client = file_app.test_client()
+        retry_client.set_cookie("session", client.get_cookie("session").value)
+        responses.append(retry_client.post("/api/v1/user/balance", json={"amount": "25"}, headers={"Idempotency-Key": "wifi"}))
+
+    threads = [threading.Thread(target=top_up) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert len({r.get_data() for r in responses}) == 1
+    assert sum("Idempotent-Replayed" in r.headers for r in responses) == 2
+    with file_app.app_context():
+        assert AppUser.get_by_id(user_id).balance == balance + Decimal("25")
+
+
+def test_executed_request_is_never_run_again(app, client, monkeypatch):
+    login(client)
+    user_id = AppUser.get_by_email("student1@example.com").user_id
+    balance = AppUser.get_by_id(user_id).balance
+    headers = {"Idempotency-Key": "lost-response"}
+
+    def crash(*args, **kwargs):  # worker tué entre le commit de la requête et celui de sa réponse
+        raise OperationalError("UPDATE idempotency_key", {}, Exception("database is locked"))
+    monkeypatch.setattr(IdempotencyKey, "complete", crash)
+    assert client.post("/api/v1/user/balance", json={"amount": "10"}, headers=headers).status_code == 200
+    monkeypatch.undo()
+
+    app.config["IDEMPOTENCY_LOCK_TIMEOUT"] = 0
+    retry = client.post("/api/v1/user/balance", json={"amount": "10"}, headers=headers)
+    assert retry.status_code == 409 and "Retry-After" not in retry.headers
+    assert AppUser.get_by_id(user_id).balance == balance + Decimal("10")
+
+
+def test_slow_request_cannot_commit_after_its_key_was_taken_over(file_app, monkeypatch):
+    client = file_app.test_client()
+    login(client)
+    with file_app.app_context():
+        user_id = AppUser.get_by_email("student1@example.com").user_id
+        balance = AppUser.get_by_id(user_id).balance
+    key_hash = hashlib.sha256(b"slow").hexdigest()
+    original_credit = AppUser.credit_balance.__func__
+
+    def credit_after_takeover(cls, user_id, amount):
+        # Plus de IDEMPOTENCY_LOCK_TIMEOUT sans commit : une répétition reprend la clé (autre worker)
+        with db.engine.begin() as connection:
+            connection.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id))
+            connection.execute(insert(IdempotencyKey).values(
+                user_id=user_id, key_hash=key_hash, request_hash="retry", created_at=datetime.utcnow()
+            ))
+        return original_credit(cls, user_id, amount)
+    monkeypatch.setattr(AppUser, "credit_balance", classmethod(credit_after_takeover))
+
+    assert client.post("/api/v1/user/balance", json={"amount": "10"}, headers={"Idempotency-Key": "slow"}).status_code == 400
+    with file_app.app_context():
+        assert AppUser.get_by_id(user_id).balance == balance
+        assert IdempotencyKey.lookup(user_id, key_hash).request_hash == "retry"
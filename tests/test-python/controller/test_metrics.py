@@ -0,0 +1,73 @@
+# tests/test-python/controller/test_metrics.py
+import json
+import os
+
+from app import metrics
+from app.models import db
+
+
+def test_metrics_endpoint_reports_latency_and_sql(client):
+    client.post("/login", data={"username": "student1@example.com", "password": "pass123"})
+    client.get("/api/v1/dish/")
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert "# TYPE cantina_http_request_duration_seconds histogram" in body
+    assert 'cantina_http_request_duration_seconds_count{endpoint="dish_bp.get_all_dishes",method="GET",status="200"}' in body
+    assert 'cantina_db_statements_per_request_count{endpoint="dish_bp.get_all_dishes"}' in body
+    assert 'cantina_db_statements_total{endpoint="dish_bp.get_all_dishes"}' in body
+    assert "cantina_db_pool_checkout_seconds_count" in body
+    assert "cantina_http_requests_in_flight 1" in body  # la requête /metrics elle-même
+
+
+def test_pool_checkouts_are_timed_after_dispose(file_app):
+    with file_app.app_context():
+        db.engine.dispose(close=False)  # comme post_fork dans chaque worker gunicorn
+    metrics.registry.reset()
+    client = file_app.test_client()
+    client.post("/login", data={"username": "student1@example.com", "password": "pass123"})
+    assert "cantina_db_pool_checkout_seconds_count" in client.get("/metrics").get_data(as_text=True)
+
+
+def test_metrics_are_merged_across_processes(app, tmp_path):
+    metrics.writer.directory = str(tmp_path)
+    try:
+        metrics.registry.inc("cantina_db_statements_total", (("endpoint", "x"),), 2)
+        other = {
+            "pid": os.getpid() + 100000,  # processus terminé : ses compteurs restent, pas ses jauges
+            "counters": [["cantina_db_statements_total", [["endpoint", "x"]], 3]],
+            "gauges": [["cantina_http_requests_in_flight", [], 4]],
+            "histograms": [],
+        }
+        (tmp_path / "metrics-other.json").write_text(json.dumps(other))
+        counters, gauges, _ = metrics.collect()
+        assert counters[("cantina_db_statements_total", (("endpoint", "x"),))] == 5
+        assert gauges.get(("cantina_http_requests_in_flight", ()), 0) == 0
+    finally:
+        metrics.writer.directory = None
+
+
+def test_exited_workers_are_folded_into_one_file(app, tmp_path):
+    metrics.registry.reset()
+    metrics.writer.directory = str(tmp_path)
+    try:
+        for pid, value in ((os.getpid() + 100000, 3), (os.getpid() + 100001, 4)):
+            snapshot = {
+                "pid": pid,
+                "counters": [["cantina_db_statements_total", [["endpoint", "x"]], value]],
+                "gauges": [["cantina_http_requests_in_flight", [], 1]],
+                "histograms": [["cantina_db_statements_per_request", [["endpoint", "x"]],
+                                {"buckets": [1, 2], "counts": [0, 1], "sum": 2.0, "count": 1}]],
+            }
+            (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(snapshot))
+        before = metrics.collect()
+        metrics.retire_process(str(tmp_path), os.getpid() + 100000)
+        assert metrics.collect() == before  # compté une seule fois, que son fichier existe encore ou non
+        metrics.retire_process(str(tmp_path), os.getpid() + 100001)
+
+        assert sorted(p.name for p in tmp_path.glob("metrics-*.json")) == [f"metrics-{os.getpid()}.json", "metrics-retired.json"]
+        counters, gauges, histograms = metrics.collect()
+        assert counters[("cantina_db_statements_total", (("endpoint", "x"),))] == 7
+        assert histograms[("cantina_db_statements_per_request", (("endpoint", "x"),))]["count"] == 2
+        assert gauges.get(("cantina_http_requests_in_flight", ()), 0) == 0
+    finally:
+        metrics.writer.directory = None
@@ -0,0 +1,79 @@
+# tests/test-python/controller/test_pagination.py
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.models import db, Dish, Reservation
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def walk(client, url):
+    """Follow the rel="next" links from `url`, return the pages."""
+    pages = []
+    while url:
+        resp = client.get(url)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        pages.append(resp.get_json())
+        link = resp.headers.get("Link")
+        url = re.match(r'<([^>]+)>; rel="next"', link).group(1) if link else None
+    return pages
+
+
+def test_dish_list_is_paginated_with_next_links(client):
+    login(client, "student1@example.com", "pass123")
+    pages = walk(client, "/api/v1/dish/?limit=7")
+
+    ids = [d["dish_id"] for page in pages for d in page]
+    assert all(len(page) <= 7 for page in pages)
+    assert ids == sorted(ids)
+    assert ids == [d.dish_id for d in Dish.query.order_by(Dish.dish_id)]
+
+
+def test_every_page_is_a_keyset_query(app, client):
+    login(client, "admin@example.com", "password")
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        if "FROM daily_menu" in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        pages = walk(client, "/api/v1/daily-menu/?limit=10")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert len(pages) > 3
+    # Page 1 : pas de filtre ; pages suivantes : même requête, filtrée sur la dernière clé
+    assert "WHERE" not in statements[0]
+    assert len(set(statements[1:])) == 1 and "daily_menu.menu_id >" in statements[1]
+
+
+def test_reservations_are_paginated_newest_first(app, client):
+    login(client, "student1@example.com", "pass123")
+    base = datetime(2025, 7, 1, 12, 0)
+    # Deux réservations à la même heure : l'identifiant départage
+    for minutes in (0, 10, 10, 20, 30):
+        Reservation.create_reservation(user_id=1, cafeteria_id=1, reservation_datetime=base + timedelta(minutes=minutes), total=1)
+    db.session.commit()
+
+    pages = walk(client, "/api/v1/reservations/?limit=2")
+    keys = [(r["reservation_datetime"], r["reservation_id"]) for page in pages for r in page]
+    expected = [(r.reservation_datetime.isoformat(), r.reservation_id) for r in
+                Reservation.query.filter_by(user_id=1).order_by(Reservation.reservation_datetime.desc(), Reservation.reservation_id.desc())]
+    assert [k[1] for k in keys] == [k[1] for k in expected]
+    assert len(pages) == 3
+    assert all("order_items" in r for page in pages for r in page)
+
+
+def test_invalid_pagination_parameters(client):
+    login(client, "admin@example.com", "password")
+    assert client.get("/api/v1/user/?cursor=garbage").status_code == 400
+    assert client.get("/api/v1/user/?limit=0").status_code == 400
+    assert client.get("/api/v1/user/?limit=abc").status_code == 400
+    resp = client.get("/api/v1/order-item/?limit=1000")
+    assert resp.status_code == 200 and "Link" not in resp.headers
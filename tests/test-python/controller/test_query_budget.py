@@ -0,0 +1,90 @@
+# tests/test-python/controller/test_query_budget.py
+"""Nombre de requêtes SQL par requête HTTP : il ne doit pas dépendre du volume de l'historique."""
+import re
+from datetime import datetime, timedelta
+
+from flask import g
+
+from app.models import db, AppUser, Reservation, OrderItem, UserMonthlySpending
+
+# versions des caches partagés (utilisateur et cafétérias en cache), page de réservations
+# avec leur cafétéria, items + plats, cumuls mensuels (user_monthly_spending)
+ORDERS_PAGE_BUDGET = 4
+# réservations de la page, items de la page
+RESERVATIONS_API_BUDGET = 2
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def add_orders(user_id, count, start=datetime(2025, 6, 2, 12, 0)):
+    for n in range(count):
+        reservation = Reservation.create_reservation(
+            user_id=user_id, cafeteria_id=1 + n % 3, reservation_datetime=start - timedelta(days=n), total=5.30, status='completed'
+        )
+        db.session.flush()
+        for dish_id in (1 + n % 4, 5 + n % 10, 27):
+            OrderItem.create_order_item(reservation.reservation_id, dish_id, quantity=1, is_takeaway=False, applied_price=1.0)
+    UserMonthlySpending.rebuild()
+    db.session.commit()
+
+
+def request_statements(count_sql, client, url, **kwargs):
+    client.get(url, **kwargs)  # caches (utilisateur, menus) déjà chauds, comme en production
+    # Le client de test partage le contexte d'application de la fixture : on repart
+    # d'une session vide, comme une vraie requête (sinon les relations sont déjà chargées).
+    db.session.remove()
+    g.pop('cache_versions', None)  # relues une fois par requête
+    with count_sql() as statements:
+        resp = client.get(url, **kwargs)
+    assert resp.status_code == 200
+    return statements
+
+
+def test_orders_page_query_count_does_not_grow_with_history(app, client, count_sql):
+    login(client, "student1@example.com", "pass123")
+    user_id = AppUser.get_by_email("student1@example.com").user_id
+
+    add_orders(user_id, 1)
+    small = request_statements(count_sql, client, "/orders")
+    add_orders(user_id, 60, start=datetime(2025, 5, 30, 12, 0))
+    large = request_statements(count_sql, client, "/orders")
+    month = request_statements(count_sql, client, "/orders?month=2025-05", headers={"HX-Request": "true"})
+
+    assert len(large) == len(small) <= ORDERS_PAGE_BUDGET
+    assert len(month) <= len(large)
+
+
+def test_all_periods_history_is_paginated(app, client):
+    app.config["ORDERS_PAGE_SIZE"] = 25
+    login(client, "student1@example.com", "pass123")
+    add_orders(AppUser.get_by_email("student1@example.com").user_id, 60)
+    htmx = {"HX-Request": "true"}
+
+    seen = []
+    url = "/orders"
+    while url:
+        html = client.get(url, headers=htmx).get_data(as_text=True)
+        seen += re.findall(r"Order #(\d+)", html)
+        cursor = re.search(r'href="/orders\?cursor=([^"]+)"', html)
+        url = cursor and f"/orders?cursor={cursor.group(1)}"
+    assert len(seen) == len(set(seen)) == 60
+    assert "Order #" in client.get("/orders?cursor=not-a-cursor", headers=htmx).get_data(as_text=True)
+
+
+def test_orders_page_renders_items_and_monthly_summary(app, client):
+    login(client, "student1@example.com", "pass123")
+    add_orders(AppUser.get_by_email("student1@example.com").user_id, 3)
+    html = client.get("/orders").get_data(as_text=True)
+    assert "Mineral Water" in html
+    assert "June 2025" in html and "May 2025" in html
+
+
+def test_reservations_api_query_count_does_not_grow_with_page_size(app, client, count_sql):
+    login(client, "student1@example.com", "pass123")
+    add_orders(AppUser.get_by_email("student1@example.com").user_id, 40)
+
+    small = request_statements(count_sql, client, "/api/v1/reservations/?limit=2")
+    large = request_statements(count_sql, client, "/api/v1/reservations/?limit=40")
+    assert len(large) == len(small) <= RESERVATIONS_API_BUDGET
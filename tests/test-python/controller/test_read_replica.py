@@ -0,0 +1,63 @@
+# tests/test-python/controller/test_read_replica.py
+import shutil
+import sqlite3
+
+import pytest
+
+from app.commands import bootstrap_database
+from app.controller.controller import create_app
+from app.models import db
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """Primaire et réplica : deux fichiers SQLite, le réplica étant une copie du primaire."""
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+        "SQLALCHEMY_BINDS": {"replica": f"sqlite:///{replica}"},
+        "SECRET_KEY": "test-secret-key",
+        "DB_REPLICA_STICKY_SECONDS": 60,
+    })
+    with app.app_context():
+        bootstrap_database()
+        db.session.remove()
+    shutil.copy(primary, replica)
+    # Le réplica « en retard » : le plat 1 n'y a pas encore été renommé
+    with sqlite3.connect(replica) as conn:
+        conn.execute("UPDATE dish SET name = 'Replica name' WHERE dish_id = 1")
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def dish_name(client):
+    return client.get("/api/v1/dish/1").get_json()["name"]
+
+
+def test_reads_go_to_replica_until_the_session_writes(replica_app):
+    client = replica_app.test_client()
+    client.post("/login", data={"username": "student1@example.com", "password": "pass123"})
+    assert dish_name(client) == "Replica name"
+
+    # Une écriture (recharge du solde) rend la session « collante » au primaire
+    client.post("/api/v1/user/balance", json={"amount": "1"})
+    assert dish_name(client) == "Vegetable Soup with Vermicelli"
+
+    # Une autre session continue de lire sur le réplica
+    other = replica_app.test_client()
+    other.post("/login", data={"username": "faculty1@example.com", "password": "pass123"})
+    assert dish_name(other) == "Replica name"
+
+
+def test_writes_always_go_to_primary(replica_app):
+    client = replica_app.test_client()
+    client.post("/login", data={"username": "admin@example.com", "password": "password"})
+    resp = client.put("/api/v1/dish/2", json={"name": "Renamed on primary"})
+    assert resp.status_code == 200
+    with sqlite3.connect(replica_app.config["SQLALCHEMY_BINDS"]["replica"].removeprefix("sqlite:///")) as conn:
+        assert conn.execute("SELECT name FROM dish WHERE dish_id = 2").fetchone()[0] == "Lentil Soup"
+    assert dish_name(client) == "Vegetable Soup with Vermicelli"  # lecture collante au primaire
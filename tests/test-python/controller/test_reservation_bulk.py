@@ -0,0 +1,74 @@
+# tests/test-python/controller/test_reservation_bulk.py
+import json
+
+from app.models.app_user import AppUser
+from app.models.reservation import Reservation
+from app.models import db
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_bulk_ingest_streams_one_result_per_line(app, client):
+    student = AppUser.get_by_email("student1@example.com")
+    poor = AppUser.get_by_email("john.smith@example.com")  # solde 0.00
+    before = Reservation.query.count()
+    balance_before = student.balance
+
+    body = "\n".join([
+        json.dumps({"user_id": student.user_id, "cafeteria_id": 1, "items": [{"dish_id": 5, "quantity": 2}],
+                    "reservation_datetime": "2025-06-30T11:52:00"}),
+        "not json",
+        json.dumps({"user_id": student.user_id, "cafeteria_id": 1, "items": [{"dish_id": 999999}]}),
+        "",
+        json.dumps({"user_id": poor.user_id, "cafeteria_id": 1, "items": [{"dish_id": 5}]}),
+        json.dumps({"user_id": student.user_id, "cafeteria_id": 2, "items": [{"dish_id": 27, "quantity": 1}]}),
+    ])
+
+    login(client, "admin@example.com", "password")
+    resp = client.post("/api/v1/reservations/bulk?batch_size=2", data=body,
+                       content_type="application/x-ndjson")
+    assert resp.status_code == 200
+    results = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+    by_line = {r["line"]: r for r in results if "line" in r}
+    assert by_line[1]["status"] == "created"
+    assert by_line[2]["error"] == "Invalid JSON."
+    assert "not found" in by_line[3]["error"]
+    assert by_line[5]["error"] == "Insufficient balance."
+    assert by_line[6]["status"] == "created"
+    assert results[-1] == {"summary": {"created": 2, "failed": 3}}
+
+    db.session.expire_all()
+    assert Reservation.query.count() == before + 2
+    created = Reservation.get_by_id(by_line[1]["reservation_id"])
+    assert created.reservation_datetime.isoformat() == "2025-06-30T11:52:00"
+    assert len(created.order_items) == 1
+    assert float(AppUser.get_by_id(student.user_id).balance) == float(balance_before) - 7.2 - 0.7
+
+
+def test_bulk_ingest_refuses_only_the_record_with_an_unknown_cafeteria(app, client):
+    student = AppUser.get_by_email("student1@example.com")
+    before = Reservation.query.count()
+    order = lambda cafeteria_id: json.dumps(
+        {"user_id": student.user_id, "cafeteria_id": cafeteria_id, "items": [{"dish_id": 5}]})
+    body = "\n".join([order(1), order(999999), order("1"), order(2)])
+
+    login(client, "admin@example.com", "password")
+    resp = client.post("/api/v1/reservations/bulk", data=body, content_type="application/x-ndjson")
+    results = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+    by_line = {r["line"]: r for r in results if "line" in r}
+    assert by_line[1]["status"] == "created" and by_line[4]["status"] == "created"
+    assert by_line[2]["error"] == "Cafeteria with ID 999999 not found."
+    assert by_line[3]["error"] == "Cafeteria with ID 1 not found."
+    assert results[-1] == {"summary": {"created": 2, "failed": 2}}
+    db.session.expire_all()
+    assert Reservation.query.count() == before + 2
+
+
+def test_bulk_ingest_is_forbidden_to_students(client):
+    login(client, "student1@example.com", "pass123")
+    resp = client.post("/api/v1/reservations/bulk", data="", content_type="application/x-ndjson")
+    assert resp.status_code == 403
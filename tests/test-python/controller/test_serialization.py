@@ -0,0 +1,36 @@
+# tests/test-python/controller/test_serialization.py
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from app import serialization
+from app.models import db, Dish, Reservation, OrderItem, AppUser
+
+
+def login(client, email, password):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def test_projected_lists_match_to_dict(app, client):
+    login(client, "admin@example.com", "password")
+    assert client.get("/api/v1/dish/?limit=1000").get_json() == [d.to_dict() for d in Dish.query.order_by(Dish.dish_id)]
+    assert client.get("/api/v1/user/?limit=1000").get_json() == [u.to_dict() for u in AppUser.query.order_by(AppUser.user_id)]
+
+    client.get("/logout")
+    login(client, "student1@example.com", "pass123")
+    user = AppUser.get_by_email("student1@example.com")
+    Reservation.place_order(user_id=user.user_id, cafeteria_id=1, items=[{"dish_id": 5, "quantity": 2}, {"dish_id": 27}])
+    db.session.commit()
+    reservation = Reservation.query.filter_by(user_id=user.user_id).one()
+    expected = dict(reservation.to_dict(), order_items=[i.to_dict() for i in sorted(reservation.order_items, key=lambda i: i.item_id)])
+    assert client.get("/api/v1/reservations/").get_json() == [expected]
+
+
+def test_records_use_the_same_conversions_with_either_encoder():
+    record = serialization.record_type("Sample", "price created_at day items")(
+        Decimal("3.60"), datetime(2025, 7, 1, 12, 30), date(2025, 7, 1), [OrderItem.__name__]
+    )
+    assert not hasattr(record, "__dict__")
+    expected = {"price": 3.6, "created_at": "2025-07-01T12:30:00", "day": "2025-07-01", "items": ["OrderItem"]}
+    assert json.loads(serialization.dumps([record])) == [expected]
+    assert json.loads(json.dumps(record, default=serialization._default)) == expected
@@ -0,0 +1,109 @@
+# tests/test-python/controller/test_server_session.py
+from datetime import datetime, timedelta
+
+import pytest
+from flask import request
+
+from app.commands import bootstrap_database
+from app.controller.controller import create_app
+from app.models import db
+from app.session_store import ServerSessionInterface, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite", "postgres"])
+def session_app(request, tmp_path):
+    """Application avec sessions côté serveur ; 'postgres' utilise ici la table web_session d'un fichier SQLite."""
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'cantina.db'}",
+        "SECRET_KEY": "test-secret-key",
+        "SESSION_BACKEND": request.param,
+        "SESSION_SQLITE_PATH": str(tmp_path / "sessions.db"),
+    })
+    with app.app_context():
+        bootstrap_database()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def login(client, email="student1@example.com", password="pass123"):
+    return client.post("/login", data={"username": email, "password": password})
+
+
+def session_cookie(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_cookie_carries_an_opaque_id_and_the_cart_renders_without_dish_query(session_app, count_sql):
+    client = session_app.test_client()
+    login(client)
+    sid = session_cookie(client)
+    assert isinstance(session_app.session_interface, ServerSessionInterface)
+    assert sid and "." not in sid and session_app.session_interface.store.load(sid) is not None
+
+    client.post("/cart/action/add/5")
+    client.get("/dashboard/1")
+    with count_sql() as statements:
+        page = client.get("/dashboard/1").get_data(as_text=True)
+    assert "Grilled Chicken Breast" in page
+    assert not [s for s in statements if "FROM dish" in s]
+
+
+def test_unchanged_session_sends_no_cookie(session_app):
+    client = session_app.test_client()
+    login(client)
+    resp = client.get("/orders")
+    assert resp.status_code == 200
+    assert "Set-Cookie" not in resp.headers
+
+
+def test_login_regenerates_the_id_and_logout_deletes_the_session(session_app):
+    client = session_app.test_client()
+    client.get("/dashboard")  # message flash : une session anonyme est créée
+    anonymous_sid = session_cookie(client)
+    assert anonymous_sid
+    login(client)
+    sid = session_cookie(client)
+    store = session_app.session_interface.store
+    assert sid != anonymous_sid and store.load(anonymous_sid) is None
+
+    client.get("/logout")
+    assert store.load(sid) is None
+    assert session_cookie(client) is None
+
+
+def test_sqlite_store_ignores_and_purges_expired_sessions(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    store.save("old", "{}", datetime.utcnow() - timedelta(seconds=1))
+    store.save("new", '{"user_id": 1}', datetime.utcnow() + timedelta(hours=1))
+    assert store.load("old") is None
+    assert store.load("new") == '{"user_id": 1}'
+    assert store.purge() == 1
+
+
+def test_repeated_page_views_do_not_write_the_session(session_app, monkeypatch):
+    client = session_app.test_client()
+    login(client)
+    interface = session_app.session_interface
+    client.get("/dashboard/1")  # première visite : la cafétéria courante change, la session est écrite
+
+    saves = []
+    original_save = interface.store.save
+    monkeypatch.setattr(interface.store, "save", lambda *args: saves.append(args) or original_save(*args))
+    for _ in range(3):
+        resp = client.get("/dashboard/1")
+        assert resp.status_code == 200 and "Set-Cookie" not in resp.headers
+    assert saves == []
+
+    # Clé réaffectée à la même valeur : session marquée modifiée, mais rien n'est réécrit
+    with session_app.test_request_context("/", headers={"Cookie": f"session={session_cookie(client)}"}):
+        session = interface.open_session(session_app, request)
+        session["current_cafeteria_id"] = session["current_cafeteria_id"]
+        response = session_app.response_class()
+        interface.save_session(session_app, session, response)
+    assert saves == [] and "Set-Cookie" not in response.headers
+    client.get("/dashboard/2")
+    assert len(saves) == 1
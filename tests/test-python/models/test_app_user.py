@@ -95,4 +95,107 @@ def test_app_user_get_all_dicts(app):
         db.session.commit()
         users = AppUser.get_all_dicts()
         assert len(users) == 2
-        assert users[0]['email'] == 'a@a.com'
\ No newline at end of file
+        assert users[0]['email'] == 'a@a.com'
+
+def test_get_by_id_cached_serves_from_identity_cache(app):
+    """Un second accès (nouvelle session) n'émet aucune requête SQL, sauf pour lire le solde."""
+    from sqlalchemy import event
+    with app.app_context():
+        user = AppUser.create_user("Cache", "User", "cache@test.com", "p", balance=5)
+        db.session.commit()
+        user_id = user.user_id
+        AppUser.get_by_id_cached(user_id)
+        db.session.remove()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            cached = AppUser.get_by_id_cached(user_id)
+            assert cached.email == "cache@test.com"
+            assert statements == []
+            db.session.execute(db.text("UPDATE app_user SET balance = 7 WHERE user_id = :id"), {"id": user_id})
+            statements.clear()
+            assert float(cached.balance) == 7  # jamais en cache : lu en base au premier accès
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert len(statements) == 1
+
+def test_update_and_delete_invalidate_identity_cache(app):
+    with app.app_context():
+        user = AppUser.create_user("Cache", "Inv", "cache-inv@test.com", "p")
+        db.session.commit()
+        user_id = user.user_id
+        AppUser.get_by_id_cached(user_id)
+        assert AppUser.identity_cache.get(user_id) is not None
+
+        user.update_user(first_name="Changed")
+        assert AppUser.identity_cache.get(user_id) is None
+        assert AppUser.get_by_id_cached(user_id).first_name == "Changed"
+
+        user.delete_user()
+        assert AppUser.identity_cache.get(user_id) is None
+        assert AppUser.get_by_id_cached(user_id) is None
+
+def test_identity_cache_versions_stay_bounded():
+    """Les versions par clé ne grossissent pas sans fin, sans perdre la garantie des reconstructions."""
+    from app.cache import VersionedCache
+    cache = VersionedCache(maxsize=2, ttl=60)
+    cache.get_or_build("kept", lambda: "value")
+    in_flight = cache.version("late")
+
+    for user_id in range(10):
+        cache.invalidate(user_id)
+    assert len(cache._versions) <= cache.maxsize
+    # L'entrée encore valide reste servie, une reconstruction commencée avant n'est pas stockée
+    assert cache.get_or_build("kept", lambda: "rebuilt") == "value"
+    assert cache.version("late") != in_flight
+
+def test_debit_balance_refuses_overdraft(app):
+    with app.app_context():
+        user = AppUser.create_user("Debit", "User", "debit@test.com", "p", balance=10)
+        db.session.commit()
+        assert AppUser.debit_balance(user.user_id, 4) == 6
+        assert AppUser.debit_balance(user.user_id, 7) is None
+        assert AppUser.credit_balance(user.user_id, 1.5) == 7.5
+        db.session.commit()
+        assert float(user.balance) == 7.5
+
+def test_concurrent_debits_and_credits_lose_no_update(file_app):
+    """Plusieurs threads débitent/créditent le même compte : aucune mise à jour ne doit être perdue."""
+    import threading
+    with file_app.app_context():
+        user = AppUser.create_user("Stress", "User", "stress@test.com", "p", balance=50)
+        db.session.commit()
+        user_id = user.user_id
+
+    threads_count, ops_per_thread = 8, 25
+    successes = []
+    errors = []
+
+    def worker(index):
+        with file_app.app_context():
+            for _ in range(ops_per_thread):
+                try:
+                    if index % 2:
+                        ok = AppUser.credit_balance(user_id, 1) is not None
+                    else:
+                        ok = AppUser.debit_balance(user_id, 1) is not None
+                    db.session.commit()
+                    if ok:
+                        successes.append(1 if index % 2 else -1)
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads_count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    with file_app.app_context():
+        final = AppUser.get_by_id(user_id).balance
+        assert final >= 0
+        assert float(final) == 50 + sum(successes)
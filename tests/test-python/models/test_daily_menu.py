@@ -1,5 +1,6 @@
 # tests/test-python/models/test_daily_menu.py
 
+import pytest
 from app.models.daily_menu import DailyMenu
 from app.models.cafeteria import Cafeteria
 from app.models import db
@@ -70,4 +71,105 @@ def test_get_all_menus_as_dicts(app):
         DailyMenu.create_menu(caf.cafeteria_id, date(2030,1,2))
         db.session.commit()
         menus = DailyMenu.get_all_dicts()
-        assert len(menus) == 2
\ No newline at end of file
+        assert len(menus) == 2
+
+def test_menu_snapshot_is_cached_until_invalidated(app):
+    from app.models.dish import Dish
+    from app.models.daily_menu_item import DailyMenuItem
+    with app.app_context():
+        caf = Cafeteria.create_cafeteria("Snap")
+        dish = Dish.create_dish("Snap Soup", "", 1.5, "soup")
+        db.session.commit()
+        menu = DailyMenu.create_menu(caf.cafeteria_id, date(2031, 1, 1))
+        db.session.commit()
+        DailyMenuItem.create_menu_item(menu.menu_id, dish.dish_id, "soup")
+        db.session.commit()
+
+        snapshot = DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 1, 1))
+        assert snapshot.menu_id == menu.menu_id
+        assert [e.dish.name for e in snapshot.entries] == ["Snap Soup"]
+        assert snapshot.api[0]["price"] == 1.5
+        assert DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 1, 1)) is snapshot
+
+        DailyMenuItem.create_menu_item(menu.menu_id, dish.dish_id, "soup", 2)
+        db.session.commit()
+        # Pas d'invalidation : la version en cache est toujours servie
+        assert len(DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 1, 1)).entries) == 1
+        DailyMenu.invalidate_menu_cache(caf.cafeteria_id, date(2031, 1, 1))
+        assert len(DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 1, 1)).entries) == 2
+
+def test_menu_snapshot_not_stored_if_invalidated_while_building(app):
+    with app.app_context():
+        caf = Cafeteria.create_cafeteria("Race")
+        db.session.commit()
+        key = (caf.cafeteria_id, date(2031, 2, 1))
+
+        def build():
+            # Une écriture concurrente invalide la clé pendant la reconstruction
+            DailyMenu.invalidate_menu_cache(*key)
+            return "stale"
+
+        assert DailyMenu.menu_cache.get_or_build(key, build) == "stale"
+        assert DailyMenu.get_menu_snapshot(*key).menu_id is None
+
+def test_menu_cache_follows_the_invalidations_of_other_workers(app):
+    from app.models.dish import Dish
+    from app.models.daily_menu_item import DailyMenuItem
+    from app.models.cache_version import CacheVersion
+    from app.models.daily_menu import MENU_VERSION
+    with app.app_context():
+        caf = Cafeteria.create_cafeteria("Shared")
+        dish = Dish.create_dish("Shared Soup", "", 1.5, "soup")
+        db.session.commit()
+        menu = DailyMenu.create_menu(caf.cafeteria_id, date(2031, 3, 1))
+        db.session.commit()
+        menu_id, dish_id = menu.menu_id, dish.dish_id
+        assert DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 3, 1)).entries == ()
+    with app.app_context():
+        # Un autre worker ajoute un plat : il ne touche que la version partagée, pas le cache de ce processus
+        DailyMenuItem.create_menu_item(menu_id, dish_id, "soup")
+        db.session.commit()
+        CacheVersion.bump(MENU_VERSION)
+    with app.app_context():
+        assert len(DailyMenu.get_menu_snapshot(caf.cafeteria_id, date(2031, 3, 1)).entries) == 1
+
+def test_schedule_dates_maps_a_week_template_weekday_to_weekday():
+    monday = date(2025, 6, 30)
+    pairs = DailyMenu.schedule_dates(monday, date(2025, 7, 1), date(2025, 7, 15), period=7, weekdays={0, 1, 2, 3, 4})
+    # Les jours du modèle ne sont jamais des cibles, ni les week-ends
+    assert pairs[0] == (date(2025, 7, 7), monday)
+    assert all(target.weekday() == source.weekday() for target, source in pairs)
+    assert len(pairs) == 7
+
+def test_schedule_copies_template_menus_once(app):
+    with app.app_context():
+        source_day = date(2025, 6, 30)
+        items_per_menu = {m.cafeteria_id: len(m.items) for m in DailyMenu.query.filter_by(menu_date=source_day)}
+        changes = DailyMenu.schedule(source_day, date(2030, 3, 4), date(2030, 3, 8))
+        assert changes == {'menus_created': 5 * len(items_per_menu), 'items_deleted': 0,
+                           'items_copied': 5 * sum(items_per_menu.values())}
+        copy = DailyMenu.query.filter_by(cafeteria_id=1, menu_date=date(2030, 3, 6)).one()
+        assert len(copy.items) == items_per_menu[1]
+
+        # Relancer ne duplique rien ; replace remplace les éléments existants
+        assert DailyMenu.schedule(source_day, date(2030, 3, 4), date(2030, 3, 8)) == \
+            {'menus_created': 0, 'items_deleted': 0, 'items_copied': 0}
+        replaced = DailyMenu.schedule(source_day, date(2030, 3, 4), date(2030, 3, 8), cafeteria_ids=[1], replace=True)
+        assert replaced == {'menus_created': 0, 'items_deleted': 5 * items_per_menu[1], 'items_copied': 5 * items_per_menu[1]}
+
+def test_schedule_from_one_cafeteria_to_others(app):
+    with app.app_context():
+        source_day = date(2025, 6, 30)
+        source = DailyMenu.query.filter_by(cafeteria_id=1, menu_date=source_day).one()
+        dishes = sorted(item.dish_id for item in source.items)
+        changes = DailyMenu.schedule(source_day, date(2030, 3, 4), date(2030, 3, 10), cafeteria_ids=[2, 3],
+                                     source_cafeteria_id=1, weekdays={0, 2})
+        assert changes['menus_created'] == 4
+        copy = DailyMenu.query.filter_by(cafeteria_id=3, menu_date=date(2030, 3, 6)).one()
+        assert sorted(item.dish_id for item in copy.items) == dishes
+        assert DailyMenu.query.filter_by(menu_date=date(2030, 3, 5)).count() == 0
+
+def test_schedule_rejects_too_long_ranges(app):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            DailyMenu.schedule(date(2025, 6, 30), date(2030, 1, 1), date(2031, 6, 1))
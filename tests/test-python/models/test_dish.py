@@ -75,4 +75,33 @@ def test_dish_delete_fails_if_in_use_by_order_item(app):
         # Tenter de supprimer le plat
         ok = dish.delete_dish()
         assert ok is False
-        assert Dish.get_by_id(dish.dish_id) is not None # Le plat doit toujours exister
\ No newline at end of file
+        assert Dish.get_by_id(dish.dish_id) is not None # Le plat doit toujours exister
+
+def test_search_prefix_matches_name_then_words(app):
+    with app.app_context():
+        Dish.create_dish("Crème Brûlée", "", 2.0, "dessert")
+        Dish.create_dish("Crêpe Suzette", "", 2.5, "dessert")
+        Dish.create_dish("Chocolate Crepe", "", 2.5, "dessert")
+        db.session.commit()
+        # Début du nom d'abord, puis début d'un mot ; casse et accents ignorés
+        names = [d["name"] for d in Dish.search_prefix("CRÊP")]
+        assert names == ["Crêpe Suzette", "Chocolate Crepe"]
+        assert [d["name"] for d in Dish.search_prefix("brul")] == ["Crème Brûlée"]
+        assert len(Dish.search_prefix("", limit=5)) == 5
+
+def test_prefix_index_is_updated_in_place(app):
+    with app.app_context():
+        assert Dish.search_prefix("zzz") == []
+        dish = Dish.create_dish("Zzz Salad", "", 3.0, "side_dish")
+        db.session.commit()
+        Dish.reindex(dish)
+        assert [d["dish_id"] for d in Dish.search_prefix("zzz")] == [dish.dish_id]
+
+        dish.name = "Green Salad"
+        db.session.commit()
+        Dish.reindex(dish)
+        assert Dish.search_prefix("zzz") == []
+        assert Dish.search_prefix("green")[0]["name"] == "Green Salad"
+
+        assert dish.delete_dish() is True
+        assert Dish.search_prefix("green") == []
@@ -0,0 +1,97 @@
+# tests/test-python/models/test_query_plans.py
+"""
+Les requêtes chaudes doivent être servies par un index, jamais par un parcours séquentiel
+d'une grande table. Vérifié avec EXPLAIN sur un jeu de données généré (flask cantina generate).
+"""
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select, tuple_
+
+from app.data_generator import generate_dataset
+from app.models import db, AppUser, Dish, DailyMenu, DailyMenuItem, Reservation, OrderItem
+
+BIG_TABLES = ("reservation", "order_item", "daily_menu_item", "dish")
+
+
+@pytest.fixture
+def large_app(file_app):
+    with file_app.app_context():
+        generate_dataset(users=300, days=90, orders=6000, start_date=datetime(2025, 1, 1).date(), echo=lambda *a: None)
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+        yield file_app
+        db.session.remove()
+
+
+def plans_of(run):
+    """Execute `run()` and return the EXPLAIN output of every SQL statement it issued."""
+    statements = []
+    listener = lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters))
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert statements
+    plans = []
+    with db.engine.connect() as conn:
+        explain = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(explain + statement, parameters).all()
+            plans.append((statement, "\n".join(str(row[-1]) for row in rows)))
+    return plans
+
+
+def assert_no_sequential_scan(run):
+    for statement, plan in plans_of(run):
+        for table in BIG_TABLES:
+            # SQLite : « SCAN table » sans index ; PostgreSQL : « Seq Scan on table »
+            sqlite_scan = re.search(rf"^SCAN {table}\b(?! USING (COVERING )?INDEX)", plan, re.M)
+            pg_scan = re.search(rf"Seq Scan on {table}\b", plan)
+            assert not (sqlite_scan or pg_scan), f"Parcours séquentiel de {table} :\n{statement}\n{plan}"
+
+
+def test_history_queries_use_indexes(large_app):
+    assert_no_sequential_scan(lambda: Reservation.get_history(42))
+    assert_no_sequential_scan(lambda: Reservation.get_history(42, 2025, 2))
+    assert_no_sequential_scan(lambda: Reservation.get_user_page_records(42, limit=5))
+
+
+def test_reservation_keyset_page_uses_index(large_app):
+    last = Reservation.history_query(42).first()
+    assert_no_sequential_scan(lambda: Reservation.query.filter_by(user_id=42).filter(
+        tuple_(Reservation.reservation_datetime, Reservation.reservation_id) < (last.reservation_datetime, last.reservation_id)
+    ).order_by(Reservation.reservation_datetime.desc(), Reservation.reservation_id.desc()).limit(10).all())
+
+
+def test_order_items_and_menu_items_use_indexes(large_app):
+    ids = [r.reservation_id for r in Reservation.history_query(7).limit(20)]
+    assert_no_sequential_scan(lambda: db.session.execute(select(OrderItem).where(OrderItem.reservation_id.in_(ids))).all())
+    menu = DailyMenu.query.order_by(DailyMenu.menu_id.desc()).first()
+    assert_no_sequential_scan(lambda: DailyMenuItem.get_by_menu(menu.menu_id))
+
+
+def test_dish_lookup_by_name_uses_index(large_app):
+    assert_no_sequential_scan(lambda: Dish.get_by_name("lentil SOUP"))
+    assert Dish.get_by_name("lentil SOUP").name == "Lentil Soup"
+
+
+def test_month_filter_is_a_range(large_app):
+    february = Reservation.get_history(42, 2025, 2)
+    assert all(r.reservation_datetime.month == 2 for r in february)
+    december = Reservation.history_query(42, 2024, 12).statement.compile()
+    assert "EXTRACT" not in str(december).upper() and "strftime" not in str(december)
+
+
+def test_generated_orders_reference_existing_users_only(file_app):
+    with file_app.app_context():
+        # Compte créé à la main avec un id élevé : les ids ne sont plus contigus
+        db.session.add(AppUser(user_id=5000, last_name="Gap", first_name="User", email="gap@ex.com", password="x"))
+        db.session.commit()
+        generate_dataset(users=20, days=7, orders=500, start_date=datetime(2025, 1, 1).date(), echo=lambda *a: None)
+        orphans = db.session.execute(db.text(
+            "SELECT count(*) FROM reservation WHERE user_id NOT IN (SELECT user_id FROM app_user)"
+        )).scalar()
+        assert orphans == 0
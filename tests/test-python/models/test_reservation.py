@@ -2,9 +2,13 @@
 
 from app.models.app_user import AppUser
 from app.models.cafeteria import Cafeteria
-from app.models.reservation import Reservation
+from app.models.reservation import Reservation, OrderError
+from app.models.dish import Dish
+from app.models.order_item import OrderItem
 from app.models import db
 from datetime import datetime
+from sqlalchemy import event
+import pytest
 
 def test_create_reservation(app):
     with app.app_context():
@@ -56,4 +60,58 @@ def test_get_all_reservations_as_dicts(app):
         Reservation.create_reservation(user.user_id, caf.cafeteria_id, total=1)
         db.session.commit()
         reservations = Reservation.get_all_dicts()
-        assert len(reservations) == 1
\ No newline at end of file
+        assert len(reservations) == 1
+
+def _count_statements(engine, fn):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements
+
+def test_place_order_uses_fixed_number_of_statements(app):
+    """Le nombre de requêtes SQL d'une commande ne dépend pas du nombre de lignes."""
+    with app.app_context():
+        user = AppUser.create_user("P", "O", "po@ex.com", "p", balance=500)
+        caf = Cafeteria.create_cafeteria("POCaf")
+        dishes = [Dish.create_dish(f"PO{i}", "", 2, "main_course") for i in range(6)]
+        db.session.commit()
+        user_id, caf_id = user.user_id, caf.cafeteria_id
+        dish_ids = [d.dish_id for d in dishes]
+
+        one_line = _count_statements(db.engine, lambda: Reservation.place_order(
+            user_id, caf_id, [{"dish_id": dish_ids[0], "quantity": 1}]))
+        db.session.commit()
+        six_lines = _count_statements(db.engine, lambda: Reservation.place_order(
+            user_id, caf_id, [{"dish_id": d, "quantity": 2} for d in dish_ids]))
+        db.session.commit()
+
+        assert len(one_line) == len(six_lines)
+        assert OrderItem.query.count() == 7
+        assert float(AppUser.get_by_id(user_id).balance) == 500 - 2 - 24
+
+def test_place_order_errors_leave_nothing_behind(app):
+    with app.app_context():
+        user = AppUser.create_user("P", "E", "pe@ex.com", "p", balance=3)
+        caf = Cafeteria.create_cafeteria("PECaf")
+        dish = Dish.create_dish("PE", "", 2, "main_course")
+        db.session.commit()
+        before = Reservation.query.count()
+
+        with pytest.raises(OrderError) as missing:
+            Reservation.place_order(user.user_id, caf.cafeteria_id, [{"dish_id": 999999}])
+        assert missing.value.status_code == 404
+        with pytest.raises(OrderError) as quantity:
+            Reservation.place_order(user.user_id, caf.cafeteria_id, [{"dish_id": dish.dish_id, "quantity": 0}])
+        assert quantity.value.status_code == 400
+        with pytest.raises(OrderError) as balance:
+            Reservation.place_order(user.user_id, caf.cafeteria_id, [{"dish_id": dish.dish_id, "quantity": 2}])
+        assert balance.value.status_code == 402
+        assert balance.value.details["current_balance"] == 3
+        db.session.rollback()
+
+        assert Reservation.query.count() == before
+        assert float(AppUser.get_by_id(user.user_id).balance) == 3
@@ -0,0 +1,95 @@
+# tests/test-python/models/test_user_monthly_spending.py
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from app.models.user_monthly_spending import UserMonthlySpending
+from app.models.reservation import Reservation
+from app.models.dish import Dish
+from app.models.app_user import AppUser
+from app.models.cafeteria import Cafeteria
+from app.models import db
+
+def _setup():
+    user = AppUser.create_user("Roll", "Up", "rollup@ex.com", "pw", balance=100)
+    caf = Cafeteria.create_cafeteria("RollCaf")
+    dish = Dish.create_dish("RollDish", "", 2.5, "main_course")
+    db.session.commit()
+    return user.user_id, caf.cafeteria_id, dish.dish_id
+
+def _months(user_id):
+    return [(r.month, r.order_count, r.total) for r in UserMonthlySpending.get_for_user(user_id)]
+
+def test_place_order_and_cancel_maintain_rollup(app):
+    with app.app_context():
+        user_id, caf_id, dish_id = _setup()
+        first = Reservation.place_order(user_id, caf_id, [{"dish_id": dish_id, "quantity": 2}])
+        Reservation.place_order(user_id, caf_id, [{"dish_id": dish_id, "quantity": 1}])
+        db.session.commit()
+        month = UserMonthlySpending.month_of(first.reservation_datetime)
+        assert _months(user_id) == [(month, 2, Decimal("7.50"))]
+
+        assert first.cancel_if_pending()
+        db.session.commit()
+        assert _months(user_id) == [(month, 1, Decimal("2.50"))]
+
+def test_bulk_orders_are_grouped_per_month(app):
+    with app.app_context():
+        user_id, caf_id, dish_id = _setup()
+        orders = [
+            (n, {"user_id": user_id, "cafeteria_id": caf_id, "items": [{"dish_id": dish_id}], "reservation_datetime": when})
+            for n, when in enumerate(["2025-01-31T12:00:00", "2025-02-01T12:00:00", "2025-02-14T12:00:00"])
+        ]
+        Reservation.place_orders_bulk(orders, Dish.get_price_map())
+        db.session.commit()
+        assert _months(user_id) == [
+            (date(2025, 2, 1), 2, Decimal("5.00")),
+            (date(2025, 1, 1), 1, Decimal("2.50")),
+        ]
+
+def test_rebuild_matches_incremental_maintenance(app):
+    with app.app_context():
+        user_id, caf_id, dish_id = _setup()
+        for _ in range(3):
+            Reservation.place_order(user_id, caf_id, [{"dish_id": dish_id}])
+        cancelled = Reservation.place_order(user_id, caf_id, [{"dish_id": dish_id, "quantity": 4}])
+        cancelled.cancel_if_pending()
+        # Réservation écrite en SQL (ex. chargement en masse) : seul le rebuild la voit
+        db.session.execute(insert(Reservation).values(
+            user_id=user_id, cafeteria_id=caf_id, reservation_datetime=datetime(2024, 12, 24, 12, 0), total=9, status="completed"
+        ))
+        db.session.commit()
+        incremental = _months(user_id)
+
+        assert UserMonthlySpending.rebuild() >= 2
+        db.session.commit()
+        rebuilt = _months(user_id)
+        assert rebuilt[0] == incremental[0]
+        assert rebuilt[-1] == (date(2024, 12, 1), 1, Decimal("9.00"))
+
+def test_admin_edits_maintain_rollup_and_null_status_counts(app):
+    with app.app_context():
+        user_id, caf_id, _ = _setup()
+        january, february = datetime(2025, 1, 10, 12, 0), datetime(2025, 2, 10, 12, 0)
+        kept = Reservation.create_reservation(user_id, caf_id, january, total=4, status=None)
+        moved = Reservation.create_reservation(user_id, caf_id, january, total=6, status="completed")
+        db.session.commit()
+        assert _months(user_id) == [(date(2025, 1, 1), 2, Decimal("10.00"))]
+
+        assert moved.update_reservation(reservation_datetime=february, total=7.5)
+        assert _months(user_id) == [(date(2025, 2, 1), 1, Decimal("7.50")), (date(2025, 1, 1), 1, Decimal("4.00"))]
+        assert moved.update_reservation(status="cancelled")
+        assert moved.update_reservation(status="completed")
+        assert kept.delete_reservation()
+        incremental = _months(user_id)
+        assert incremental == [(date(2025, 2, 1), 1, Decimal("7.50")), (date(2025, 1, 1), 0, Decimal("0.00"))]
+
+        UserMonthlySpending.rebuild()
+        db.session.commit()
+        assert _months(user_id) == incremental[:1]
+        Reservation.create_reservation(user_id, caf_id, january, total=4, status=None)
+        db.session.commit()
+        UserMonthlySpending.rebuild()
+        assert _months(user_id)[-1] == (date(2025, 1, 1), 1, Decimal("4.00"))
@@ -0,0 +1,84 @@
+# tests/test-python/models/test_user_search.py
+
+from app.models.app_user import AppUser
+from app.models.user_search import search_cache, search_user_ids
+from app.models import db
+
+def _names(users):
+    return [(u.first_name, u.last_name) for u in users]
+
+def _add_users():
+    AppUser.create_user("Bartoš", "Jakub", "jakub@ex.com", "pw", password_hash="x")
+    AppUser.create_user("Bartošová", "Eva", "eva@ex.com", "pw", password_hash="x", role="staff")
+    AppUser.create_user("Dubois", "Hugo", "hugo.bartos@ex.com", "pw", password_hash="x")
+    db.session.commit()
+
+def test_search_substring_ranks_name_prefix_first(app):
+    with app.app_context():
+        _add_users()
+        # 'bart' : début du nom pour Bartoš et Bartošová, seulement dans l'email pour Dubois
+        users = AppUser.search("bart")
+        assert _names(users)[:3] == [("Jakub", "Bartoš"), ("Eva", "Bartošová"), ("Hugo", "Dubois")]
+        assert _names(AppUser.search("TOŠ jak")) == [("Jakub", "Bartoš")]
+        assert _names(AppUser.search("bart", role="staff")) == [("Eva", "Bartošová")]
+
+def test_search_short_query_and_limit(app):
+    with app.app_context():
+        _add_users()
+        assert _names(AppUser.search("ba")) == [("Jakub", "Bartoš"), ("Eva", "Bartošová")]
+        assert len(AppUser.search("", limit=3)) == 3
+        assert len(AppUser.search("example.com", limit=2)) == 2
+
+def test_search_index_follows_updates_and_deletes(app):
+    with app.app_context():
+        _add_users()
+        assert AppUser.search("dubois")
+        hugo = AppUser.get_by_email("hugo.bartos@ex.com")
+        assert hugo.update_user(last_name="Moreau")
+        assert AppUser.search("dubois") == []
+        assert _names(AppUser.search("moreau")) == [("Hugo", "Moreau")]
+        assert hugo.delete_user()
+        assert AppUser.search("moreau") == []
+
+def test_search_results_are_cached_per_query(app, count_sql):
+    with app.app_context():
+        _add_users()
+        search_cache.clear()
+        with count_sql() as statements:
+            first = search_user_ids("novák")
+            again = search_user_ids("  Novák ")
+        assert first == again
+        assert len(statements) == 1
+
+def test_short_query_ignores_the_case_of_stored_names(app):
+    with app.app_context():
+        AppUser.create_user("de la Fontaine", "Jean", "jean@ex.com", "pw", password_hash="x")
+        AppUser.create_user("MCDONALD", "Ronald", "ronald@ex.com", "pw", password_hash="x")
+        db.session.commit()
+        assert _names(AppUser.search("de")) == [("Jean", "de la Fontaine")]
+        assert _names(AppUser.search("Mc")) == [("Ronald", "MCDONALD")]
+
+def test_role_filter_applies_before_the_candidate_limit(app):
+    with app.app_context():
+        for i in range(600):
+            AppUser.create_user("Testerson", f"Student{i:03}", f"s{i}@ex.com", "pw", password_hash="x")
+        AppUser.create_user("Zed", "Admin", "admin.testerson@ex.com", "pw", password_hash="x", role="admin")
+        db.session.commit()
+        assert _names(AppUser.search("testerson", role="admin")) == [("Admin", "Zed")]
+
+def test_balance_changes_keep_the_search_cache(app, count_sql):
+    with app.app_context():
+        _add_users()
+        hugo = AppUser.get_by_email("hugo.bartos@ex.com")
+        search_user_ids("bart")
+        AppUser.credit_balance(hugo.user_id, 10)
+        AppUser.debit_balance(hugo.user_id, 5)
+        hugo.update_user(balance=20)
+        db.session.commit()
+        with count_sql() as statements:
+            search_user_ids("bart")
+        assert statements == []
+        hugo.update_user(email="hugo@ex.com")
+        with count_sql() as statements:
+            search_user_ids("bart")
+        assert len(statements) == 1